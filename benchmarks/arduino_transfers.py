@@ -0,0 +1,83 @@
+"""Measure `Arduino` operations against a `VirtualArduino`.
+
+Reports the throughput of storing keyboards, the distribution of the time each
+store waits before being sent, and the time taken to fetch them back. Run from
+the repository root with::
+
+    python -m benchmarks.arduino_transfers
+"""
+
+import time
+
+from core.arduino import Arduino
+from core.arduino.io.connection import MidiConnection
+from core.arduino.io.virtualarduino import VirtualArduino
+from core.keyboard import Left96ButtonKeyboard, Right81ButtonKeyboard,\
+    NoteData
+
+
+def make_keyboards(count: int):
+    """Return `count` keyboards of alternating types, with distinct names."""
+    keyboards = []
+    for i in range(count):
+        kbd_type = (Right81ButtonKeyboard, Left96ButtonKeyboard)[i % 2]
+        kbd = kbd_type("Keyboard {}".format(i))
+        for j in range(1, len(kbd.keyboard)+1):
+            kbd.set_data(j, NoteData(i % 16, j, 100))
+        keyboards.append(kbd)
+    return keyboards
+
+
+def percentile(values, ratio: float) -> float:
+    """Return the value below which `ratio` of the sorted `values` fall."""
+    return values[min(len(values)-1, int(len(values)*ratio))]
+
+
+def run(count: int, window: int, latency: float, bandwidth: float):
+    """Store then fetch `count` keyboards, printing the measures."""
+    device = VirtualArduino(latency=latency, bandwidth=bandwidth,
+                            eeprom_size=count*1024)
+    connection = MidiConnection(backend=device)
+    connection.connect()
+    connection.set_window(window)
+    arduino = Arduino(connection)
+
+    waits = []
+    keyboards = make_keyboards(count)
+    start = time.perf_counter()
+    transfers = [arduino.store_keyboard(kbd) for kbd in keyboards]
+    while not all(transfer.done() for transfer in transfers):
+        time.sleep(0.001)
+    device.wait_idle()
+    elapsed = time.perf_counter() - start
+    for transfer in transfers:
+        waits.append(transfer.announced + transfer.latency - transfer.created)
+    waits.sort()
+    print("    store:  {:7.2f} kbd/s, wait median {:6.1f} ms,"
+          " p95 {:6.1f} ms, max {:6.1f} ms".format(
+              count/elapsed, percentile(waits, 0.5)*1000,
+              percentile(waits, 0.95)*1000, waits[-1]*1000))
+
+    start = time.perf_counter()
+    session = arduino.fetch_keyboards()
+    while not session.done():
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    assert len(session.stored) == count, session
+    print("    fetch:  {:7.2f} kbd/s, total {:6.1f} ms".format(
+        count/elapsed, elapsed*1000))
+    connection.close()
+
+
+def main():
+    """Print the measures for several link configurations."""
+    count = 20
+    for bandwidth, latency in ((3125., 0.005), (100000., 0.005)):
+        for window in (1, 4):
+            print("{:.0f} B/s, {:.0f} ms latency, window {}".format(
+                bandwidth, latency*1000, window))
+            run(count, window, latency, bandwidth)
+
+
+if __name__ == "__main__":
+    main()
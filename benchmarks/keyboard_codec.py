@@ -0,0 +1,110 @@
+"""Measure the time taken to encode and decode whole keyboards.
+
+Each keyboard is encoded to the SysEx frame sent to the Arduino, then decoded
+back, without any port. A keyboard is encoded again only after a change: the
+time to send an unchanged keyboard is measured separately. The time to
+receive it is the time taken by the connection to check, validate and decode
+the SysEx as received from the Arduino, with its origin and check bytes. Run
+from the repository root with::
+
+    python -m benchmarks.keyboard_codec
+"""
+
+import random
+import timeit
+
+from core.arduino.io.connection import MidiConnection
+from core.arduino.io.dao.midi import Left96ButtonKeyboardMidiDAO,\
+    Right81ButtonKeyboardMidiDAO
+from core.keyboard import Left96ButtonKeyboard, Right81ButtonKeyboard,\
+    NoteData, ProgramData, ControlData
+
+
+def make_keyboard(kbd_type: type, seed: int = 0):
+    """Return a keyboard of `kbd_type` with keys of every kind of data."""
+    rnd = random.Random(seed)
+    kbd = kbd_type("Benchmark")
+    for j in range(1, len(kbd.keyboard)+1):
+        kind = rnd.randrange(4)
+        if kind == 1:
+            kbd.set_data(j, NoteData(rnd.randrange(16), rnd.randrange(128),
+                                     rnd.randrange(128)))
+        elif kind == 2:
+            kbd.set_data(j, ProgramData(rnd.randrange(16),
+                                        rnd.randrange(128)))
+        elif kind == 3:
+            kbd.set_data(j, ControlData(rnd.randrange(16),
+                                        rnd.randrange(128),
+                                        rnd.randrange(128)))
+    return kbd
+
+
+def run(dao_type: type, kbd_type: type, number: int = 2000):
+    """
+    Time the encoding and the decoding of a keyboard.
+
+    Parameters
+    ----------
+    dao_type : type
+        The DAO of the keyboard.
+    kbd_type : type
+        The type of keyboard.
+    number : int, optional
+        Number of encodings and decodings timed. The default is 2000.
+
+    Returns
+    -------
+    float
+        Time taken to encode a keyboard in microseconds.
+    float
+        Time taken to get the encoding of an unchanged keyboard in
+        microseconds.
+    float
+        Time taken to decode a keyboard in microseconds.
+    float
+        Time taken to receive a keyboard in microseconds.
+    int
+        Length of the frame in bytes.
+
+    """
+    connection = MidiConnection()
+    connection.frame_checksums = True
+    received = []
+    connection.callback = lambda keyboard, origin: received.append(keyboard)
+    dao = dao_type(connection)
+    kbd = make_keyboard(kbd_type)
+    frame = dao._to_bytes(kbd)  # pylint: disable=W0212
+    assert dao.from_bytes(frame) == kbd
+    # As given by mido: a tuple, without the manufacturer ID
+    sysex = tuple(dao._to_frame(kbd, 0x01))  # pylint: disable=W0212
+    connection._process_sysex(sysex)  # pylint: disable=W0212
+    assert received.pop() == kbd
+    def encode_changed():
+        kbd.version += 1
+        dao._to_bytes(kbd)  # pylint: disable=W0212
+    encode = min(timeit.repeat(encode_changed, number=number, repeat=5))
+    cached = min(timeit.repeat(
+        lambda: dao._to_frame(kbd, 0x01),  # pylint: disable=W0212
+        number=number, repeat=5))
+    decode = min(timeit.repeat(lambda: dao.from_bytes(frame),
+                               number=number, repeat=5))
+    receive = min(timeit.repeat(
+        lambda: connection._process_sysex(sysex),  # pylint: disable=W0212
+        number=number, repeat=5))
+    return (encode / number * 1e6, cached / number * 1e6,
+            decode / number * 1e6, receive / number * 1e6, len(frame))
+
+
+def main():
+    """Print the encoding and decoding time of each type of keyboard."""
+    for dao_type, kbd_type in (
+            (Right81ButtonKeyboardMidiDAO, Right81ButtonKeyboard),
+            (Left96ButtonKeyboardMidiDAO, Left96ButtonKeyboard)):
+        encode, cached, decode, receive, size = run(dao_type, kbd_type)
+        print("{:22} {:4} B: encode {:5.1f} us (unchanged {:4.1f} us), "
+              "decode {:5.1f} us, receive {:5.1f} us".format(
+                  kbd_type.__name__, size, encode, cached, decode, receive))
+
+
+if __name__ == "__main__":
+    main()
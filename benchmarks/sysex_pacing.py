@@ -0,0 +1,87 @@
+"""Compare paced and unpaced SysEx writes to a slow Arduino.
+
+A `VirtualArduino` whose EEPROM is slower than the MIDI link plays the role
+of the device: keyboards written faster than it stores them fill its input
+buffer and are lost. Run from the repository root with::
+
+    python -m benchmarks.sysex_pacing
+"""
+
+import time
+
+from core.arduino.io.connection import MidiConnection
+from core.arduino.io.virtualarduino import VirtualArduino
+from core.arduino.io.dao.midi import Right81ButtonKeyboardMidiDAO
+from core.keyboard import Right81ButtonKeyboard, NoteData
+
+
+def run(count: int, paced: bool, process_rate: float,
+        input_buffer: int = 700, window: int = 4):
+    """
+    Store `count` keyboards on a virtual Arduino.
+
+    Parameters
+    ----------
+    count : int
+        Number of keyboards to send.
+    paced : bool
+        Whether the writes are paced, see `MidiConnection.set_pacing`.
+    process_rate : float
+        Speed at which the device stores the received bytes, in bytes per
+        second.
+    input_buffer : int, optional
+        Number of bytes the device can receive before storing them.
+        The default is 700.
+    window : int, optional
+        Window size given to `MidiConnection.set_window`. The default is 4.
+
+    Returns
+    -------
+    float
+        Time taken in seconds.
+    int
+        Number of keyboards stored.
+    dict
+        The metrics' gauges at the end.
+
+    """
+    device = VirtualArduino(eeprom_size=count*1024,
+                            process_rate=process_rate,
+                            input_buffer=input_buffer)
+    connection = MidiConnection(backend=device)
+    connection.connect()
+    connection.set_window(window)
+    connection.set_pacing(paced)
+
+    dao = Right81ButtonKeyboardMidiDAO(connection)
+    start = time.perf_counter()
+    transfers = []
+    for i in range(count):
+        kbd = Right81ButtonKeyboard("Benchmark {}".format(i))
+        for j in range(1, 82):
+            kbd.set_data(j, NoteData(0, 20 + j, 100))
+        transfers.append(dao.send_store_keyboard(kbd))
+    while not all(transfer.done() for transfer in transfers):
+        time.sleep(0.001)
+    device.wait_idle()
+    elapsed = time.perf_counter() - start
+    gauges = connection.get_metrics()["gauges"]
+    connection.close()
+    return elapsed, len(device.eeprom), gauges
+
+
+def main():
+    """Print the time taken and the keyboards lost in each mode."""
+    count = 20
+    for process_rate in (1000., 2000.):
+        print("Device storing {:.0f} B/s".format(process_rate))
+        for paced in (False, True):
+            elapsed, stored, gauges = run(count, paced, process_rate)
+            print("    {}: {:5.2f} s, {:2} / {} stored, "
+                  "capacity {:4.0f} B/s".format(
+                      "paced  " if paced else "unpaced", elapsed, stored,
+                      count, gauges["link_capacity"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare stop-and-wait and pipelined SysEx transmission.
+
+A `VirtualArduino` plays the role of the device. Run from the repository
+root with::
+
+    python -m benchmarks.sysex_pipelining
+"""
+
+import time
+
+from core.arduino.io.connection import MidiConnection
+from core.arduino.io.virtualarduino import VirtualArduino
+from core.arduino.io.dao.midi import Right81ButtonKeyboardMidiDAO
+from core.keyboard import Right81ButtonKeyboard, NoteData
+
+
+def run(count: int, window: int, sequences: bool = True,
+        latency: float = 0.005, bandwidth: float = 3125.) -> float:
+    """
+    Store `count` keyboards on a virtual Arduino.
+
+    Parameters
+    ----------
+    count : int
+        Number of keyboards to send.
+    window : int
+        Window size given to `MidiConnection.set_window`.
+    sequences : bool, optional
+        Whether the device understands sequence numbers.
+        The default is True.
+    latency : float, optional
+        Processing latency of the device, in seconds. The default is 0.005.
+    bandwidth : float, optional
+        Link speed in bytes per second. The default is 3125 (MIDI 1.0).
+
+    Returns
+    -------
+    float
+        Number of keyboards stored per second.
+
+    """
+    device = VirtualArduino(latency=latency, bandwidth=bandwidth,
+                            eeprom_size=count*1024, sequences=sequences)
+    connection = MidiConnection(backend=device)
+    connection.connect()
+    connection.set_window(window)
+
+    # Distinct names, so that no store supersedes another one
+    keyboards = []
+    for i in range(count):
+        kbd = Right81ButtonKeyboard("Benchmark {}".format(i))
+        for j in range(1, 82):
+            kbd.set_data(j, NoteData(0, 20 + j, 100))
+        keyboards.append(kbd)
+    dao = Right81ButtonKeyboardMidiDAO(connection)
+
+    start = time.perf_counter()
+    transfers = [dao.send_store_keyboard(kbd) for kbd in keyboards]
+    while not all(transfer.done() for transfer in transfers):
+        time.sleep(0.001)
+    device.wait_idle()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    assert device.stats["stored"] == count, device.stats
+    return count / elapsed
+
+
+def main():
+    """Print the throughput of each mode."""
+    count = 20
+    for bandwidth, latency in ((3125., 0.005), (3125., 0.020),
+                               (100000., 0.005), (100000., 0.020)):
+        print("{:.0f} B/s, {:.0f} ms latency".format(bandwidth, latency*1000))
+        reference = run(count, 1, latency=latency, bandwidth=bandwidth)
+        print("    stop-and-wait: {:7.2f} kbd/s".format(reference))
+        for window in (2, 4, 8):
+            rate = run(count, window, latency=latency, bandwidth=bandwidth)
+            print("    window {}:      {:7.2f} kbd/s (x{:.2f})".format(
+                window, rate, rate/reference))
+        rate = run(count, 4, sequences=False, latency=latency,
+                   bandwidth=bandwidth)
+        print("    old firmware:  {:7.2f} kbd/s (x{:.2f})".format(
+            rate, rate/reference))
+
+
+if __name__ == "__main__":
+    main()
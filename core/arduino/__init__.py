@@ -1,2 +1,6 @@
 from .arduino import *
+from .asyncarduino import *
+from .audition import *
+from .fetchsession import *
+from .mirror import *
 from .io import midiio
@@ -6,6 +6,8 @@ from core.keyboard import Keyboard, Left96ButtonKeyboard, Right81ButtonKeyboard
 from core.notifications import Notification
 from .io import midiio
 from .io.dao.daofactory import MidiDAOFactory
+from .fetchsession import FetchSession
+from .mirror import DeviceMirror
 
 # pylint: disable=C0123
 
@@ -13,16 +15,219 @@ from .io.dao.daofactory import MidiDAOFactory
 class Arduino:
     """Reflect the Arduino current state and manage connexions."""
 
-    def __init__(self):
+    fetch_quiet_time = 0.2
+    """Time in seconds without keyboard after which a fetch is complete."""
+
+    fetch_timeout = 1.
+    """Time in seconds to wait for the first keyboard of a fetch."""
+
+    delta_patches = False
+    """Whether `set_current_keyboard` may send only the keys that changed
+    since the last keyboard received by the Arduino. Requires a firmware
+    understanding the patch command (`0x10`)."""
+
+    incremental_fetch = False
+    """Whether `sync_keyboards` can be used. Requires a firmware
+    understanding the list (`0x20`) and single fetch (`0x40`) commands."""
+
+    def __init__(self, connection: midiio.MidiConnection = None,
+                 mirror: DeviceMirror = None):
+        """
+        Create the reflect of the Arduino reachable through `connection`.
+
+        Parameters
+        ----------
+        connection : MidiConnection, optional
+            The connection to the Arduino. The default is
+            `midiio.default_connection`.
+        mirror : DeviceMirror, optional
+            Where to keep the keyboards of each fetch, to show them before
+            the next one (see `load_mirror`). The default is None, for no
+            mirror.
+
+        Returns
+        -------
+        None.
+
+        """
+        if connection is None:
+            connection = midiio.default_connection
+        self.connection = connection
         self.stored_keyboards = []
         self.current_left_keyboard = None
         self.current_right_keyboard = None
         self.stored_lock = threading.Lock()
         self.left_lock = threading.Lock()
         self.right_lock = threading.Lock()
-        self.dao_factory = MidiDAOFactory()
+        self.dao_factory = MidiDAOFactory(connection)
         self.keyboards_list_changed = Notification()
-        midiio.callback = self._add_keyboard_internal
+        self.keyboard_received = Notification()
+        """Notified with each keyboard received from the Arduino and its
+        origin ("EEPROM" or "RAM")."""
+        self.transfer_failed = Notification()
+        """Notified with the keyboard and the `SysexTransfer` when a request
+        could not be sent to the Arduino."""
+        self.fetch_completed = Notification()
+        """Notified with the `FetchSession` once a fetch is complete."""
+        self.fetch_session = None
+        self.fetch_lock = threading.Lock()
+        self.mirror = mirror
+        self.stale = False
+        """Whether the known keyboards come from the mirror and were not
+        fetched from the Arduino yet."""
+        self.mirror_saved = None
+        """Time (see `time.time`) at which the mirrored keyboards were
+        fetched, when `stale`."""
+        self.acked_current = {}
+        """Copy of the last current keyboard received by the Arduino, by
+        keyboard type, as a tuple (serial, keyboard)."""
+        self.acked_lock = threading.Lock()
+        self._acked_serial = 0
+        self._current_pending = {}
+        connection.callback = self._add_keyboard_internal
+        connection.end_callback = self._end_fetch_internal
+        connection.inventory_callback = self._inventory_received
+        connection.corrupted_callback = self._keyboard_corrupted
+        connection.rejected_callback = self._keyboard_rejected
+        connection.patch_rejected_callback = self._patch_rejected
+
+    def _watch_transfer(self, kbd: Keyboard, transfer: midiio.SysexTransfer
+                        ) -> midiio.SysexTransfer:
+        """
+        Report the failure of `transfer` through `transfer_failed`.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard concerned by the transfer.
+        transfer : SysexTransfer
+            The transfer to watch.
+
+        Returns
+        -------
+        SysexTransfer
+            The given transfer.
+
+        """
+        def done(transfer):
+            if transfer.status == "failed":
+                self.transfer_failed(kbd, transfer)
+        transfer.add_done_callback(done)
+        return transfer
+
+    def _set_acked_current(self, kbd: Keyboard, serial: int = None):
+        """
+        Record `kbd` as the current keyboard of its type on the Arduino.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard, not modified afterwards.
+        serial : int, optional
+            The serial number given when `kbd` was sent. A keyboard sent
+            before the recorded one is ignored. The default is None, for a
+            keyboard received from the Arduino.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.acked_lock:
+            if serial is None:
+                self._acked_serial += 1
+                serial = self._acked_serial
+            previous = self.acked_current.get(type(kbd))
+            if previous is None or previous[0] < serial:
+                self.acked_current[type(kbd)] = (serial, kbd)
+
+    def _patch_rejected(self, kbd_type: type):
+        """
+        Send whole the current keyboard of `kbd_type`, the Arduino ignored a
+        patch computed against another keyboard than its own.
+
+        Parameters
+        ----------
+        kbd_type : type
+            The type of keyboard, None if unknown.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.acked_lock:
+            self.acked_current.pop(kbd_type, None)
+        kbd = None
+        if kbd_type is Left96ButtonKeyboard:
+            with self.left_lock:
+                kbd = self.current_left_keyboard
+        elif kbd_type is Right81ButtonKeyboard:
+            with self.right_lock:
+                kbd = self.current_right_keyboard
+        if kbd is not None:
+            self.set_current_keyboard(kbd)
+
+    def use_capabilities(self, capabilities: 'midiio.Capabilities'):
+        """
+        Enable the features the Arduino supports.
+
+        Sets `delta_patches` and `incremental_fetch`.
+
+        Parameters
+        ----------
+        capabilities : Capabilities
+            The capabilities common to the controller and the Arduino, as
+            returned by `MidiConnection.negotiate`. None if unknown, to
+            disable the features.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.delta_patches = capabilities is not None\
+            and "delta" in capabilities
+        self.incremental_fetch = capabilities is not None\
+            and "inventory" in capabilities
+
+    def forget_acked_keyboards(self):
+        """
+        Forget the current keyboards known to be on the Arduino.
+
+        The next keyboards set as current are sent whole. To call when the
+        connection is changed.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.acked_lock:
+            self.acked_current.clear()
+
+    def _forget_acked_current(self, kbd_type: type, serial: int):
+        """
+        Forget the current keyboard of `kbd_type` known to be on the Arduino,
+        unless it was recorded after the transfer numbered `serial`.
+
+        Parameters
+        ----------
+        kbd_type : type
+            The type of keyboard.
+        serial : int
+            The serial number of a transfer leaving the Arduino in an
+            unknown state.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.acked_lock:
+            previous = self.acked_current.get(kbd_type)
+            if previous is not None and previous[0] < serial:
+                del self.acked_current[kbd_type]
 
     def _add_keyboard_internal(self, kbd: Keyboard, origin: str):
         """
@@ -40,6 +245,13 @@ class Arduino:
         None.
 
         """
+        if origin == "RAM":
+            self._set_acked_current(deepcopy(kbd))
+        with self.fetch_lock:
+            session = self.fetch_session
+        if session is not None and session.add(kbd, origin):
+            self.keyboard_received(kbd, origin)
+            return
         if origin == "EEPROM":
             with self.stored_lock:
                 if kbd not in self.stored_keyboards:
@@ -53,6 +265,7 @@ class Arduino:
                  self.current_right_keyboard != kbd):
                 with self.right_lock:
                     self.current_right_keyboard = kbd
+        self.keyboard_received(kbd, origin)
         self.keyboards_list_changed()
 
     def get_stored_keyboards(self) -> List[Keyboard]:
@@ -94,28 +307,269 @@ class Arduino:
         with self.right_lock:
             return deepcopy(self.current_right_keyboard)
 
-    def fetch_keyboards(self):
+    def _end_fetch_internal(self):
+        """End the current fetch session, the Arduino sent every keyboard."""
+        with self.fetch_lock:
+            session = self.fetch_session
+        if session is not None:
+            session.end_marker()
+
+    def _keyboard_corrupted(self):
+        """Record in the fetch session that a keyboard was received
+        corrupted."""
+        with self.fetch_lock:
+            session = self.fetch_session
+        if session is not None:
+            session.corrupted()
+
+    def _keyboard_rejected(self, origin: str, kbd_type: type, name: str):
+        """Record in the fetch session that a keyboard can't be decoded,
+        see `FetchSession.reject`."""
+        with self.fetch_lock:
+            session = self.fetch_session
+        if session is not None:
+            session.reject(origin, kbd_type, name)
+
+    def _list_keyboards_again(self):
+        """Ask the list of the keyboards to find the missing ones."""
+        self.connection.metrics.increment("lists_requested_again")
+        self.dao_factory.get_generic_keyboard_dao().send_list_keyboards()
+
+    def _fetch_keyboard_again(self, origin: str, kbd_type: type, name: str):
+        """Ask again a keyboard listed by the Arduino but not received."""
+        self.connection.metrics.increment("frames_requested_again")
+        self._get_keyboard_dao(kbd_type).send_fetch_keyboard(name, origin)
+
+    def _fetch_done(self, session: FetchSession):
         """
-        Ask remote to send known keyboards.
+        Replace the known keyboards by those collected by `session`.
+
+        The keyboards are saved in the mirror, if any. If the Arduino didn't
+        answer, the mirrored keyboards are kept and stay stale. If keyboards
+        were lost (see `FetchSession.lost`), the received keyboards only
+        replace the known ones of the same type and name, the others are
+        kept and the mirror is not updated. The keyboards that can't be
+        decoded (see `FetchSession.rejected`) are left out.
+
+        Parameters
+        ----------
+        session : FetchSession
+            The ended session.
 
         Returns
         -------
         None.
 
         """
+        with self.fetch_lock:
+            if session is not self.fetch_session:
+                return
+            self.fetch_session = None
+        if self.stale and session.end_reason == "timeout":
+            self.fetch_completed(session)
+            return
         with self.stored_lock:
-            self.stored_keyboards.clear()
+            if session.lost:
+                stored = [kbd for kbd in self.stored_keyboards
+                          if not any(type(kbd) == type(received)
+                                     and kbd.name == received.name
+                                     for received in session.stored)]
+                self.stored_keyboards = stored + list(session.stored)
+            else:
+                self.stored_keyboards = list(session.stored)
+        left = right = None
+        if session.lost:
+            left = self.current_left_keyboard
+            right = self.current_right_keyboard
+        for kbd in session.current:
+            if isinstance(kbd, Left96ButtonKeyboard):
+                left = kbd
+            elif isinstance(kbd, Right81ButtonKeyboard):
+                right = kbd
         with self.left_lock:
-            self.current_left_keyboard = None
+            self.current_left_keyboard = left
         with self.right_lock:
-            self.current_right_keyboard = None
-        self.dao_factory.get_generic_keyboard_dao().send_fetch_keyboards()
+            self.current_right_keyboard = right
+        if not session.lost:
+            self.stale = False
+            self.mirror_saved = None
+            self.save_mirror()
         self.keyboards_list_changed()
+        self.fetch_completed(session)
+
+    def load_mirror(self) -> bool:
+        """
+        Replace the known keyboards by those mirrored for the connected
+        Arduino.
+
+        The keyboards are marked `stale` until the next fetch.
+
+        Returns
+        -------
+        bool
+            True if mirrored keyboards were found.
+
+        """
+        device = self.connection.get_device_id()
+        if self.mirror is None or device is None:
+            return False
+        mirrored = self.mirror.load(device)
+        if mirrored is None:
+            return False
+        stored, current, saved = mirrored
+        left = right = None
+        for kbd in current:
+            if isinstance(kbd, Left96ButtonKeyboard):
+                left = kbd
+            elif isinstance(kbd, Right81ButtonKeyboard):
+                right = kbd
+        with self.stored_lock:
+            self.stored_keyboards = stored
+        with self.left_lock:
+            self.current_left_keyboard = left
+        with self.right_lock:
+            self.current_right_keyboard = right
+        self.stale = True
+        self.mirror_saved = saved
+        self.keyboards_list_changed()
+        return True
+
+    def save_mirror(self) -> bool:
+        """
+        Save the known keyboards in the mirror of the connected Arduino.
+
+        Returns
+        -------
+        bool
+            True if the keyboards were saved.
+
+        """
+        device = self.connection.get_device_id()
+        if self.mirror is None or device is None:
+            return False
+        stored = self.get_stored_keyboards()
+        current = [kbd for kbd in (self.get_current_left_keyboard(),
+                                   self.get_current_right_keyboard())
+                   if kbd is not None]
+        try:
+            self.mirror.save(device, stored, current)
+        except OSError:
+            return False
+        return True
+
+    def _start_fetch_session(self) -> FetchSession:
+        """Start a new fetch session, replacing the current one."""
+        session = FetchSession(self.connection, self.fetch_quiet_time,
+                               self.fetch_timeout)
+        if self.incremental_fetch:
+            session.list_callback = self._list_keyboards_again
+            session.fetch_callback = self._fetch_keyboard_again
+        session.add_done_callback(self._fetch_done)
+        with self.fetch_lock:
+            previous, self.fetch_session = self.fetch_session, session
+        if previous is not None:
+            previous.end("superseded")
+        session.start()
+        return session
+
+    def fetch_keyboards(self) -> FetchSession:
+        """
+        Ask remote to send known keyboards.
+
+        The received keyboards are collected by a `FetchSession`. Once it
+        ended, they replace the known keyboards and `keyboards_list_changed`
+        is notified once.
+
+        Returns
+        -------
+        FetchSession
+            The session collecting the keyboards.
+
+        """
+        session = self._start_fetch_session()
+        self.dao_factory.get_generic_keyboard_dao().send_fetch_keyboards()
+        return session
+
+    def sync_keyboards(self) -> FetchSession:
+        """
+        Ask remote to send the keyboards that differ from the known ones.
+
+        Remote first sends the list of its keyboards with their checksum.
+        The known keyboards with the same checksum are kept, the others are
+        fetched one by one. As with `fetch_keyboards`, the keyboards replace
+        the known keyboards once the session ended.
+
+        Returns
+        -------
+        FetchSession
+            The session collecting the keyboards.
+
+        """
+        session = self._start_fetch_session()
+        self.dao_factory.get_generic_keyboard_dao().send_list_keyboards()
+        return session
+
+    def _get_keyboard_dao(self, kbd_type: type):
+        """Return the DAO of the given keyboard type, or None."""
+        if kbd_type is Left96ButtonKeyboard:
+            return self.dao_factory.get_left_96_button_keyboard_dao()
+        if kbd_type is Right81ButtonKeyboard:
+            return self.dao_factory.get_right_81_button_keyboard_dao()
+        return None
+
+    def _inventory_received(self, inventory):
+        """
+        Fetch the keyboards of `inventory` that differ from the known ones
+        and were not received yet by the fetch session.
+
+        Parameters
+        ----------
+        inventory : List[Tuple[str, type, str, int]]
+            The origin, type, name and checksum of the keyboards of remote.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.fetch_lock:
+            session = self.fetch_session
+        if session is None or session.done():
+            return
+        with self.stored_lock:
+            known = {"EEPROM": list(self.stored_keyboards)}
+        with self.left_lock, self.right_lock:
+            known["RAM"] = [kbd for kbd in (self.current_left_keyboard,
+                                            self.current_right_keyboard)
+                            if kbd is not None]
+        requested = []
+        for origin, kbd_type, name, checksum in inventory:
+            if session.received(origin, kbd_type, name):
+                continue
+            keyboard_dao = self._get_keyboard_dao(kbd_type)
+            for kbd in known[origin]:
+                if(type(kbd) == kbd_type and kbd.name == name
+                   and keyboard_dao.get_checksum(kbd) == checksum):
+                    session.add(kbd, origin, cached=True)
+                    break
+            else:
+                keyboard_dao.send_fetch_keyboard(name, origin)
+                requested.append((origin, kbd_type, name))
+        session.expect(requested)
 
     def set_current_keyboard(self, kbd: Keyboard):
         """
         Set the given keyboard as current.
 
+        If `delta_patches` is enabled and the Arduino already received a
+        keyboard of the same type and name, only the keys that changed are
+        sent. The whole keyboard is sent while a previous one of the same
+        type is still being sent, as the patch could not be computed against
+        the keyboard the Arduino will have. The patch carries the checksum
+        of the keyboard it was computed against: if the current keyboard of
+        the Arduino changed meanwhile, it ignores the patch and the whole
+        keyboard is sent again.
+
         Parameters
         ----------
         kbd : Keyboard
@@ -123,7 +577,8 @@ class Arduino:
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the keyboard.
 
         """
         keyboard_dao = None
@@ -136,9 +591,35 @@ class Arduino:
             with self.right_lock:
                 self.current_right_keyboard = kbd
 
-        keyboard_dao.send_set_current_keyboard(kbd)
+        # The copy is encoded, so that it is exactly what the Arduino gets
+        # even if `kbd` is changed meanwhile
+        sent = keyboard_dao.copy_keyboard(kbd)
+        kbd_type = type(kbd)
+        with self.acked_lock:
+            self._acked_serial += 1
+            serial = self._acked_serial
+            _, base = self.acked_current.get(kbd_type, (None, None))
+            pending = self._current_pending.get(kbd_type, 0)
+            self._current_pending[kbd_type] = pending + 1
+        if(self.delta_patches and not pending and base is not None
+           and base.name == sent.name):
+            transfer = keyboard_dao.send_patch_current_keyboard(sent, base)
+        else:
+            transfer = keyboard_dao.send_set_current_keyboard(sent)
+
+        def done(transfer):
+            with self.acked_lock:
+                self._current_pending[kbd_type] -= 1
+            if transfer.status == "sent":
+                self._set_acked_current(sent, serial)
+            elif transfer.error != "superseded":
+                # The Arduino may or may not have received it
+                self._forget_acked_current(kbd_type, serial)
+        transfer.add_done_callback(done)
+        transfer = self._watch_transfer(kbd, transfer)
 
         self.keyboards_list_changed()
+        return transfer
 
     def store_keyboard(self, kbd: Keyboard):
         """
@@ -151,7 +632,8 @@ class Arduino:
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the keyboard.
 
         """
         keyboard_dao = None
@@ -160,7 +642,8 @@ class Arduino:
         elif isinstance(kbd, Right81ButtonKeyboard):
             keyboard_dao = self.dao_factory.get_right_81_button_keyboard_dao()
 
-        keyboard_dao.send_store_keyboard(kbd)
+        transfer = self._watch_transfer(
+            kbd, keyboard_dao.send_store_keyboard(kbd))
 
         with self.stored_lock:
             for std_kb in self.stored_keyboards:
@@ -170,6 +653,7 @@ class Arduino:
 
             self.stored_keyboards.append(kbd)
         self.keyboards_list_changed()
+        return transfer
 
     def delete_keyboard(self, kbd: Keyboard):
         """
@@ -182,7 +666,8 @@ class Arduino:
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the deletion request.
 
         """
         keyboard_dao = None
@@ -191,7 +676,8 @@ class Arduino:
         elif isinstance(kbd, Right81ButtonKeyboard):
             keyboard_dao = self.dao_factory.get_right_81_button_keyboard_dao()
 
-        keyboard_dao.send_delete_keyboard(kbd)
+        transfer = self._watch_transfer(
+            kbd, keyboard_dao.send_delete_keyboard(kbd))
 
         with self.stored_lock:
             for std_kb in self.stored_keyboards:
@@ -199,6 +685,7 @@ class Arduino:
                     self.stored_keyboards.remove(std_kb)
                     break
         self.keyboards_list_changed()
+        return transfer
 
     def rename_keyboard(self, kbd: Keyboard, new_name: str):
         """
@@ -213,7 +700,8 @@ class Arduino:
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the renaming request.
 
         """
         keyboard_dao = None
@@ -222,7 +710,8 @@ class Arduino:
         elif isinstance(kbd, Right81ButtonKeyboard):
             keyboard_dao = self.dao_factory.get_right_81_button_keyboard_dao()
 
-        keyboard_dao.send_rename_keyboard(kbd, new_name)
+        transfer = self._watch_transfer(
+            kbd, keyboard_dao.send_rename_keyboard(kbd, new_name))
 
         with self.stored_lock:
             for std_kb in self.stored_keyboards:
@@ -230,3 +719,4 @@ class Arduino:
                     std_kb.name = new_name
                     break
         self.keyboards_list_changed()
+        return transfer
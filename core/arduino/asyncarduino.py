@@ -0,0 +1,236 @@
+"""Awaitable access to the Arduino, for use with asyncio."""
+
+__all__ = ["AsyncArduino", "KeyboardStream", "TransferError", "wrap_transfer"]
+
+import asyncio
+from typing import List, Tuple
+
+from core.keyboard import Keyboard
+from .arduino import Arduino
+from .io import midiio
+
+
+class TransferError(Exception):
+    """A request could not be sent to the Arduino."""
+
+
+def wrap_transfer(transfer: midiio.SysexTransfer,
+                  loop: asyncio.AbstractEventLoop = None) -> asyncio.Future:
+    """
+    Return a future resolved when `transfer` is sent.
+
+    Parameters
+    ----------
+    transfer : SysexTransfer
+        The transfer to wait for.
+    loop : asyncio.AbstractEventLoop, optional
+        The loop of the future. The default is the running loop.
+
+    Returns
+    -------
+    asyncio.Future
+        Its result is the transfer, or it raises TransferError if the transfer
+        failed. It is cancelled if the transfer is cancelled.
+
+    """
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(transfer):
+        if future.done():
+            return
+        if transfer.status == "failed":
+            future.set_exception(TransferError(transfer.error))
+        elif transfer.status == "cancelled":
+            future.cancel()
+        else:
+            future.set_result(transfer)
+
+    transfer.add_done_callback(
+        lambda transfer: loop.call_soon_threadsafe(resolve, transfer))
+    return future
+
+
+class KeyboardStream:
+    """Asynchronous iterator over the keyboards received from the Arduino.
+
+    Each item is a tuple of the keyboard and its origin ("EEPROM" or "RAM").
+    The stream ends when `close` is called.
+
+    Usage:
+        >>> async for kbd, origin in async_arduino.keyboards():
+        ...     print(kbd, origin)
+    """
+
+    def __init__(self, arduino: Arduino, loop: asyncio.AbstractEventLoop):
+        self._arduino = arduino
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._closed = False
+        arduino.keyboard_received.connect(self._received)
+
+    def _received(self, kbd: Keyboard, origin: str):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait,
+                                        (kbd, origin))
+
+    def close(self):
+        """Stop listening to the Arduino and end the iteration."""
+        if not self._closed:
+            self._closed = True
+            self._arduino.keyboard_received.disconnect(self._received)
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Tuple[Keyboard, str]:
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+    async def get(self, timeout: float = None) -> Tuple[Keyboard, str]:
+        """
+        Return the next received keyboard.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait, in seconds. The default is None.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            No keyboard was received in time.
+        StopAsyncIteration
+            The stream is closed.
+
+        Returns
+        -------
+        Tuple[Keyboard, str]
+            The keyboard and its origin.
+
+        """
+        return await asyncio.wait_for(self.__anext__(), timeout)
+
+
+class AsyncArduino:
+    """Awaitable variants of the `Arduino` operations.
+
+    Each operation returns once the Arduino received the request, and raises
+    TransferError if it could not be sent. Several operations can be awaited
+    together, e.g. with `asyncio.gather`.
+    """
+
+    def __init__(self, arduino: Arduino = None):
+        self.arduino = arduino if arduino is not None else Arduino()
+
+    def keyboards(self) -> KeyboardStream:
+        """
+        Return an asynchronous iterator over the received keyboards.
+
+        Returns
+        -------
+        KeyboardStream
+            The iterator. Must be closed when no longer used.
+
+        """
+        return KeyboardStream(self.arduino, asyncio.get_running_loop())
+
+    async def set_current_keyboard(self, kbd: Keyboard):
+        """
+        Set the given keyboard as current.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to set.
+
+        Returns
+        -------
+        SysexTransfer
+            The completed transfer.
+
+        """
+        return await wrap_transfer(self.arduino.set_current_keyboard(kbd))
+
+    async def store_keyboard(self, kbd: Keyboard):
+        """
+        Store the given keyboard.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to store.
+
+        Returns
+        -------
+        SysexTransfer
+            The completed transfer.
+
+        """
+        return await wrap_transfer(self.arduino.store_keyboard(kbd))
+
+    async def delete_keyboard(self, kbd: Keyboard):
+        """
+        Delete the given keyboard.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to delete.
+
+        Returns
+        -------
+        SysexTransfer
+            The completed transfer.
+
+        """
+        return await wrap_transfer(self.arduino.delete_keyboard(kbd))
+
+    async def rename_keyboard(self, kbd: Keyboard, new_name: str):
+        """
+        Rename the given keyboard.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to rename.
+        new_name : str
+            The new name.
+
+        Returns
+        -------
+        SysexTransfer
+            The completed transfer.
+
+        """
+        return await wrap_transfer(
+            self.arduino.rename_keyboard(kbd, new_name))
+
+    async def fetch_keyboards(self) -> List[Keyboard]:
+        """
+        Fetch the keyboards known by the Arduino.
+
+        Returns once the `FetchSession` of the fetch ended, see
+        `Arduino.fetch_timeout` and `Arduino.fetch_quiet_time`.
+
+        Returns
+        -------
+        List[Keyboard]
+            The stored keyboards. The current ones are available through
+            `arduino.get_current_left_keyboard` and
+            `arduino.get_current_right_keyboard`.
+
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        session = self.arduino.fetch_keyboards()
+        session.add_done_callback(
+            lambda session: loop.call_soon_threadsafe(
+                lambda: future.done() or future.set_result(session)))
+        await future
+        return self.arduino.get_stored_keyboards()
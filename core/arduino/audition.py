@@ -0,0 +1,154 @@
+"""Push the edits of a keyboard to the Arduino while it is being edited."""
+
+__all__ = ["LiveAudition"]
+
+import threading
+import time
+
+from core.keyboard import Keyboard
+from .arduino import Arduino
+
+
+class LiveAudition:
+    """Keep the Arduino's current keyboard in sync with an edited keyboard.
+
+    Each change of the keyboard state (see `KeyboardState.keyboard_changed`)
+    is pushed with `Arduino.set_current_keyboard`, so the edits can be heard
+    right away. The changes made within `debounce` seconds are sent as one
+    transfer, and a transfer still waiting to be announced is dropped when a
+    newer one replaces it.
+
+    The time from an edit to the moment its transfer is written is measured
+    in the "audition_latency" histogram of the connection's metrics.
+
+    Usage:
+        >>> audition = LiveAudition(arduino, kbd_state)
+        >>> audition.start()
+        >>> kbd_state.set_keyboard_data(1, NoteData(0, 60, 100))
+        >>> audition.stop()
+    """
+
+    debounce = 0.05
+    """Time in seconds during which the edits are gathered in one transfer.
+    """
+
+    def __init__(self, arduino: Arduino, kbd_state: 'KeyboardState',
+                 debounce: float = None):
+        """
+        Create a live audition of `kbd_state`, not yet started.
+
+        Parameters
+        ----------
+        arduino : Arduino
+            The Arduino to push the keyboard to.
+        kbd_state : KeyboardState
+            The edited keyboard.
+        debounce : float, optional
+            Overrides `LiveAudition.debounce`. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.arduino = arduino
+        self.keyboard_state = kbd_state
+        if debounce is not None:
+            self.debounce = debounce
+        self.metrics = arduino.connection.metrics
+        self.running = False
+        self._lock = threading.Lock()
+        self._timer = None
+        self._edited = None
+        self._pending = None
+
+    @property
+    def keyboard(self) -> Keyboard:
+        """The edited keyboard."""
+        return self.keyboard_state.keyboard
+
+    def start(self):
+        """
+        Push the keyboard, then each of its changes.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.running:
+            return
+        self.running = True
+        self.keyboard_state.keyboard_changed.connect(self._changed)
+        self._changed()
+
+    def stop(self):
+        """
+        Stop pushing the changes. The changes not yet pushed are dropped.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not self.running:
+            return
+        self.running = False
+        self.keyboard_state.keyboard_changed.disconnect(self._changed)
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._edited = None
+
+    def get_latency_stats(self):
+        """
+        Return statistics about the edit-to-device latency.
+
+        Returns
+        -------
+        Dict[str, float]
+            The summary of the "audition_latency" histogram, see
+            `Histogram.summary`.
+
+        """
+        return self.metrics.histogram("audition_latency")
+
+    def _changed(self):
+        """Schedule a push at the end of the debounce window."""
+        self.metrics.increment("audition_edits")
+        with self._lock:
+            if self._edited is None:
+                self._edited = time.monotonic()
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self._push)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _push(self):
+        """Send the keyboard, replacing the transfer not yet announced."""
+        with self._lock:
+            self._timer = None
+            edited, self._edited = self._edited, None
+            previous, self._pending = self._pending, None
+        if edited is None or not self.running:
+            return
+        # The connection drops the previous transfer if not announced yet
+        transfer = self.arduino.set_current_keyboard(self.keyboard)
+        self.metrics.increment("audition_transfers")
+        if previous is not None and previous[0].status == "cancelled":
+            self.metrics.increment("audition_superseded")
+            edited = min(edited, previous[1])
+        with self._lock:
+            self._pending = (transfer, edited)
+        transfer.add_done_callback(
+            lambda transfer: self._done(transfer, edited))
+
+    def _done(self, transfer: 'SysexTransfer', edited: float):
+        """Measure the latency of the edits sent by `transfer`."""
+        if transfer.status == "sent":
+            self.metrics.observe("audition_latency",
+                                 time.monotonic() - edited)
+        with self._lock:
+            if self._pending is not None and self._pending[0] is transfer:
+                self._pending = None
@@ -0,0 +1,369 @@
+"""Collect the keyboards sent by the Arduino in answer to a fetch."""
+
+__all__ = ["FetchSession"]
+
+import threading
+import time
+from typing import Callable, Iterable, Tuple
+
+from core.keyboard import Keyboard
+from .io.connection import MidiConnection
+
+
+class FetchSession:
+    """Collect a burst of keyboards until the Arduino is done sending them.
+
+    The session ends when the Arduino sends the end marker, when the expected
+    keyboards are received (see `expect`), when no keyboard is received for
+    `quiet_time` seconds, or when nothing is received for `first_timeout`
+    seconds after the start.
+
+    Nothing read from a keyboard received corrupted can be trusted, not even
+    its name (see `corrupted`). Once the Arduino is done sending, its list of
+    keyboards is then asked with `list_callback`, and the listed keyboards
+    not received are expected (see `expect`). Keyboards expected but not
+    received are asked again with `fetch_callback`. Without these callbacks,
+    or after `max_retries` attempts, the keyboards still missing are counted
+    in `lost`.
+
+    Attributes
+    ----------
+        :stored: The keyboards received from the EEPROM.
+
+        :current: The keyboards received from the RAM.
+
+        :end_reason: "marker", "complete", "quiet", "timeout" or
+        "superseded", once ended.
+
+        :bytes_received: Number of SysEx bytes received during the session.
+
+        :reused: Number of keyboards taken from the local cache instead of
+        being received.
+
+        :retried: Number of times missing keyboards were asked again.
+
+        :lost: Number of keyboards received corrupted or not received, and
+        given up on. The session is incomplete if not 0.
+
+        :rejected: Number of keyboards received intact but that can't be
+        decoded, see `reject`. They are left out.
+
+        :list_callback: The function to call, without parameter, to ask the
+        list of the Arduino's keyboards. None if it can't be asked.
+
+        :fetch_callback: The function to call with the origin, type and name
+        of a keyboard to ask it again. None if it can't be asked.
+    """
+
+    max_retries = 2
+    """Number of times missing keyboards are asked again."""
+
+    def __init__(self, connection: MidiConnection, quiet_time: float = 0.2,
+                 first_timeout: float = 1.):
+        self.connection = connection
+        self.quiet_time = quiet_time
+        self.first_timeout = first_timeout
+        self.stored = []
+        self.current = []
+        self.end_reason = None
+        self.bytes_received = 0
+        self.reused = 0
+        self.retried = 0
+        self.lost = 0
+        self.rejected = 0
+        self.list_callback = None
+        self.fetch_callback = None
+        self.started = None
+        self.ended = None
+        self._last_received = None
+        self._received = set()
+        self._expected = None
+        self._corrupted = 0
+        self._retries = 0
+        self._start_bytes = 0
+        self._cond = threading.Condition()
+        self._callbacks = []
+
+    def __repr__(self):
+        return "FetchSession(stored={}, current={}, end_reason={!r})".format(
+            len(self.stored), len(self.current), self.end_reason)
+
+    @property
+    def duration(self) -> float:
+        """Time in seconds from the start to the end of the session."""
+        if self.started is None:
+            return 0.
+        end = self.ended if self.ended is not None else time.monotonic()
+        return end - self.started
+
+    def done(self) -> bool:
+        """Return True if the session ended, False otherwise."""
+        return self.end_reason is not None
+
+    def add_done_callback(self, func: Callable[['FetchSession'], None]):
+        """
+        Call `func` with this session once it ended.
+
+        If the session already ended, `func` is called immediately.
+
+        Parameters
+        ----------
+        func : Callable[[FetchSession], None]
+            The function to call.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            if not self.done():
+                self._callbacks.append(func)
+                return
+        func(self)
+
+    def start(self):
+        """Start waiting for the keyboards."""
+        self.started = time.monotonic()
+        self._start_bytes = self.connection.get_receive_stats()["bytes"]
+        threading.Thread(target=self._watch, name="fetch-session",
+                         daemon=True).start()
+
+    def add(self, kbd: Keyboard, origin: str, cached: bool = False) -> bool:
+        """
+        Add a received keyboard to the session.
+
+        A keyboard with the same origin, type and name as one already added
+        is ignored.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The received keyboard.
+        origin : str
+            The keyboard's origin ("EEPROM" or "RAM").
+        cached : bool, optional
+            True if the keyboard is taken from the local cache instead of
+            being received. The default is False.
+
+        Returns
+        -------
+        bool
+            False if the session already ended, True otherwise.
+
+        """
+        key = (origin, type(kbd), kbd.name)
+        with self._cond:
+            if self.done():
+                return False
+            if not cached:
+                self._last_received = time.monotonic()
+            if key in self._received:
+                return True
+            if cached:
+                self.reused += 1
+            self._received.add(key)
+            if origin == "EEPROM":
+                self.stored.append(kbd)
+            else:
+                self.current.append(kbd)
+            complete = False
+            if self._expected is not None:
+                self._expected.discard(key)
+                complete = not self._expected
+            self._cond.notify()
+        if complete:
+            self.end("complete")
+        return True
+
+    def received(self, origin: str, kbd_type: type, name: str) -> bool:
+        """Return True if the keyboard was added to the session."""
+        with self._cond:
+            return (origin, kbd_type, name) in self._received
+
+    def expect(self, keys: Iterable[Tuple[str, type, str]]):
+        """
+        End the session once the keyboards `keys` are received.
+
+        Parameters
+        ----------
+        keys : Iterable[Tuple[str, type, str]]
+            The origin, type and name of each keyboard still to receive, as
+            listed by the Arduino.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            self._expected = set(keys) - self._received
+            # The corrupted keyboards are among the listed ones
+            self._corrupted = 0
+            self._last_received = time.monotonic()
+            complete = not self._expected
+            self._cond.notify()
+        if complete:
+            self.end("complete")
+
+    def reject(self, origin: str, kbd_type: type, name: str):
+        """
+        Record that a keyboard was received intact but can't be decoded.
+
+        The keyboard is counted in `rejected` and is no longer expected:
+        asking it again would give the same keyboard.
+
+        Parameters
+        ----------
+        origin : str
+            The keyboard's origin ("EEPROM" or "RAM").
+        kbd_type : type
+            The keyboard's type, None if unknown.
+        name : str
+            The keyboard's name, None if it can't be read.
+
+        Returns
+        -------
+        None.
+
+        """
+        key = (origin, kbd_type, name)
+        with self._cond:
+            if self.done():
+                return
+            self._last_received = time.monotonic()
+            self.rejected += 1
+            self._received.add(key)
+            complete = False
+            if self._expected is not None:
+                self._expected.discard(key)
+                complete = not self._expected
+            self._cond.notify()
+        if complete:
+            self.end("complete")
+
+    def corrupted(self):
+        """
+        Record that a keyboard was received corrupted.
+
+        The keyboard is found again through the list of the Arduino's
+        keyboards, see `list_callback`.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            if self.done():
+                return
+            self._last_received = time.monotonic()
+            self._corrupted += 1
+            self._cond.notify()
+
+    def _ask_again(self) -> bool:
+        """
+        Ask again the keyboards expected or received corrupted.
+
+        Returns
+        -------
+        bool
+            True if they were asked again, False if they are given up on.
+
+        """
+        with self._cond:
+            if self.done() or self._retries >= self.max_retries:
+                return False
+            if self._expected:
+                callback = self.fetch_callback
+                keys = list(self._expected)
+            elif self._expected is None and self._corrupted:
+                callback = self.list_callback
+                keys = None
+            else:
+                return False
+            if callback is None:
+                return False
+            self._retries += 1
+            self.retried += 1
+            self._last_received = time.monotonic()
+        if keys is None:
+            callback()
+        else:
+            for key in keys:
+                callback(*key)
+        return True
+
+    def end_marker(self):
+        """
+        Handle the end marker sent by the Arduino.
+
+        The session ends, unless keyboards are still expected or keyboards
+        were received corrupted and can be asked again.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            if self._expected:
+                return
+        if self._ask_again():
+            return
+        self.end("marker")
+
+    def end(self, reason: str = "marker"):
+        """
+        End the session, if not already ended.
+
+        The keyboards still expected, or received corrupted, are counted in
+        `lost`.
+
+        Parameters
+        ----------
+        reason : str, optional
+            Why the session ends. The default is "marker".
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            if self.done():
+                return
+            self.ended = time.monotonic()
+            self.end_reason = reason
+            if self._expected is not None:
+                self.lost += len(self._expected)
+            else:
+                self.lost += self._corrupted
+            received = self.connection.get_receive_stats()["bytes"]
+            self.bytes_received = received - self._start_bytes
+            callbacks, self._callbacks = self._callbacks, []
+            self._cond.notify()
+        for func in callbacks:
+            func(self)
+
+    def _watch(self):
+        """End the session once the Arduino stays quiet, unless missing
+        keyboards can be asked again."""
+        while True:
+            with self._cond:
+                while not self.done():
+                    if self._last_received is None:
+                        deadline = self.started + self.first_timeout
+                        reason = "timeout"
+                    else:
+                        deadline = self._last_received + self.quiet_time
+                        reason = "quiet"
+                    delay = deadline - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                else:
+                    return
+            if not self._ask_again():
+                self.end(reason)
+                return
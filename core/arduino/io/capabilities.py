@@ -0,0 +1,92 @@
+"""Protocol features supported by each side of a connection."""
+
+__all__ = ["Capabilities"]
+
+from typing import Iterable
+
+
+class Capabilities:
+    """Protocol version and optional features of a controller or Arduino.
+
+    The features are exchanged as the bits of one byte, see
+    `docs/midi protocol.md`.
+
+    Attributes
+    ----------
+        :version: The version of the protocol.
+
+        :features: The names of the supported features, among `FEATURES`.
+
+        :buffer_size: The length of the longest SysEx the Arduino can
+        receive, 0 if not limited.
+    """
+
+    FEATURES = ("pipelining", "delta", "inventory", "chunks", "checksums",
+                "compact_names", "end_marker")
+    """The optional features, in the order of their bits."""
+
+    def __init__(self, version: int = 1, features: Iterable[str] = (),
+                 buffer_size: int = 0):
+        unknown = set(features).difference(self.FEATURES)
+        if unknown:
+            raise ValueError("unknown features: {}".format(
+                ", ".join(sorted(unknown))))
+        self.version = version
+        self.features = frozenset(features)
+        self.buffer_size = buffer_size
+
+    def __repr__(self):
+        return "Capabilities(version={!r}, features={!r}, "\
+            "buffer_size={!r})".format(self.version, sorted(self.features),
+                                       self.buffer_size)
+
+    def __contains__(self, feature: str) -> bool:
+        return feature in self.features
+
+    def __and__(self, other: 'Capabilities') -> 'Capabilities':
+        """Return the capabilities common to both sides."""
+        if self.buffer_size and other.buffer_size:
+            buffer_size = min(self.buffer_size, other.buffer_size)
+        else:
+            buffer_size = self.buffer_size or other.buffer_size
+        return Capabilities(min(self.version, other.version),
+                            self.features & other.features, buffer_size)
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode the capabilities, as sent after the command byte (`0x60`).
+
+        Returns
+        -------
+        bytes
+            The version, the features' bits and the buffer size on two
+            bytes.
+
+        """
+        bits = 0
+        for bit, feature in enumerate(self.FEATURES):
+            if feature in self.features:
+                bits |= 1 << bit
+        return bytes([self.version, bits, self.buffer_size >> 7 & 0x7f,
+                      self.buffer_size & 0x7f])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Capabilities':
+        """
+        Decode capabilities encoded with `to_bytes`.
+
+        Parameters
+        ----------
+        data : bytes, tuple or list of bytes
+            Part of the SysEx message following the command byte (`0x60`).
+
+        Returns
+        -------
+        Capabilities
+            The decoded capabilities. Unknown features are ignored.
+
+        """
+        features = [feature for bit, feature in enumerate(cls.FEATURES)
+                    if data[1] & 1 << bit]
+        buffer_size = data[2] << 7 | data[3] if len(data) >= 4 else 0
+        return cls(data[0], features, buffer_size)
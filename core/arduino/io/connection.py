@@ -0,0 +1,1350 @@
+"""Connection to one Arduino, through a pair of MIDI ports."""
+
+__all__ = ["MidiConnection", "SysexTransfer"]
+
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Hashable, Iterable, List
+from collections import deque, OrderedDict
+import mido
+from core.notifications import Notification
+from .dao.midi import KeyboardMidiDAO, decode_name, keyboard_daos,\
+    keyboard_types, validate_frame
+from .capabilities import Capabilities
+from .metrics import TransportMetrics
+from .pacing import Pacer
+
+
+class SysexTransfer:
+    """Follow a SysEx sent with `send_sysex` until it is sent or failed.
+
+    Attributes
+    ----------
+        :message: The SysEx message.
+
+        :status: One of "queued", "announced", "sent", "failed" or
+        "cancelled".
+
+        :error: The reason of the failure, if failed.
+
+        :attempts: Number of announcements made for this SysEx.
+
+        :latency: Time in seconds between the last announcement and its
+        confirmation, once sent.
+
+        :key: The operation performed by the SysEx, see `send_sysex`.
+
+        :priority: "control" or "bulk", see `send_sysex`.
+
+        :resources: What the SysEx acts on, see `send_sysex`.
+
+        :chunks: The parts of the SysEx sent one by one, or None if it is
+        sent whole, see `set_chunk_size`.
+
+        :written: The time and position in the output stream of the last
+        message waiting for an acknowledgement (announcement or chunk), see
+        `Pacer.written`.
+    """
+
+    def __init__(self, message: mido.Message,
+                 connection: 'MidiConnection' = None, key: Hashable = None,
+                 priority: str = "bulk", resources: Iterable[Hashable] = ()):
+        self.message = message
+        self.connection = connection
+        self.key = key
+        self.priority = priority
+        self.resources = frozenset(resources)
+        self.status = "queued"
+        self.error = None
+        self.attempts = 0
+        self.latency = None
+        self.sequence = None
+        self.created = time.monotonic()
+        self.announced = None
+        self.chunks = None
+        self.chunk_index = 0
+        self.chunk_attempts = 0
+        self.chunk_sent = None
+        self.written = None
+        self._callbacks = []
+
+    def __repr__(self):
+        return "SysexTransfer(status={!r}, attempts={!r})".format(
+            self.status, self.attempts)
+
+    def done(self) -> bool:
+        """Return True if the SysEx is sent, failed or cancelled, False
+        otherwise."""
+        return self.status in ("sent", "failed", "cancelled")
+
+    def add_done_callback(self, func: Callable[['SysexTransfer'], None]):
+        """
+        Call `func` with this transfer once it is sent, failed or cancelled.
+
+        If the transfer is already done, `func` is called immediately.
+
+        Parameters
+        ----------
+        func : Callable[[SysexTransfer], None]
+            The function to call.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.done():
+            func(self)
+        else:
+            self._callbacks.append(func)
+
+    def _finish(self, status: str, error: str = None):
+        self.status = status
+        self.error = error
+        callbacks, self._callbacks = self._callbacks, []
+        for func in callbacks:
+            func(self)
+
+    def confirm(self):
+        """Mark the transfer as sent. Must be called without lock held."""
+        self._finish("sent")
+
+    def fail(self, error: str):
+        """Mark the transfer as failed. Must be called without lock held."""
+        self._finish("failed", error)
+        if self.connection is not None:
+            self.connection.metrics.increment("transfers_failed")
+            self.connection.transfer_failed(self)
+
+    def cancel(self) -> bool:
+        """
+        Cancel the transfer if it is not announced yet.
+
+        Returns
+        -------
+        bool
+            True if the transfer is cancelled, False if it is already
+            announced or done.
+
+        """
+        if self.connection is None:
+            return False
+        return self.connection.cancel(self)
+
+    def next_timeout(self) -> float:
+        """Return the time at which the announcement must be repeated."""
+        conn = self.connection
+        timeout = conn.ack_timeout * conn.ack_backoff**(self.attempts-1)
+        return self.announced + min(timeout, conn.max_ack_timeout)
+
+    def chunk_header(self) -> int:
+        """Return the header byte of the current chunk.
+
+        It gives the index of the chunk modulo 32, with the bit `0x20` set on
+        the first chunk and the bit `0x40` set on the last one.
+        """
+        header = self.chunk_index % 32
+        if self.chunk_index == 0:
+            header |= 0x20
+        if self.chunk_index == len(self.chunks) - 1:
+            header |= 0x40
+        return header
+
+    def next_chunk_timeout(self) -> float:
+        """Return the time at which the current chunk must be sent again."""
+        conn = self.connection
+        timeout = conn.ack_timeout\
+            * conn.ack_backoff**(self.chunk_attempts-1)
+        return self.chunk_sent + min(timeout, conn.max_ack_timeout)
+
+
+class MidiConnection:
+    """Connection to one Arduino.
+
+    Each connection owns its ports, its queues and its threads, so several
+    Arduinos can be driven independently from the same process.
+    """
+
+    ack_timeout = 0.5
+    """Time in seconds to wait for a confirmation before announcing again."""
+
+    ack_backoff = 2.
+    """Factor applied to `ack_timeout` after each unconfirmed announcement."""
+
+    max_ack_timeout = 4.
+    """Maximum time in seconds between two announcements of the same SysEx."""
+
+    sysex_deadline = 15.
+    """Time in seconds after which a SysEx not yet sent is considered failed.
+    """
+
+    bulk_max_wait = 1.
+    """Time in seconds after which a queued bulk SysEx is no longer overtaken
+    by control SysEx.
+    """
+
+    local_capabilities = Capabilities(
+        1, ("pipelining", "delta", "inventory", "chunks", "checksums",
+            "compact_names", "end_marker"))
+    """The protocol version and features supported by the controller."""
+
+    negotiation_timeout = 0.3
+    """Time in seconds to wait for the Arduino's capabilities."""
+
+    negotiated_window = 4
+    """Window used once the Arduino announced it supports pipelining."""
+
+    receive_queue_size = 1024
+    """Maximum number of received SysEx waiting to be decoded.
+    Further SysEx are dropped (and counted) until the decoder catches up.
+    """
+
+    def __init__(self, backend=mido):
+        """
+        Create a connection, not yet connected to any port.
+
+        Parameters
+        ----------
+        backend : optional
+            The object opening and listing the ports. Any object with the
+            same `open_input`, `open_output`, `get_input_names` and
+            `get_output_names` functions as mido can be used, such as a
+            `VirtualArduino`. The default is mido.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.backend = backend
+
+        self.outport = None
+        """The output port.
+        Must be set with `connect` or `connect_output` methods.
+        """
+
+        self.inport = None
+        """The input port.
+        Must be set with `connect` or `connect_input` methods.
+        """
+
+        self.callback = None
+        """The function to call when a keyboard is received.
+        Must take two parameters:
+            keyboard: The received keyboard.
+            origin: The keyboard's origin (from EEPROM or RAM) as string.
+        """
+
+        self.end_callback = None
+        """The function to call, without parameter, when the receiver signals
+        the end of the keyboards it sends in answer to a fetch.
+        """
+
+        self.inventory_callback = None
+        """The function to call when the list of the receiver's keyboards is
+        received. Must take one parameter:
+            inventory: See `KeyboardMidiDAO.inventory_from_bytes`.
+        """
+
+        self.corrupted_callback = None
+        """The function to call, without parameter, when a keyboard is
+        received corrupted or malformed. Nothing read from it can be trusted,
+        not even its type or name.
+        """
+
+        self.patch_rejected_callback = None
+        """The function to call when the receiver ignored a patch of its
+        current keyboard, as it was computed against another keyboard. Must
+        take one parameter:
+            kbd_type: The type of the current keyboard, None if unknown.
+        """
+
+        self.rejected_callback = None
+        """The function to call when an intact keyboard can't be decoded,
+        e.g. because it uses midi data this controller doesn't know. Must
+        take three parameters:
+            origin: The keyboard's origin (from EEPROM or RAM) as string.
+            kbd_type: The keyboard's type, None if unknown.
+            name: The keyboard's name, None if it can't be read.
+        """
+
+        self.frame_checksums = False
+        """Whether the keyboard frames (`0x01` and `0x02`) end with a check
+        byte, in both directions. Requires a firmware supporting it."""
+
+        self.compact_names = False
+        """Whether the names are packed in 7-bit bytes instead of being
+        base-64 encoded, see `encode_name`. Requires a firmware supporting
+        it."""
+
+        self.capabilities = None
+        """The capabilities common to the controller and the Arduino, None
+        if not negotiated, see `negotiate`."""
+        self._remote_capabilities = None
+        self._capabilities_received = threading.Event()
+
+        self.transfer_failed = Notification()
+        """Notified with the `SysexTransfer` when a SysEx could not be sent.
+        """
+
+        self.metrics = TransportMetrics()
+        """Counters and histograms of the traffic, see `get_metrics`."""
+
+        self.pacer = Pacer()
+        """Measures the receiver's throughput and paces the writes, see
+        `set_pacing`."""
+
+        # SysEx announced to the receiver
+        self._sysex_queue = deque()
+        self._sysex_in_flight = OrderedDict()
+        self._sysex_lock = threading.Lock()
+        self._sysex_cond = threading.Condition(self._sysex_lock)
+        self._scheduler = None
+        self._window = 1
+        self._pipelining_supported = True
+        self._next_sequence = 0
+        self._chunk_size = None
+        self._chunking = None
+        self._held = deque()
+
+        # Messages written by the writer thread
+        self._write_queue = deque()
+        self._write_cond = threading.Condition()
+        self._writer = None
+        self._writing = False
+
+        # SysEx decoded by the receiver thread
+        self._recv_queue = deque()
+        self._recv_event = threading.Event()
+        self._receiver = None
+        self._recv_stats = {"received": 0, "bytes": 0, "dropped": 0,
+                            "max_depth": 0, "errors": 0}
+
+    # Ports
+
+    def _clear_inport_callback(self):
+        """Clear the input port callback."""
+        if self.inport:
+            self.inport.callback = None
+
+    def close_inport(self):
+        """Close the input port."""
+        if self.inport:
+            self._clear_inport_callback()
+            self.inport.close()
+
+    def close_outport(self):
+        """Close the output port.
+
+        Pending writes are flushed, then every SysEx not yet sent is failed.
+        """
+        self.flush()
+        if self.outport:
+            self.outport.close()
+        with self._sysex_lock:
+            failed = list(self._sysex_in_flight.values())\
+                + list(self._sysex_queue) + list(self._held)
+            if self._chunking is not None:
+                failed.append(self._chunking)
+            self._sysex_in_flight.clear()
+            self._sysex_queue.clear()
+            self._held.clear()
+            self._chunking = None
+        for transfer in failed:
+            transfer.fail("output port closed")
+
+    def close(self):
+        """Close both input and output port."""
+        self.close_inport()
+        self.close_outport()
+
+    def connect(self, outprt: str = None, inprt: str = None):
+        """
+        Connect to the specified MIDI output and input ports, if not None.
+
+        If `outport` or `inport` is None, connects to default MIDI port.
+
+        Parameters
+        ----------
+        outport : str, optional
+            Name of the MIDI ouput port. The default is None.
+        inport : str, optional
+            Nome of the MIDI input port. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.connect_output(outprt)
+        self.connect_input(inprt)
+
+    def connect_input(self, port: str = None):
+        """
+        Connect to the specified input port.
+
+        If `port` is None, connects to default MIDI input port.
+
+        Parameters
+        ----------
+        port : str, optional
+            Name of the MIDI input port, one of `list_input_ports()`.
+            The default is None.
+
+        Returns
+        -------
+        None.
+
+        Exceptions
+        ----------
+        If connection fails, raises an error.
+
+        """
+        self._start_receiver()
+        if not port:
+            self.inport = self.backend.open_input(
+                callback=self._message_recv)
+        else:
+            self.inport = self.backend.open_input(
+                port, callback=self._message_recv)
+
+    def connect_output(self, port: str = None):
+        """
+        Connect to the specified output port.
+
+        If `port` is None, connects to default MIDI output port.
+
+        Parameters
+        ----------
+        port : str, optional
+            Name of the MIDI output port, one of `list_output_ports()`.
+            The default is None.
+
+        Returns
+        -------
+        None.
+
+        Exceptions
+        ----------
+        If connection fails, raises an error.
+
+        """
+        self._pipelining_supported = True
+        self.pacer.reset()
+        if not port:
+            self.outport = self.backend.open_output(autoreset=False)
+        else:
+            self.outport = self.backend.open_output(port, autoreset=False)
+
+    def get_device_id(self) -> str:
+        """
+        Return an identifier of the connected device.
+
+        Returns
+        -------
+        str
+            The name of the output port, None if not connected.
+
+        """
+        if self.outport is None or self.outport.closed:
+            return None
+        return self.outport.name
+
+    def negotiate(self, timeout: float = None) -> Capabilities:
+        """
+        Ask the Arduino for its capabilities and use the best modes both
+        sides support.
+
+        According to the common capabilities, the window (pipelining), the
+        pacing, the chunk size, the frame checksums and the names' encoding
+        are set. If the Arduino doesn't answer (older firmware), the
+        checksums, chunks and compact names are disabled and the window is
+        left unchanged.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Time in seconds to wait for the answer. The default is
+            `negotiation_timeout`.
+
+        Returns
+        -------
+        Capabilities
+            The capabilities common to both sides, None if the Arduino
+            didn't answer.
+
+        """
+        if timeout is None:
+            timeout = self.negotiation_timeout
+        self._capabilities_received.clear()
+        self.metrics.increment("negotiations")
+        self.send_direct_sysex(bytes([0x60])
+                               + self.local_capabilities.to_bytes())
+        if not self._capabilities_received.wait(timeout):
+            self.metrics.increment("negotiations_failed")
+            self.capabilities = None
+            self.frame_checksums = False
+            self.compact_names = False
+            self.set_chunk_size(None)
+            return None
+        capabilities = self.local_capabilities & self._remote_capabilities
+        self.capabilities = capabilities
+        self.frame_checksums = "checksums" in capabilities
+        self.compact_names = "compact_names" in capabilities
+        if "pipelining" in capabilities:
+            self.set_window(self.negotiated_window)
+        else:
+            self.set_window(1)
+        self.set_pacing("pipelining" in capabilities)
+        if "chunks" in capabilities and capabilities.buffer_size:
+            self.set_chunk_size(max(8, min(capabilities.buffer_size - 2,
+                                           4096)))
+        else:
+            self.set_chunk_size(None)
+        return capabilities
+
+    def list_input_ports(self) -> List[str]:
+        """
+        List available input ports.
+
+        Returns
+        -------
+        list of str
+            List of available input ports names.
+
+        """
+        return self.backend.get_input_names()
+
+    def list_output_ports(self) -> List[str]:
+        """
+        List available output ports.
+
+        Returns
+        -------
+        list of str
+            List of available output ports names.
+
+        """
+        return self.backend.get_output_names()
+
+    def input_ready(self) -> bool:
+        """
+        Return True if the input is ready to use, False otherwise.
+
+        Returns
+        -------
+        bool
+            True if the input is ready, False otherwise.
+
+        """
+        if self.inport:
+            return not self.inport.closed
+        return False
+
+    def output_ready(self) -> bool:
+        """
+        Return True if the output is ready to use, False otherwise.
+
+        Returns
+        -------
+        bool
+            True if the output is ready, False otherwise.
+
+        """
+        if self.outport:
+            return not self.outport.closed
+        return False
+
+    # Announced SysEx
+
+    def set_window(self, size: int):
+        """
+        Set the maximum number of SysEx messages announced at the same time.
+
+        With a window of 1 (the default), each SysEx is announced with an
+        untagged `0x0F` and sent only when the receiver confirms it
+        (stop-and-wait). With a greater window, announcements carry a
+        sequence number and up to `size` of them may wait for their
+        confirmation. If the receiver does not understand sequence numbers,
+        the stop-and-wait mode is used instead.
+
+        Parameters
+        ----------
+        size : int
+            The window size, between 1 and 127.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not 1 <= size <= 127:
+            raise ValueError(
+                "window size must be between 1 and 127, got {}".format(size))
+        with self._sysex_lock:
+            self._window = size
+            self._fill_window()
+            self._sysex_cond.notify()
+
+    def get_window(self) -> int:
+        """
+        Return the window size currently in use.
+
+        Returns
+        -------
+        int
+            The window size, 1 if in stop-and-wait mode.
+
+        """
+        if self._pipelining_supported:
+            return self._window
+        return 1
+
+    def set_chunk_size(self, size: int = None):
+        """
+        Set the maximum size of the SysEx sent whole.
+
+        A SysEx given to `send_sysex` with more than `size` bytes is sent in
+        chunks of `size` bytes. Each chunk is sent once the receiver
+        acknowledged the previous one, so the receiver never has to buffer
+        more than one chunk. The receiver must support chunks (`0x30`).
+
+        Parameters
+        ----------
+        size : int, optional
+            The chunk size, between 8 and 4096 bytes. The default is None,
+            for SysEx always sent whole.
+
+        Returns
+        -------
+        None.
+
+        """
+        if size is not None and not 8 <= size <= 4096:
+            raise ValueError(
+                "chunk size must be between 8 and 4096, got {}".format(size))
+        with self._sysex_lock:
+            self._chunk_size = size
+
+    def get_chunk_size(self) -> int:
+        """
+        Return the maximum size of the SysEx sent whole.
+
+        Returns
+        -------
+        int
+            The chunk size, None if SysEx are always sent whole.
+
+        """
+        return self._chunk_size
+
+    def set_pacing(self, enabled: bool):
+        """
+        Enable or disable the pacing of the written messages.
+
+        The throughput of the receiver is measured from its
+        acknowledgements, and the messages are written just under it so
+        that the receiver's buffer never overflows. No message is delayed
+        until the throughput is measured. See `Pacer`.
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether the writes are paced.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.pacer.enabled = enabled
+
+    def _announce(self, transfer: SysexTransfer):
+        """Send the announcement of `transfer`.
+
+        Must be called with `_sysex_lock` held.
+        """
+        transfer.status = "announced"
+        transfer.attempts += 1
+        transfer.announced = time.monotonic()
+        if transfer.attempts == 1:
+            wait = transfer.announced - transfer.created
+            self.metrics.observe("queue_wait", wait)
+            self.metrics.observe("queue_wait." + transfer.priority, wait)
+        else:
+            self.metrics.increment("announcements_repeated")
+        self._send_pre_sysex(transfer.sequence, transfer)
+
+    def _next_transfer(self) -> SysexTransfer:
+        """Return the queued SysEx to announce first.
+
+        The first control SysEx acting on none of the resources of the SysEx
+        queued before it is announced first, unless the oldest SysEx is
+        queued for more than `bulk_max_wait` seconds.
+
+        Must be called with `_sysex_lock` held.
+        """
+        oldest = self._sysex_queue[0]
+        if time.monotonic() - oldest.created >= self.bulk_max_wait:
+            return oldest
+        overtaken = set()
+        for transfer in self._sysex_queue:
+            if(transfer.priority == "control"
+               and overtaken.isdisjoint(transfer.resources)):
+                return transfer
+            overtaken.update(transfer.resources)
+        return oldest
+
+    def _fill_window(self):
+        """Announce queued SysEx while the window allows it.
+
+        Must be called with `_sysex_lock` held.
+        """
+        while self._sysex_queue\
+                and len(self._sysex_in_flight) < self.get_window():
+            transfer = self._next_transfer()
+            self._sysex_queue.remove(transfer)
+            if self.get_window() == 1:
+                transfer.sequence = None
+            else:
+                transfer.sequence = self._next_sequence
+                self._next_sequence = (self._next_sequence + 1) % 128
+            self._sysex_in_flight[transfer.sequence] = transfer
+            self._announce(transfer)
+
+    def _process_confirmation(self, data: bytes):
+        """Send the SysEx confirmed by the receiver."""
+        with self._sysex_lock:
+            if not self._sysex_in_flight:
+                return
+            if len(data) > 1:
+                transfer = self._sysex_in_flight.pop(data[1], None)
+                if transfer is None:  # unknown or already confirmed
+                    return
+            else:
+                if next(iter(self._sysex_in_flight)) is not None:
+                    # The receiver ignores sequence numbers: confirm in order.
+                    self._pipelining_supported = False
+                _, transfer = self._sysex_in_flight.popitem(last=False)
+            transfer.latency = time.monotonic() - transfer.announced
+            self.metrics.observe("ack_rtt", transfer.latency)
+            if transfer.written is not None:
+                self.pacer.acked(transfer.written)
+            self._dispatch(transfer)
+            self._fill_window()
+            self._sysex_cond.notify()
+
+    def _dispatch(self, transfer: SysexTransfer):
+        """Write a confirmed SysEx, or start sending its chunks.
+
+        The SysEx confirmed while chunks are being sent are held until the
+        last chunk is acknowledged, to keep the order of the SysEx.
+
+        Must be called with `_sysex_lock` held.
+        """
+        if self._chunking is not None:
+            self._held.append(transfer)
+        elif transfer.chunks:
+            self._chunking = transfer
+            self._write_chunk(transfer)
+        else:
+            self._write(transfer.message, transfer)
+
+    def _write_chunk(self, transfer: SysexTransfer):
+        """Write the current chunk of `transfer`.
+
+        Must be called with `_sysex_lock` held.
+        """
+        transfer.chunk_attempts += 1
+        transfer.chunk_sent = time.monotonic()
+        if transfer.chunk_attempts > 1:
+            self.metrics.increment("chunks_repeated")
+        self.metrics.increment("chunks_out")
+        self._write(mido.Message(
+            "sysex", data=bytes([0x7d, 0x30, transfer.chunk_header()])
+            + transfer.chunks[transfer.chunk_index]), acked=transfer)
+
+    def _end_chunking(self):
+        """Write the SysEx held while chunks were being sent.
+
+        Must be called with `_sysex_lock` held.
+        """
+        self._chunking = None
+        while self._held and self._chunking is None:
+            self._dispatch(self._held.popleft())
+
+    def _process_chunk_ack(self, data: bytes):
+        """Send the next chunk, the receiver acknowledged the current one."""
+        with self._sysex_lock:
+            transfer = self._chunking
+            if(transfer is None or len(data) < 2
+               or data[1] != transfer.chunk_header()):
+                return  # unexpected or repeated acknowledgement
+            self.metrics.observe("chunk_ack_rtt",
+                                 time.monotonic() - transfer.chunk_sent)
+            if transfer.written is not None:
+                self.pacer.acked(transfer.written)
+            if transfer.chunk_index < len(transfer.chunks) - 1:
+                transfer.chunk_index += 1
+                transfer.chunk_attempts = 0
+                self._write_chunk(transfer)
+                return
+            self._end_chunking()
+            self._sysex_cond.notify()
+        transfer.confirm()
+
+    def _check_timeouts(self):
+        """Repeat or fail the SysEx waiting for too long.
+
+        Must be called with `_sysex_lock` held.
+
+        Returns
+        -------
+        list of SysexTransfer
+            The transfers that failed.
+        float
+            The time at which the next check must be done, or None.
+        """
+        now = time.monotonic()
+        failed = [transfer for transfer in
+                  list(self._sysex_in_flight.values())
+                  + list(self._sysex_queue)
+                  if now - transfer.created >= self.sysex_deadline]
+        for transfer in failed:
+            if transfer.status == "announced":
+                del self._sysex_in_flight[transfer.sequence]
+            else:
+                self._sysex_queue.remove(transfer)
+        self._fill_window()
+
+        wake_up = [transfer.created + self.sysex_deadline
+                   for transfer in self._sysex_queue]
+        chunking = self._chunking
+        if chunking is not None:
+            if now - chunking.created >= self.sysex_deadline:
+                failed.append(chunking)
+                self._end_chunking()
+            else:
+                if now >= chunking.next_chunk_timeout():
+                    self._write_chunk(chunking)
+                wake_up.append(chunking.next_chunk_timeout())
+                wake_up.append(chunking.created + self.sysex_deadline)
+        for transfer in self._sysex_in_flight.values():
+            if now >= transfer.next_timeout():
+                self._announce(transfer)
+            wake_up.append(transfer.next_timeout())
+            wake_up.append(transfer.created + self.sysex_deadline)
+        return failed, min(wake_up, default=None)
+
+    def _run_scheduler(self):
+        """Body of the thread repeating and failing SysEx announcements."""
+        while True:
+            with self._sysex_lock:
+                failed, wake_up = self._check_timeouts()
+                if not failed:
+                    timeout = None if wake_up is None else \
+                        max(0., wake_up - time.monotonic())
+                    self._sysex_cond.wait(timeout)
+            for transfer in failed:
+                transfer.fail("no confirmation received")
+
+    def _start_scheduler(self):
+        """Start the scheduler thread if not already started.
+
+        Must be called with `_sysex_lock` held.
+        """
+        if self._scheduler is None:
+            self._scheduler = threading.Thread(
+                target=self._run_scheduler, name="midiio-scheduler",
+                daemon=True)
+            self._scheduler.start()
+
+    def get_latency_stats(self) -> Dict[str, float]:
+        """
+        Return statistics about the confirmation round-trip time.
+
+        The distribution is computed over the last 1000 confirmed
+        announcements.
+
+        Returns
+        -------
+        Dict[str, float]
+            The summary of the "ack_rtt" histogram, see `Histogram.summary`.
+
+        """
+        return self.metrics.histogram("ack_rtt")
+
+    def get_metrics(self) -> Dict[str, dict]:
+        """
+        Return the counters and histograms measuring the traffic.
+
+        Counters:
+            - "messages_out", "bytes_out": SysEx written to the output port,
+              with their 0xF0 and 0xF7 bytes.
+            - "messages_in", "bytes_in": SysEx received from the Arduino.
+            - "sysex_queued": SysEx given to `send_sysex`.
+            - "direct_sysex": SysEx given to `send_direct_sysex`, including
+              the announcements.
+            - "announcements_repeated": announcements made again because
+              they were not confirmed in time.
+            - "confirmations": confirmations received.
+            - "chunk_acks": chunk acknowledgements received.
+            - "negotiations", "negotiations_failed": capabilities asked to
+              the Arduino, and left unanswered, see `negotiate`.
+            - "writes_paced": messages delayed by the pacing, see
+              `set_pacing`.
+            - "transfers_failed": SysEx that could not be sent.
+            - "transfers_cancelled": SysEx dropped with `cancel`.
+            - "transfers_superseded": SysEx dropped because a newer one made
+              them obsolete.
+            - "chunks_out": chunks written, see `set_chunk_size`.
+            - "chunks_repeated": chunks written again because they were not
+              acknowledged in time.
+            - "keyboards_in": keyboards decoded.
+            - "patches_rejected": patches of the current keyboard ignored by
+              the Arduino, see `patch_rejected_callback`.
+            - "frames_corrupted": keyboards received with a wrong check
+              byte.
+            - "frames_rejected": keyboards received malformed, see
+              `validate_frame`. With check bytes, they are intact and
+              skipped, see `rejected_callback`.
+            - "receive_dropped", "decode_errors": see `get_receive_stats`.
+
+        Histograms, in seconds:
+            - "queue_wait": time a SysEx waits before being announced.
+            - "queue_wait.control", "queue_wait.bulk": the same, by priority.
+            - "ack_rtt": time between an announcement and its confirmation.
+            - "chunk_ack_rtt": time between a chunk and its acknowledgement.
+            - "write_wait": time a message waits for the writer thread.
+            - "pacing_delay": time a message is delayed by the pacing.
+            - "decode.<keyboard class>": time to decode a keyboard.
+            - "callback": time spent in `callback`.
+
+        Returns
+        -------
+        Dict[str, dict]
+            See `TransportMetrics.snapshot`. The "gauges" entry also gives the
+            current "window", the number of SysEx "queued" (also by
+            priority, as "queued_control" and "queued_bulk") and "in_flight",
+            the number of SysEx being sent in chunks ("chunking") and waiting
+            for them ("held"), the "write_depth" and "receive_depth" of the
+            threads' queues, and the state of the pacing (see
+            `Pacer.get_state`) as "pacing_enabled", "link_capacity",
+            "pacing_rate" and "pacing_gain", in bytes per second.
+
+        """
+        metrics = self.metrics.snapshot()
+        with self._sysex_lock:
+            queued = [transfer.priority for transfer in self._sysex_queue]
+        metrics["gauges"] = {"window": self.get_window(),
+                             "queued": len(queued),
+                             "queued_control": queued.count("control"),
+                             "queued_bulk": queued.count("bulk"),
+                             "in_flight": len(self._sysex_in_flight),
+                             "chunking": int(self._chunking is not None),
+                             "held": len(self._held),
+                             "write_depth": len(self._write_queue),
+                             "receive_depth": len(self._recv_queue)}
+        pacing = self.pacer.get_state()
+        metrics["gauges"].update({"pacing_enabled": pacing["enabled"],
+                                  "link_capacity": pacing["capacity"],
+                                  "pacing_rate": pacing["rate"],
+                                  "pacing_gain": pacing["gain"]})
+        return metrics
+
+    def send_sysex(self, data: bytes, key: Hashable = None,
+                   replaces: Iterable[Hashable] = None,
+                   priority: str = None,
+                   resources: Iterable[Hashable] = ()) -> SysexTransfer:
+        """
+        Send a sysex message with given data.
+
+        Warn the receiver that a SysEx will be sent.
+        If the window of announced SysEx is full (see `set_window`), wait for
+        previous SysEx to be sent.
+        The announcement is repeated if not confirmed in time, and the SysEx
+        is failed if still not sent after `sysex_deadline` seconds.
+
+        The SysEx not yet announced whose key is in `replaces` are made
+        obsolete by this one: they are cancelled, with "superseded" as error.
+
+        Control SysEx are announced before the bulk ones queued earlier,
+        as long as they act on other resources and the oldest SysEx has not
+        waited for more than `bulk_max_wait` seconds.
+
+        A SysEx longer than the chunk size is sent in chunks once confirmed,
+        see `set_chunk_size`.
+
+        Parameters
+        ----------
+        data : list of bytes
+            Bytearray, list or tuple of bytes to send.
+        key : Hashable, optional
+            Identifies the operation performed by the SysEx, such as
+            `("current", <keyboard type>)`. The default is None.
+        replaces : Iterable[Hashable], optional
+            The keys of the operations made obsolete by this one. The queued
+            SysEx with these keys are dropped, unless a SysEx queued after
+            them acts on the same resources. The default is `(key,)` if `key`
+            is given, nothing otherwise.
+        priority : str, optional
+            "control" or "bulk". The default is "bulk" for keyboards (`0x01`
+            and `0x02`), "control" for other messages.
+        resources : Iterable[Hashable], optional
+            What the SysEx acts on, such as `(<keyboard type>, <name>)`. A
+            SysEx never overtakes a queued SysEx acting on the same
+            resources. The default is nothing.
+
+        Returns
+        -------
+        SysexTransfer
+            The transfer of the SysEx.
+
+        """
+        if priority is None:
+            priority = "bulk" if data[0] in (0x01, 0x02) else "control"
+        transfer = SysexTransfer(
+            mido.Message("sysex", data=bytes([0x7d]) + data), self, key,
+            priority, resources)
+        size = self._chunk_size
+        if size is not None and len(data) > size:
+            data = bytes(data)
+            transfer.chunks = [data[i:i+size]
+                               for i in range(0, len(data), size)]
+        if replaces is None:
+            replaces = () if key is None else (key,)
+        replaces = frozenset(replaces)
+        self.metrics.increment("sysex_queued")
+        with self._sysex_lock:
+            self._start_scheduler()
+            # A SysEx is kept if a SysEx queued after it acts on the same
+            # resources, as it may depend on it
+            superseded = []
+            used = set()
+            for queued in reversed(self._sysex_queue):
+                if(queued.key is not None and queued.key in replaces
+                   and not queued.resources & used):
+                    superseded.append(queued)
+                else:
+                    used |= queued.resources
+            for queued in superseded:
+                self._sysex_queue.remove(queued)
+                queued.status = "cancelled"
+            self._sysex_queue.append(transfer)
+            self._fill_window()
+            self._sysex_cond.notify()
+        for queued in superseded:
+            self.metrics.increment("transfers_superseded")
+            queued._finish("cancelled", "superseded")  # pylint: disable=W0212
+        return transfer
+
+    def cancel(self, transfer: SysexTransfer) -> bool:
+        """
+        Drop a SysEx given to `send_sysex` if it is not announced yet.
+
+        The transfer's status becomes "cancelled". An announced SysEx is
+        always sent, as the receiver is waiting for it.
+
+        Parameters
+        ----------
+        transfer : SysexTransfer
+            The transfer to cancel.
+
+        Returns
+        -------
+        bool
+            True if the transfer is cancelled, False if it is already
+            announced or done.
+
+        """
+        with self._sysex_lock:
+            if transfer.status != "queued":
+                return False
+            try:
+                self._sysex_queue.remove(transfer)
+            except ValueError:
+                return False
+            transfer.status = "cancelled"
+        self.metrics.increment("transfers_cancelled")
+        transfer._finish("cancelled")  # pylint: disable=W0212
+        return True
+
+    def _send_pre_sysex(self, sequence: int = None,
+                        transfer: SysexTransfer = None):
+        """Warn the receiver that a long SysEx will be sent.
+
+        If `sequence` is given, the receiver must send it back in its
+        confirmation. If `transfer` is given, the time the announcement is
+        written is recorded in `transfer.written`.
+        """
+        data = bytes([0x7d, 0x0f])
+        if sequence is not None:
+            data += bytes([sequence])
+        self.metrics.increment("direct_sysex")
+        self._write(mido.Message("sysex", data=data), acked=transfer)
+
+    # Writer thread
+
+    def send_direct_sysex(self, data: bytes):
+        """
+        Send a sysex message with given data.
+
+        The SysEx is immediatly handed to the writer thread, without warning
+        the receiver. To warn the receiver that a SysEx will be sent, use
+        send_sysex() instead.
+
+        Parameters
+        ----------
+        data : list of bytes
+            Bytearray, list or tuple of bytes to send.
+
+        Returns
+        -------
+        None.
+
+        """
+        msg = mido.Message("sysex", data=bytes([0x7d]) + data)
+        self.metrics.increment("direct_sysex")
+        self._write(msg)
+
+    def _write(self, msg: mido.Message, transfer: SysexTransfer = None,
+               acked: SysexTransfer = None):
+        """Queue `msg` to be written by the writer thread.
+
+        If given, `transfer` is confirmed once `msg` is written. If given,
+        `acked` is the transfer whose acknowledgement `msg` waits for.
+        """
+        self._start_writer()
+        with self._write_cond:
+            self._write_queue.append((msg, transfer, time.monotonic(),
+                                      acked))
+            self._write_cond.notify_all()
+
+    def _run_writer(self):
+        """Body of the thread owning `outport` and writing queued messages."""
+        while True:
+            with self._write_cond:
+                self._writing = False
+                self._write_cond.notify_all()
+                while not self._write_queue:
+                    self._write_cond.wait()
+                msg, transfer, queued, acked = self._write_queue.popleft()
+                self._writing = True
+            self.metrics.observe("write_wait", time.monotonic() - queued)
+            size = len(msg.data) + 2
+            delay = self.pacer.delay(size)
+            if delay > 0:
+                self.metrics.increment("writes_paced")
+                self.metrics.observe("pacing_delay", delay)
+                time.sleep(delay)
+            try:
+                self.outport.send(msg)
+            except Exception as err:  # pylint: disable=W0703
+                if transfer is None:
+                    traceback.print_exc()
+                else:
+                    transfer.fail("write error: {}".format(err))
+            else:
+                written = self.pacer.written(size)
+                if acked is not None:
+                    acked.written = written
+                self.metrics.increment("messages_out")
+                self.metrics.increment("bytes_out", size)
+                if transfer is not None:
+                    transfer.confirm()
+
+    def _start_writer(self):
+        """Start the writer thread if not already started."""
+        with self._write_cond:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(
+                target=self._run_writer, name="midiio-writer", daemon=True)
+            self._writer.start()
+
+    def flush(self, timeout: float = 1.) -> bool:
+        """
+        Wait until every queued message is written to the output port.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait, in seconds. The default is 1.
+
+        Returns
+        -------
+        bool
+            True if every message is written, False if the timeout expired.
+
+        """
+        if self._writer is None:
+            return not self._write_queue
+        with self._write_cond:
+            return self._write_cond.wait_for(
+                lambda: not self._write_queue and not self._writing, timeout)
+
+    # Receiver thread
+
+    def _check_frame(self, data: bytes) -> bool:
+        """
+        Check the check byte of a received keyboard frame.
+
+        A corrupted frame is counted in "frames_corrupted" and reported to
+        `corrupted_callback`.
+
+        Parameters
+        ----------
+        data : bytes
+            The SysEx data, from the origin byte to the check byte.
+
+        Returns
+        -------
+        bool
+            True if the frame is intact.
+
+        """
+        if len(data) > 2 and (sum(data) - data[0]) & 0x7f == 0:
+            return True
+        self.metrics.increment("frames_corrupted")
+        if self.corrupted_callback is not None:
+            self.corrupted_callback()
+        return False
+
+    def _report_rejected_frame(self, data: bytes):
+        """
+        Call `rejected_callback` for an intact keyboard frame that can't be
+        decoded.
+
+        Parameters
+        ----------
+        data : bytes
+            The SysEx data, from the origin byte.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.rejected_callback is None:
+            return
+        kbd_type = keyboard_types.get(data[1])
+        try:
+            name, _ = decode_name(data, 2, self.compact_names)
+        except ValueError:
+            name = None
+        self.rejected_callback("EEPROM" if data[0] == 1 else "RAM",
+                               kbd_type, name)
+
+    def _process_sysex(self, data: bytes):
+        if data:
+            if (data[0] == 1 or  # receiving a keyboard from EEPROM
+               data[0] == 2):  # receiving a keyboard from RAM
+                # The frame is decoded in place, its check byte is ignored
+                if self.frame_checksums and not self._check_frame(data):
+                    return
+                end = len(data) - 1 if self.frame_checksums else len(data)
+                if not validate_frame(data, 1, end, self.compact_names):
+                    self.metrics.increment("frames_rejected")
+                    if self.frame_checksums:
+                        # Intact: it would be rejected again if asked again
+                        self._report_rejected_frame(data)
+                    elif self.corrupted_callback is not None:
+                        self.corrupted_callback()
+                    return
+                start = time.perf_counter()
+                keyboard = keyboard_daos[data[1]](self).from_bytes(data, 1)
+                decoded = time.perf_counter()
+                self.metrics.observe(
+                    "decode." + type(keyboard).__name__, decoded - start)
+                self.metrics.increment("keyboards_in")
+                self.callback(keyboard, "EEPROM" if data[0] == 1 else "RAM")
+                self.metrics.observe("callback",
+                                     time.perf_counter() - decoded)
+            elif data[0] == 0x10:  # patch of the current keyboard ignored
+                self.metrics.increment("patches_rejected")
+                if self.patch_rejected_callback is not None:
+                    self.patch_rejected_callback(keyboard_types.get(data[1]))
+            elif data[0] == 0x00:  # end of the keyboards sent for a fetch
+                if self.end_callback is not None:
+                    self.end_callback()
+            elif data[0] == 0x60:  # capabilities of the Arduino
+                self._remote_capabilities = Capabilities.from_bytes(data[1:])
+                self._capabilities_received.set()
+            elif data[0] == 0x20:  # list of the keyboards
+                if self.inventory_callback is not None:
+                    self.inventory_callback(
+                        KeyboardMidiDAO.inventory_from_bytes(
+                            data[1:], self.compact_names))
+
+    def _run_receiver(self):
+        """Body of the thread decoding the received SysEx."""
+        while True:
+            self._recv_event.wait()
+            self._recv_event.clear()
+            while self._recv_queue:
+                data = self._recv_queue.popleft()
+                try:
+                    self._process_sysex(data)
+                except Exception:  # pylint: disable=W0703
+                    self._recv_stats["errors"] += 1
+                    self.metrics.increment("decode_errors")
+                    traceback.print_exc()
+
+    def _start_receiver(self):
+        """Start the receiver thread if not already started."""
+        if self._receiver is None:
+            self._receiver = threading.Thread(
+                target=self._run_receiver, name="midiio-receiver",
+                daemon=True)
+            self._receiver.start()
+
+    def get_receive_stats(self) -> Dict[str, int]:
+        """
+        Return statistics about the received SysEx.
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of SysEx "received", their size in "bytes", the number
+            of SysEx "dropped" because the decoding queue was full, the
+            current "depth" and the "max_depth" reached by the queue, and the
+            number of SysEx that could not be decoded ("errors").
+
+        """
+        stats = dict(self._recv_stats)
+        stats["depth"] = len(self._recv_queue)
+        return stats
+
+    def _message_recv(self, message: mido.Message):
+        """Receive messages callback.
+
+        Confirmations are processed immediately, other SysEx are handed to
+        the receiver thread so the MIDI input thread is never blocked by
+        decoding.
+        """
+        if message.type == "sysex":
+            data = message.data
+            if data and data[0] == 0x7d:
+                self.metrics.increment("messages_in")
+                self.metrics.increment("bytes_in", len(data) + 2)
+                if len(data) > 1 and data[1] == 0x0F:
+                    self.metrics.increment("confirmations")
+                    self._process_confirmation(data[1:])
+                    return
+                if len(data) > 1 and data[1] == 0x30:
+                    self.metrics.increment("chunk_acks")
+                    self._process_chunk_ack(data[1:])
+                    return
+                stats = self._recv_stats
+                stats["received"] += 1
+                stats["bytes"] += len(data)
+                depth = len(self._recv_queue)
+                if depth >= self.receive_queue_size:
+                    stats["dropped"] += 1
+                    self.metrics.increment("receive_dropped")
+                    return
+                self._recv_queue.append(data[1:])
+                self._recv_event.set()
+                if depth >= stats["max_depth"]:
+                    stats["max_depth"] = depth + 1
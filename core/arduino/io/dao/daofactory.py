@@ -11,9 +11,8 @@ class DAOFactory(ABC):
     def __init__(self):
         pass
 
-    @staticmethod
     @abstractmethod
-    def get_generic_keyboard_dao() -> KeyboardDAO:
+    def get_generic_keyboard_dao(self) -> KeyboardDAO:
         """
         Return the generic keyboard's DAO.
 
@@ -24,9 +23,8 @@ class DAOFactory(ABC):
 
         """
 
-    @staticmethod
     @abstractmethod
-    def get_left_96_button_keyboard_dao() -> KeyboardDAO:
+    def get_left_96_button_keyboard_dao(self) -> KeyboardDAO:
         """
         Return the appropriate Left96ButtonKeyboard's DAO.
 
@@ -37,9 +35,8 @@ class DAOFactory(ABC):
 
         """
 
-    @staticmethod
     @abstractmethod
-    def get_right_81_button_keyboard_dao() -> KeyboardDAO:
+    def get_right_81_button_keyboard_dao(self) -> KeyboardDAO:
         """
         Return the appropriate Right81ButtonKeyboard's DAO.
 
@@ -54,21 +51,38 @@ class DAOFactory(ABC):
 class MidiDAOFactory(DAOFactory):
     """Factory for creating KeyboardMidiDAO."""
 
-    @staticmethod
-    def get_generic_keyboard_dao() -> type:
+    def __init__(self, connection: 'MidiConnection' = None):
+        """
+        Create a factory of DAOs using the given connection.
+
+        Parameters
+        ----------
+        connection : MidiConnection, optional
+            The connection to the Arduino. The default is
+            `midiio.default_connection`.
+
+        Returns
+        -------
+        None.
+
+        """
+        super().__init__()
+        self.connection = connection
+
+    def get_generic_keyboard_dao(self) -> KeyboardMidiDAO:
         """
         Return the generic KeyboardMidiDAO.
 
         Returns
         -------
-        type
+        KeyboardMidiDAO
             The KeyboardMidiDAO.
 
         """
-        return KeyboardMidiDAO
+        return KeyboardMidiDAO(self.connection)
 
-    @staticmethod
-    def get_left_96_button_keyboard_dao() -> Left96ButtonKeyboardMidiDAO:
+    def get_left_96_button_keyboard_dao(self
+                                        ) -> Left96ButtonKeyboardMidiDAO:
         """
         Return the Left96ButtonKeyboardMidiDAO.
 
@@ -78,10 +92,10 @@ class MidiDAOFactory(DAOFactory):
             The Left96ButtonKeyboardMidiDAO.
 
         """
-        return Left96ButtonKeyboardMidiDAO()
+        return Left96ButtonKeyboardMidiDAO(self.connection)
 
-    @staticmethod
-    def get_right_81_button_keyboard_dao() -> Right81ButtonKeyboardMidiDAO:
+    def get_right_81_button_keyboard_dao(self
+                                         ) -> Right81ButtonKeyboardMidiDAO:
         """
         Return the Right81ButtonKeyboardMidiDAO.
 
@@ -91,4 +105,4 @@ class MidiDAOFactory(DAOFactory):
             The Right81ButtonKeyboardMidiDAO.
 
         """
-        return Right81ButtonKeyboardMidiDAO()
+        return Right81ButtonKeyboardMidiDAO(self.connection)
@@ -10,9 +10,8 @@ class KeyboardDAO(ABC):
     def __init__(self):
         pass
 
-    @staticmethod
     @abstractmethod
-    def send_fetch_keyboards():
+    def send_fetch_keyboards(self):
         """
         Ask remote to send keyboards.
 
@@ -23,7 +22,37 @@ class KeyboardDAO(ABC):
         """
 
     @abstractmethod
-    def send_set_current_keyboard(self, kbd: Keyboard) -> None:
+    def send_list_keyboards(self):
+        """
+        Ask remote to send the type, name and checksum of its keyboards.
+
+        Returns
+        -------
+        None.
+
+        """
+
+    @abstractmethod
+    def send_fetch_keyboard(self, name: str, origin: str = "EEPROM"):
+        """
+        Ask remote to send one keyboard.
+
+        Parameters
+        ----------
+        name : str
+            The name of the keyboard.
+        origin : str, optional
+            The keyboard's origin ("EEPROM" or "RAM"). The default is
+            "EEPROM".
+
+        Returns
+        -------
+        None.
+
+        """
+
+    @abstractmethod
+    def send_set_current_keyboard(self, kbd: Keyboard):
         """
         Set the given keyboard as current on remote.
 
@@ -34,12 +63,33 @@ class KeyboardDAO(ABC):
 
         Returns
         -------
-        None.
+        object
+            An object following the transfer of the keyboard.
 
         """
 
     @abstractmethod
-    def send_store_keyboard(self, kbd: Keyboard) -> None:
+    def send_patch_current_keyboard(self, kbd: Keyboard, base: Keyboard):
+        """
+        Set the given keyboard as current on remote, sending only the keys
+        that differ from `base`.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to set.
+        base : Keyboard
+            The current keyboard of remote, of the same type and name.
+
+        Returns
+        -------
+        object
+            An object following the transfer of the keyboard.
+
+        """
+
+    @abstractmethod
+    def send_store_keyboard(self, kbd: Keyboard):
         """
         Store the given keyboard on remote.
 
@@ -50,12 +100,13 @@ class KeyboardDAO(ABC):
 
         Returns
         -------
-        None.
+        object
+            An object following the transfer of the keyboard.
 
         """
 
     @abstractmethod
-    def send_delete_keyboard(self, kbd: Keyboard) -> None:
+    def send_delete_keyboard(self, kbd: Keyboard):
         """
         Delete the given keyboard from remote.
 
@@ -66,12 +117,13 @@ class KeyboardDAO(ABC):
 
         Returns
         -------
-        None.
+        object
+            An object following the transfer of the deletion request.
 
         """
 
     @abstractmethod
-    def send_rename_keyboard(self, kbd: Keyboard, new_name: str) -> None:
+    def send_rename_keyboard(self, kbd: Keyboard, new_name: str):
         """
         Rename the given keyboard on remote.
 
@@ -84,6 +136,7 @@ class KeyboardDAO(ABC):
 
         Returns
         -------
-        None.
+        object
+            An object following the transfer of the renaming request.
 
         """
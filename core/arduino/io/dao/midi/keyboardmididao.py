@@ -1,60 +1,351 @@
 """Definition of keyboard's DAO using MIDI protocol."""
 
 import base64
+import weakref
+from copy import deepcopy
+from typing import List, Tuple
 
-from abc import abstractmethod
 import core.arduino.io.midiio as midiio
 from core.keyboard import Keyboard, Left96ButtonKeyboard,\
-    Right81ButtonKeyboard, NoteData, ProgramData, ControlData
+    Right81ButtonKeyboard
 from ..keyboarddao import KeyboardDAO
-from .mididatamididao import NoteDataMidiDAO, ProgramDataMidiDAO,\
-    ControlDataMidiDAO
+from .mididatamididao import midi_data_decoders, midi_data_limits,\
+    get_midi_data_encoder
+
+
+def frame_checksum(frame: bytes) -> int:
+    """
+    Compute the checksum of a keyboard frame (`<type> <name> <data>`).
+
+    The checksum is a Fletcher checksum modulo 127, so each of its two
+    halves fits in a SysEx data byte.
+
+    Parameters
+    ----------
+    frame : bytes
+        The keyboard frame, as stored by the Arduino.
+
+    Returns
+    -------
+    int
+        The checksum, on 14 bits (`sum2 << 7 | sum1`).
+
+    """
+    sum1 = sum2 = 0
+    for byte in frame:
+        sum1 = (sum1 + byte) % 127
+        sum2 = (sum2 + sum1) % 127
+    return sum2 << 7 | sum1
+
+
+def pack_7bit(data: bytes) -> bytes:
+    """
+    Pack 8-bit bytes into 7-bit SysEx data bytes.
+
+    Each group of at most 7 bytes is preceded by a byte holding their most
+    significant bits (the bit `i` for the `i`-th byte of the group), then
+    sent without their most significant bit.
+
+    Parameters
+    ----------
+    data : bytes
+        The bytes to pack.
+
+    Returns
+    -------
+    bytes
+        The packed bytes, `packed_size(len(data))` long.
+
+    """
+    packed = bytearray()
+    for start in range(0, len(data), 7):
+        group = data[start:start+7]
+        msbs = 0
+        for i, byte in enumerate(group):
+            msbs |= (byte >> 7) << i
+        packed.append(msbs)
+        packed.extend(byte & 0x7f for byte in group)
+    return bytes(packed)
+
+
+def unpack_7bit(data: bytes) -> bytes:
+    """
+    Unpack bytes packed with `pack_7bit`.
+
+    Parameters
+    ----------
+    data : bytes, tuple or list of bytes
+        The packed bytes.
+
+    Returns
+    -------
+    bytes
+        The original bytes.
+
+    """
+    unpacked = bytearray()
+    for start in range(0, len(data), 8):
+        msbs = data[start]
+        for i, byte in enumerate(data[start+1:start+8]):
+            unpacked.append(byte | (msbs >> i & 1) << 7)
+    return bytes(unpacked)
+
+
+def packed_size(size: int) -> int:
+    """Return the length of `size` bytes packed with `pack_7bit`."""
+    return size + (size + 6) // 7
+
+
+def encode_name(name: str, compact: bool = False) -> bytes:
+    """
+    Encode a keyboard's name as sent on the wire.
+
+    Parameters
+    ----------
+    name : str
+        The name.
+    compact : bool, optional
+        If False, the UTF-8 name is base-64 encoded and ends with `0x00`.
+        If True, it is preceded by its length and packed with `pack_7bit`.
+        The default is False.
+
+    Raises
+    ------
+    ValueError
+        The name is longer than 127 UTF-8 bytes in compact encoding.
+
+    Returns
+    -------
+    bytes
+        The encoded name.
+
+    """
+    raw = name.encode('utf-8')
+    if not compact:
+        return base64.b64encode(raw) + bytes([0x00])
+    if len(raw) > 127:
+        raise ValueError("name too long: {} bytes".format(len(raw)))
+    return bytes([len(raw)]) + pack_7bit(raw)
+
+
+def decode_name(data: bytes, index: int = 0,
+                compact: bool = False) -> Tuple[str, int]:
+    """
+    Decode a keyboard's name encoded with `encode_name`.
+
+    Parameters
+    ----------
+    data : bytes, tuple or list of bytes
+        The bytes containing the name.
+    index : int, optional
+        The position of the name in `data`. The default is 0.
+    compact : bool, optional
+        Whether the name uses the compact encoding. The default is False.
+
+    Raises
+    ------
+    ValueError
+        The name is truncated or not valid.
+
+    Returns
+    -------
+    str
+        The name.
+    int
+        The position following the name in `data`.
+
+    """
+    if not compact:
+        end = data.index(0x00, index)
+        return bytes.decode(base64.b64decode(bytes(data[index:end]),
+                                             validate=True),
+                            'utf-8'), end + 1
+    if index >= len(data):
+        raise ValueError("truncated name")
+    end = index + 1 + packed_size(data[index])
+    if end > len(data):
+        raise ValueError("truncated name")
+    return bytes.decode(unpack_7bit(data[index+1:end]), 'utf-8'), end
+
+
+def frame_check_byte(frame: bytes) -> int:
+    """
+    Compute the check byte ending a keyboard frame sent with checksums.
+
+    The check byte makes the sum of the frame's bytes, check byte included,
+    a multiple of 128.
+
+    Parameters
+    ----------
+    frame : bytes
+        The keyboard frame (`<type> <name> <data>`).
+
+    Returns
+    -------
+    int
+        The check byte, from 0 to 127.
+
+    """
+    return -sum(frame) & 0x7f
+
+
+def _left96_wire_order() -> Tuple[int, ...]:
+    """Return the keys of a Left96ButtonKeyboard in wire order (from 0)."""
+    order = []
+    keyboard_index = -1
+    for _ in range(96):
+        order.append(keyboard_index+1)
+        keyboard_index = (keyboard_index + 16) % 95
+    return tuple(order)
+
+
+def _right81_wire_order() -> Tuple[int, ...]:
+    """Return the keys of a Right81ButtonKeyboard in wire order (from 0)."""
+    order = [66, 17, 34, 50, 67]
+    for j in range(14):
+        order.extend(first+j for first in (1, 18, 35, 51, 68))
+    order.extend((15, 32, 49, 65, 16, 33))
+    return tuple(identifier-1 for identifier in order)
+
+
+keyboard_daos = {}
+"""DAO of each type of keyboard, by type byte."""
+
+keyboard_types = {}
+"""Class of each type of keyboard, by type byte."""
+
+
+def register_keyboard_dao(dao: type) -> type:
+    """
+    Register a KeyboardMidiDAO in `keyboard_daos` and `keyboard_types`.
+
+    Can be used as a class decorator.
+
+    Parameters
+    ----------
+    dao : type
+        The KeyboardMidiDAO of a type of keyboard.
+
+    Returns
+    -------
+    type
+        `dao`.
+
+    """
+    # pylint: disable=W0212
+    keyboard_daos[dao._keyboard_type] = dao
+    keyboard_types[dao._keyboard_type] = dao._keyboard_class
+    return dao
+
+
+def validate_frame(data: bytes, index: int = 0, end: int = None,
+                   compact_names: bool = False) -> bool:
+    """
+    Check a keyboard frame (`<type> <name> <data>`) before decoding it.
+
+    The frame is read once, without creating any keyboard nor midi data:
+    its type of keyboard and the type of each midi data must be registered,
+    its name must be valid, each byte of the midi data must be in range and
+    the frame must end exactly at `end`.
+
+    Parameters
+    ----------
+    data : bytes, tuple or list of bytes
+        Part of the SysEx message containing the keyboard.
+    index : int, optional
+        The position of the keyboard in `data`. The default is 0.
+    end : int, optional
+        The position following the keyboard in `data`. The default is the
+        length of `data`.
+    compact_names : bool, optional
+        Whether the name uses the compact encoding, see `encode_name`.
+        The default is False.
+
+    Returns
+    -------
+    bool
+        True if the frame can be decoded.
+
+    """
+    if end is None:
+        end = len(data)
+    if index >= end or data[index] not in keyboard_daos:
+        return False
+    # pylint: disable=W0212
+    keys = len(keyboard_daos[data[index]]._wire_order)
+    try:
+        _, index = decode_name(data, index+1, compact_names)
+    except ValueError:
+        return False
+    get_limits = midi_data_limits.get
+    for _ in range(keys):
+        if index >= end:
+            return False
+        limits = get_limits(data[index])
+        if limits is None:
+            return False
+        index += 1
+        for limit in limits:
+            if index >= end or not 0 <= data[index] <= limit:
+                return False
+            index += 1
+    return index == end
 
 
 class KeyboardMidiDAO(KeyboardDAO):
     """Abstract class for representing a keyboard's DAO using MIDI."""
 
-    def __init__(self):
-        super().__init__()
-        self._keyboard_type = None
+    _keyboard_type = None
+    """The type byte of the keyboards of the DAO."""
 
-    @staticmethod
-    def _get_midi_data(data, data_index):
-        data_midi_dao = None
-        if data[data_index] == 0x00:
-            return None, 1
-        elif data[data_index] == 0x01:
-            data_midi_dao = NoteDataMidiDAO
-        elif data[data_index] == 0x02:
-            data_midi_dao = ProgramDataMidiDAO
-        elif data[data_index] == 0x03:
-            data_midi_dao = ControlDataMidiDAO()
-        return data_midi_dao.from_bytes(data[data_index:])
+    _keyboard_class = None
+    """The type of keyboard of the DAO."""
+
+    _wire_order = ()
+    """Index in `Keyboard.keyboard` of each key, in the order of the Arduino's
+    memory representation. Computed once per type of keyboard."""
+
+    _encoded = {}
+    """Last encoding of each keyboard, by `id`: a weak reference to the
+    keyboard, its `Keyboard.version`, whether the name is compact, its
+    entries and its SysEx bytes. Shared by all the DAOs."""
+
+    def __init__(self, connection: 'midiio.MidiConnection' = None):
+        """
+        Create a DAO sending its requests through `connection`.
+
+        Parameters
+        ----------
+        connection : MidiConnection, optional
+            The connection to the Arduino. The default is
+            `midiio.default_connection`.
+
+        Returns
+        -------
+        None.
+
+        """
+        super().__init__()
+        if connection is None:
+            connection = midiio.default_connection
+        self.connection = connection
 
     @staticmethod
     def _get_midi_data_bytes(midi_data):
-        midi_dao = None
-        if isinstance(midi_data, NoteData):
-            midi_dao = NoteDataMidiDAO
-        elif isinstance(midi_data, ProgramData):
-            midi_dao = ProgramDataMidiDAO
-        elif isinstance(midi_data, ControlData):
-            midi_dao = ControlDataMidiDAO
-
-        if midi_dao:
-            return midi_dao.to_bytes(midi_data)
-        else:
-            return bytes([0x00])
+        return get_midi_data_encoder(type(midi_data))(midi_data)
 
-    @abstractmethod
-    def from_bytes(self, data: bytes) -> Keyboard:
+    def from_bytes(self, data: bytes, index: int = 0) -> Keyboard:
         """
         Create a Keyboard from SysEx bytes.
 
+        The generic DAO delegates to the DAO of the keyboard's type.
+
         Parameters
         ----------
         data : bytes, tuple or list of bytes
             Part of the SysEx message containing the keyboard.
+        index : int, optional
+            The position of the keyboard in `data`. The default is 0.
 
         Returns
         -------
@@ -62,6 +353,190 @@ class KeyboardMidiDAO(KeyboardDAO):
             The created keyboard, or None if not a valid keyboard.
 
         """
+        dao_type = keyboard_daos.get(data[index])
+        if dao_type is None:
+            return None
+        return dao_type(self.connection).from_bytes(data, index)
+
+    @staticmethod
+    def inventory_from_bytes(data: bytes, compact_names: bool = False
+                             ) -> List[Tuple[str, type, str, int]]:
+        """
+        Read the list of keyboards sent by remote.
+
+        Parameters
+        ----------
+        data : bytes, tuple or list of bytes
+            Part of the SysEx message following the list command (`0x20`).
+        compact_names : bool, optional
+            Whether the names use the compact encoding, see `encode_name`.
+            The default is False.
+
+        Returns
+        -------
+        List[Tuple[str, type, str, int]]
+            For each keyboard, its origin ("EEPROM" or "RAM"), its type, its
+            name and the checksum of its frame. Keyboards of unknown type
+            are skipped.
+
+        """
+        data = bytes(data)
+        inventory = []
+        index = 0
+        while index < len(data):
+            name, end = decode_name(data, index+2, compact_names)
+            checksum = data[end] << 7 | data[end+1]
+            if data[index+1] in keyboard_types:
+                inventory.append(("EEPROM" if data[index] == 0x01 else "RAM",
+                                  keyboard_types[data[index+1]], name,
+                                  checksum))
+            index = end + 2
+        return inventory
+
+    def get_checksum(self, kbd: Keyboard) -> int:
+        """
+        Return the checksum of the frame of a Keyboard.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard.
+
+        Returns
+        -------
+        int
+            See `frame_checksum`.
+
+        """
+        return frame_checksum(self._to_bytes(kbd))
+
+    def _encode_name(self, name: str) -> bytes:
+        """Encode `name` with the encoding used by the connection."""
+        return encode_name(name, self.connection.compact_names)
+
+    def _decode_name(self, data: bytes, index: int) -> Tuple[str, int]:
+        """Decode the name at `index` of `data`, see `decode_name`."""
+        return decode_name(data, index, self.connection.compact_names)
+
+    def _keyboard_from_bytes(self, data: bytes, index: int) -> Keyboard:
+        """
+        Create a Keyboard of the DAO's type from SysEx bytes.
+
+        The keys are read in a single pass, following `_wire_order`, at
+        their offset in `data` so that the frame is never copied.
+
+        Parameters
+        ----------
+        data : bytes, tuple or list of bytes
+            Part of the SysEx message containing the keyboard.
+        index : int
+            The position of the keyboard in `data`.
+
+        Returns
+        -------
+        Keyboard
+            The created keyboard.
+
+        """
+        keyboard = self._keyboard_class()
+        keyboard.name, data_index = self._decode_name(data, index+1)
+        keys = keyboard.keyboard
+        decoders = midi_data_decoders
+        for keyboard_index in self._wire_order:
+            keys[keyboard_index], skip = decoders[data[data_index]](
+                data, data_index)
+            data_index += skip
+        keyboard.version += 1
+        return keyboard
+
+    def _encode(self, kbd: Keyboard) -> Tuple[Tuple[bytes, ...], bytes]:
+        """
+        Encode a Keyboard, unless it didn't change since its last encoding.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to convert.
+
+        Returns
+        -------
+        Tuple[bytes, ...]
+            The encoded midi data of each key, in wire order.
+        bytes
+            The SysEx bytes of the keyboard (`<type> <name> <data>`).
+
+        """
+        compact = self.connection.compact_names
+        cached = self._encoded.get(id(kbd))
+        if(cached is not None and cached[0]() is kbd
+           and cached[1] == kbd.version and cached[2] == compact):
+            return cached[3], cached[4]
+        version = kbd.version
+        keys = kbd.keyboard
+        get_midi_data_bytes = self._get_midi_data_bytes
+        entries = tuple([get_midi_data_bytes(keys[keyboard_index])
+                         for keyboard_index in self._wire_order])
+        data = bytearray([self._keyboard_type])
+        data += self._encode_name(kbd.name)
+        for entry in entries:
+            data += entry
+        data = bytes(data)
+        self._remember(kbd, version, compact, entries, data)
+        return entries, data
+
+    def _remember(self, kbd: Keyboard, version: int, compact: bool,
+                  entries: Tuple[bytes, ...], data: bytes):
+        """Record the encoding of `kbd` at `version` in `_encoded`."""
+        key = id(kbd)
+        cached = self._encoded.get(key)
+        if cached is not None and cached[0]() is kbd:
+            reference = cached[0]
+        else:
+            # The entry is removed with the keyboard, before its id is reused
+            reference = weakref.ref(
+                kbd, lambda _: KeyboardMidiDAO._encoded.pop(key, None))
+        self._encoded[key] = (reference, version, compact, entries, data)
+
+    def copy_keyboard(self, kbd: Keyboard) -> Keyboard:
+        """
+        Return a deep copy of a Keyboard sharing its encoding.
+
+        Neither the keyboard nor its copy are encoded again until changed.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to copy.
+
+        Returns
+        -------
+        Keyboard
+            The copy.
+
+        """
+        entries, data = self._encode(kbd)
+        copy = deepcopy(kbd)
+        self._remember(copy, copy.version, self.connection.compact_names,
+                       entries, data)
+        return copy
+
+    def _to_entries(self, kbd: Keyboard) -> Tuple[bytes, ...]:
+        """
+        Create the midi data entries of a Keyboard, in wire order.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to convert.
+
+        Returns
+        -------
+        Tuple[bytes, ...]
+            The encoded midi data of each key, in the order of the Arduino's
+            memory representation.
+
+        """
+        return self._encode(kbd)[0]
 
     def _to_bytes(self, kbd: Keyboard) -> bytes:
         """
@@ -78,9 +553,64 @@ class KeyboardMidiDAO(KeyboardDAO):
             The created bytearray.
 
         """
+        return self._encode(kbd)[1]
 
-    @staticmethod
-    def send_fetch_keyboards():
+    def _to_frame(self, kbd: Keyboard, command: int) -> bytes:
+        """
+        Create the SysEx bytearray of a Keyboard, as sent to remote.
+
+        The frame follows the command byte and ends with its check byte if
+        the connection uses frame checksums.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to convert.
+        command : int
+            The command byte (`0x01` to store, `0x02` to set as current).
+
+        Returns
+        -------
+        bytes
+            The created bytearray.
+
+        """
+        data = bytearray([command])
+        data += self._encode(kbd)[1]
+        if self.connection.frame_checksums:
+            data.append(frame_check_byte(memoryview(data)[1:]))
+        return bytes(data)
+
+    def _to_patch_bytes(self, kbd: Keyboard, base: Keyboard) -> bytes:
+        """
+        Create a SysEx bytearray of the keys of `kbd` that differ from `base`.
+
+        The keys follow the checksum of `base`, so that remote applies the
+        patch only to the keyboard it was computed against.
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to convert.
+        base : Keyboard
+            The keyboard the patch applies to.
+
+        Returns
+        -------
+        bytes
+            The created bytearray.
+
+        """
+        checksum = frame_checksum(self._to_bytes(base))
+        data = bytearray([self._keyboard_type, checksum >> 7, checksum & 0x7f])
+        for position, (entry, base_entry) in enumerate(
+                zip(self._to_entries(kbd), self._to_entries(base))):
+            if entry != base_entry:
+                data.append(position)
+                data += entry
+        return bytes(data)
+
+    def send_fetch_keyboards(self):
         """
         Ask remote to send keyboards.
 
@@ -89,9 +619,44 @@ class KeyboardMidiDAO(KeyboardDAO):
         None.
 
         """
-        midiio.send_direct_sysex(bytes([0x00]))
+        self.connection.send_direct_sysex(bytes([0x00]))
 
-    def send_set_current_keyboard(self, kbd: Keyboard) -> None:
+    def send_list_keyboards(self):
+        """
+        Ask remote to send the type, name and checksum of its keyboards.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.connection.send_direct_sysex(bytes([0x20]))
+
+    def send_fetch_keyboard(self, name: str, origin: str = "EEPROM"):
+        """
+        Ask remote to send one keyboard.
+
+        Parameters
+        ----------
+        name : str
+            The name of the keyboard.
+        origin : str, optional
+            The keyboard's origin ("EEPROM" or "RAM"). The default is
+            "EEPROM".
+
+        Returns
+        -------
+        None.
+
+        """
+        data = bytes([0x40])
+        data += bytes([0x01 if origin == "EEPROM" else 0x02])
+        data += bytes([self._keyboard_type])
+        data += self._encode_name(name)
+        self.connection.send_direct_sysex(data)
+
+    def send_set_current_keyboard(self, kbd: Keyboard
+                                  ) -> 'midiio.SysexTransfer':
         """
         Set the given keyboard as current on remote.
 
@@ -102,14 +667,49 @@ class KeyboardMidiDAO(KeyboardDAO):
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the keyboard.
 
         """
-        data = bytes([0x02])
-        data += self._to_bytes(kbd)
-        midiio.send_sysex(data)
+        data = self._to_frame(kbd, 0x02)
+        return self.connection.send_sysex(
+            data, ("current", self._keyboard_type),
+            resources=[("current", self._keyboard_type)])
+
+    def send_patch_current_keyboard(self, kbd: Keyboard, base: Keyboard
+                                    ) -> 'midiio.SysexTransfer':
+        """
+        Set the given keyboard as current on remote, sending only the keys
+        that differ from `base`.
+
+        If the patch is not shorter than the whole keyboard, the whole
+        keyboard is sent instead. Remote ignores the patch if its current
+        keyboard is not `base`, and says so (see
+        `MidiConnection.patch_rejected_callback`).
+
+        Parameters
+        ----------
+        kbd : Keyboard
+            The keyboard to set.
+        base : Keyboard
+            The current keyboard of remote, of the same type and name.
+
+        Returns
+        -------
+        SysexTransfer
+            The transfer of the patch or of the keyboard.
 
-    def send_store_keyboard(self, kbd: Keyboard) -> None:
+        """
+        data = bytes([0x10]) + self._to_patch_bytes(kbd, base)
+        full = self._to_frame(kbd, 0x02)
+        if len(data) >= len(full):
+            data = full
+        return self.connection.send_sysex(
+            data, ("current", self._keyboard_type),
+            resources=[("current", self._keyboard_type)])
+
+    def send_store_keyboard(self, kbd: Keyboard
+                            ) -> 'midiio.SysexTransfer':
         """
         Store the given keyboard on remote.
 
@@ -120,14 +720,17 @@ class KeyboardMidiDAO(KeyboardDAO):
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the keyboard.
 
         """
-        data = bytes([0x01])
-        data += self._to_bytes(kbd)
-        midiio.send_sysex(data)
+        data = self._to_frame(kbd, 0x01)
+        return self.connection.send_sysex(
+            data, ("store", self._keyboard_type, kbd.name),
+            resources=[(self._keyboard_type, kbd.name)])
 
-    def send_delete_keyboard(self, kbd: Keyboard) -> None:
+    def send_delete_keyboard(self, kbd: Keyboard
+                             ) -> 'midiio.SysexTransfer':
         """
         Delete the given keyboard from remote.
 
@@ -138,17 +741,21 @@ class KeyboardMidiDAO(KeyboardDAO):
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the deletion request.
 
         """
         data = bytes([0x04])
         data += bytes([self._keyboard_type])
-        data += base64.b64encode(kbd.name.encode('utf-8'))
-        data += bytes([0x00])
-        midiio.send_sysex(data)
+        data += self._encode_name(kbd.name)
+        key = ("delete", self._keyboard_type, kbd.name)
+        # A keyboard waiting to be stored would be deleted anyway
+        return self.connection.send_sysex(
+            data, key, (key, ("store", self._keyboard_type, kbd.name)),
+            resources=[(self._keyboard_type, kbd.name)])
 
     def send_rename_keyboard(self, kbd: Keyboard,
-                             new_name: str) -> None:
+                             new_name: str) -> 'midiio.SysexTransfer':
         """
         Rename the given keyboard on remote.
 
@@ -161,26 +768,30 @@ class KeyboardMidiDAO(KeyboardDAO):
 
         Returns
         -------
-        None.
+        SysexTransfer
+            The transfer of the renaming request.
 
         """
         data = bytes([0x08])
         data += bytes([self._keyboard_type])
-        data += base64.b64encode(kbd.name.encode('utf-8'))
-        data += bytes([0x00])
-        data += base64.b64encode(new_name.encode('utf-8'))
-        data += bytes([0x00])
-        midiio.send_sysex(data)
+        data += self._encode_name(kbd.name)
+        data += self._encode_name(new_name)
+        return self.connection.send_sysex(
+            data, ("rename", self._keyboard_type, kbd.name, new_name),
+            resources=[(self._keyboard_type, kbd.name),
+                       (self._keyboard_type, new_name)])
 
 
+@register_keyboard_dao
 class Left96ButtonKeyboardMidiDAO(KeyboardMidiDAO):
     """Represent a 96 left button keyboard's DAO using MIDI."""
 
-    def __init__(self):
-        super().__init__()
-        self._keyboard_type = 0x02
+    _keyboard_type = 0x02
+    _keyboard_class = Left96ButtonKeyboard
+    _wire_order = _left96_wire_order()
 
-    def from_bytes(self, data: bytes) -> Left96ButtonKeyboard:
+    def from_bytes(self, data: bytes,
+                   index: int = 0) -> Left96ButtonKeyboard:
         """
         Create a Keyboard from SysEx bytes.
 
@@ -188,6 +799,8 @@ class Left96ButtonKeyboardMidiDAO(KeyboardMidiDAO):
         ----------
         data : bytes, tuple or list of bytes
             Part of the SysEx message containing the keyboard.
+        index : int, optional
+            The position of the keyboard in `data`. The default is 0.
 
         Returns
         -------
@@ -195,64 +808,21 @@ class Left96ButtonKeyboardMidiDAO(KeyboardMidiDAO):
             The created keyboard, or None if not a Left96ButtonKeyboard.
 
         """
-        if data[0] == self._keyboard_type:
-            keyboard = Left96ButtonKeyboard()
-
-            keyboard.name = bytes.decode(
-                base64.b64decode(
-                    bytes(data[1:data.index(0x00)])),
-                'utf-8')
-
-            data_index = data.index(0x00)+1
-
-            # Index of the current key of the Left96ButtonKeyboard
-            keyboard_index = -1
-            for _ in range(96):
-                midi_data, skip = self._get_midi_data(data, data_index)
-
-                keyboard.set_data(keyboard_index+2, midi_data)
-
-                keyboard_index = (keyboard_index + 16) % 95
-
-                data_index += skip
-            return keyboard
+        if data[index] == self._keyboard_type:
+            return self._keyboard_from_bytes(data, index)
         return None
 
-    def _to_bytes(self, kbd: Left96ButtonKeyboard) -> bytes:
-        """
-        Create a SysEx bytearray from a Left96ButtonKeyboard.
-
-        Parameters
-        ----------
-        kbd : Left96ButtonKeyboard
-            The keyboard to convert.
-
-        Returns
-        -------
-        bytes
-            The created bytearray.
-
-        """
-        data = bytes([self._keyboard_type])
-        data += base64.b64encode(kbd.name.encode('utf-8'))
-        data += bytes([0x00])
-
-        keyboard_index = -1
-        for _ in range(96):
-            data += self._get_midi_data_bytes(kbd.get_data(keyboard_index+2))
-            keyboard_index = (keyboard_index + 16) % 95
-
-        return data
-
 
+@register_keyboard_dao
 class Right81ButtonKeyboardMidiDAO(KeyboardMidiDAO):
     """Represent a 81 right button keyboard's DAO using MIDI."""
 
-    def __init__(self):
-        super().__init__()
-        self._keyboard_type = 0x01
+    _keyboard_type = 0x01
+    _keyboard_class = Right81ButtonKeyboard
+    _wire_order = _right81_wire_order()
 
-    def from_bytes(self, data: bytes) -> Right81ButtonKeyboard:
+    def from_bytes(self, data: bytes,
+                   index: int = 0) -> Right81ButtonKeyboard:
         """
         Create a Keyboard from SysEx bytes.
 
@@ -260,6 +830,8 @@ class Right81ButtonKeyboardMidiDAO(KeyboardMidiDAO):
         ----------
         data : bytes, tuple or list of bytes
             Part of the SysEx message containing the keyboard.
+        index : int, optional
+            The position of the keyboard in `data`. The default is 0.
 
         Returns
         -------
@@ -267,66 +839,6 @@ class Right81ButtonKeyboardMidiDAO(KeyboardMidiDAO):
             The created keyboard, or None if not a Right81ButtonKeyboard.
 
         """
-        if data[0] == self._keyboard_type:
-            keyboard = Right81ButtonKeyboard()
-
-            keyboard.name = bytes.decode(
-                base64.b64decode(
-                    bytes(data[1:data.index(0x00)])),
-                'utf-8')
-
-            data_index = data.index(0x00)+1
-
-            for i in range(5):
-                midi_data, skip = self._get_midi_data(data, data_index)
-                keyboard.set_data((66, 17, 34, 50, 67)[i], midi_data)
-                data_index += skip
-
-            for j in range(14):
-                for i in range(5):
-                    keyboard_index = (1, 18, 35, 51, 68)[i]+j
-                    midi_data, skip = self._get_midi_data(data, data_index)
-                    keyboard.set_data(keyboard_index, midi_data)
-                    data_index += skip
-
-            for i in range(6):
-                midi_data, skip = self._get_midi_data(data, data_index)
-                keyboard.set_data((15, 32, 49, 65, 16, 33)[i], midi_data)
-                data_index += skip
-            return keyboard
+        if data[index] == self._keyboard_type:
+            return self._keyboard_from_bytes(data, index)
         return None
-
-    def _to_bytes(self, kbd: Right81ButtonKeyboard) -> bytes:
-        """
-        Create a SysEx bytearray from a Right81ButtonKeyboard.
-
-        Parameters
-        ----------
-        kbd : Right81ButtonKeyboard
-            The keyboard to convert.
-
-        Returns
-        -------
-        bytes
-            The created bytearray.
-
-        """
-        data = bytes([self._keyboard_type])
-        data += base64.b64encode(kbd.name.encode('utf-8'))
-        data += bytes([0x00])
-
-        for i in range(5):
-            midi_data = kbd.get_data((66, 17, 34, 50, 67)[i])
-            data += self._get_midi_data_bytes(midi_data)
-
-        for j in range(14):
-            for i in range(5):
-                keyboard_index = (1, 18, 35, 51, 68)[i]+j
-                midi_data = kbd.get_data(keyboard_index)
-                data += self._get_midi_data_bytes(midi_data)
-
-        for i in range(6):
-            midi_data = kbd.get_data((15, 32, 49, 65, 16, 33)[i])
-            data += self._get_midi_data_bytes(midi_data)
-
-        return data
@@ -1,15 +1,107 @@
 """Definition of MidiData's DAO using MIDI protocol."""
 
 from abc import ABC, abstractmethod
+from typing import Callable
 from core.keyboard import MidiData, NoteData, ProgramData, ControlData
 
 
+def _decode_null(data: bytes, index: int = 0) -> (None, int):
+    """Decode the absence of midi data (`0x00`)."""
+    return None, 1
+
+
+def _encode_null(data: None) -> bytes:
+    """Encode the absence of midi data."""
+    return bytes([0x00])
+
+
+midi_data_decoders = {0x00: _decode_null}
+"""Function decoding each type of midi data, by type byte. It is called with
+the bytes and the position of the midi data, and returns the MidiData and the
+number of bytes read, as `MidiDataMidiDAO.from_bytes`."""
+
+midi_data_encoders = {type(None): _encode_null}
+"""Function encoding each class of MidiData, as `MidiDataMidiDAO.to_bytes`.
+"""
+
+midi_data_limits = {0x00: ()}
+"""Greatest value of each byte following the type byte, by type byte of midi
+data."""
+
+
+def register_midi_data_dao(dao: type) -> type:
+    """
+    Register the functions of a MidiDataMidiDAO in `midi_data_decoders` and
+    `midi_data_encoders`, and its `data_limits` in `midi_data_limits`.
+
+    Can be used as a class decorator.
+
+    Parameters
+    ----------
+    dao : type
+        The MidiDataMidiDAO, with its `data_type`, `data_class` and
+        `data_limits`.
+
+    Returns
+    -------
+    type
+        `dao`.
+
+    """
+    midi_data_decoders[dao.data_type] = dao.from_bytes
+    midi_data_encoders[dao.data_class] = dao.to_bytes
+    midi_data_limits[dao.data_type] = dao.data_limits
+    return dao
+
+
+def get_midi_data_encoder(data_class: type) -> Callable[[MidiData], bytes]:
+    """
+    Return the function encoding a class of MidiData.
+
+    Parameters
+    ----------
+    data_class : type
+        The class of the MidiData. Classes not registered use the function
+        of their nearest registered base class.
+
+    Returns
+    -------
+    Callable[[MidiData], bytes]
+        The encoding function. Without any registered base class, the data
+        is encoded as the absence of data (`0x00`).
+
+    """
+    encoder = midi_data_encoders.get(data_class)
+    if encoder is None:
+        encoder = _encode_null
+        for base in data_class.__mro__[1:]:
+            if base in midi_data_encoders:
+                encoder = midi_data_encoders[base]
+                break
+        midi_data_encoders[data_class] = encoder
+    return encoder
+
+
 class MidiDataMidiDAO(ABC):
-    """Abstract class for representing a MidiData's DAO using MIDI."""
+    """Abstract class for representing a MidiData's DAO using MIDI.
+
+    Attributes
+    ----------
+        :data_type: The type byte of the MidiData.
+
+        :data_class: The class of the MidiData.
+
+        :data_limits: The greatest value of each byte following the type
+        byte.
+    """
+
+    data_type = None
+    data_class = None
+    data_limits = ()
 
     @staticmethod
     @abstractmethod
-    def from_bytes(data: bytes) -> (MidiData, int):
+    def from_bytes(data: bytes, index: int = 0) -> (MidiData, int):
         """
         Create a MidiData from SysEx bytes.
 
@@ -17,6 +109,8 @@ class MidiDataMidiDAO(ABC):
         ----------
         data : bytes
             Part of the SysEx message containing the MidiData.
+        index : int, optional
+            The position of the MidiData in `data`. The default is 0.
 
         Returns
         -------
@@ -45,11 +139,16 @@ class MidiDataMidiDAO(ABC):
         """
 
 
+@register_midi_data_dao
 class NoteDataMidiDAO(MidiDataMidiDAO):
     """Represents a NoteData using midi."""
 
+    data_type = 0x01
+    data_class = NoteData
+    data_limits = (15, 127, 127)
+
     @staticmethod
-    def from_bytes(data: bytes) -> (NoteData, int):
+    def from_bytes(data: bytes, index: int = 0) -> (NoteData, int):
         """
         Create a NoteData from SysEx bytes.
 
@@ -57,6 +156,8 @@ class NoteDataMidiDAO(MidiDataMidiDAO):
         ----------
         data : bytes
             Part of the SysEx message containing the NoteData.
+        index : int, optional
+            The position of the NoteData in `data`. The default is 0.
 
         Returns
         -------
@@ -66,10 +167,10 @@ class NoteDataMidiDAO(MidiDataMidiDAO):
             The number of bytes read.
 
         """
-        if data[0] == 0x01:
-            channel = data[1]
-            pitch = data[2]
-            velocity = data[3]
+        if data[index] == 0x01:
+            channel = data[index+1]
+            pitch = data[index+2]
+            velocity = data[index+3]
             return NoteData(channel, pitch, velocity), 4
         return None, 0
 
@@ -92,11 +193,16 @@ class NoteDataMidiDAO(MidiDataMidiDAO):
         return bytes([0x01, data.channel, data.pitch, data.velocity])
 
 
+@register_midi_data_dao
 class ProgramDataMidiDAO(MidiDataMidiDAO):
     """Represents a ProgramData using midi."""
 
+    data_type = 0x02
+    data_class = ProgramData
+    data_limits = (15, 127)
+
     @staticmethod
-    def from_bytes(data: bytes) -> (ProgramData, int):
+    def from_bytes(data: bytes, index: int = 0) -> (ProgramData, int):
         """
         Create a ProgramData from SysEx bytes.
 
@@ -104,6 +210,8 @@ class ProgramDataMidiDAO(MidiDataMidiDAO):
         ----------
         data : bytes
             Part of the SysEx message containing the ProgramData.
+        index : int, optional
+            The position of the ProgramData in `data`. The default is 0.
 
         Returns
         -------
@@ -113,9 +221,9 @@ class ProgramDataMidiDAO(MidiDataMidiDAO):
             The number of bytes read.
 
         """
-        if data[0] == 0x02:
-            channel = data[1]
-            program_number = data[2]
+        if data[index] == 0x02:
+            channel = data[index+1]
+            program_number = data[index+2]
             return ProgramData(channel, program_number), 3
         return None, 0
 
@@ -138,11 +246,16 @@ class ProgramDataMidiDAO(MidiDataMidiDAO):
         return bytes([0x02, data.channel, data.number])
 
 
+@register_midi_data_dao
 class ControlDataMidiDAO(MidiDataMidiDAO):
     """Represents a ControlData using midi."""
 
+    data_type = 0x03
+    data_class = ControlData
+    data_limits = (15, 127, 127)
+
     @staticmethod
-    def from_bytes(data: bytes) -> (ControlData, int):
+    def from_bytes(data: bytes, index: int = 0) -> (ControlData, int):
         """
         Create a ControlData from SysEx bytes.
 
@@ -150,6 +263,8 @@ class ControlDataMidiDAO(MidiDataMidiDAO):
         ----------
         data : bytes
             Part of the SysEx message containing the ControlData.
+        index : int, optional
+            The position of the ControlData in `data`. The default is 0.
 
         Returns
         -------
@@ -159,10 +274,10 @@ class ControlDataMidiDAO(MidiDataMidiDAO):
             The number of bytes read.
 
         """
-        if data[0] == 0x03:
-            channel = data[1]
-            number = data[2]
-            value = data[3]
+        if data[index] == 0x03:
+            channel = data[index+1]
+            number = data[index+2]
+            value = data[index+3]
             return ControlData(channel, number, value), 4
         return None, 0
 
@@ -0,0 +1,184 @@
+"""Counters and histograms measuring the traffic of a `MidiConnection`."""
+
+__all__ = ["Histogram", "TransportMetrics"]
+
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+
+class Histogram:
+    """Distribution of the last measures of a duration.
+
+    Attributes
+    ----------
+        :count: Number of measures ever added.
+
+        :total: Sum of the measures ever added.
+    """
+
+    def __init__(self, size: int = 1000):
+        """
+        Create an empty histogram.
+
+        Parameters
+        ----------
+        size : int, optional
+            Number of measures kept to compute the distribution.
+            The default is 1000.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.count = 0
+        self.total = 0.
+        self._values = deque(maxlen=size)
+
+    def add(self, value: float):
+        """
+        Add a measure.
+
+        Parameters
+        ----------
+        value : float
+            The measure.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.count += 1
+        self.total += value
+        self._values.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Return the distribution of the kept measures.
+
+        Returns
+        -------
+        Dict[str, float]
+            The number of measures ever added ("count"), their sum ("total"),
+            and the "min", "mean", "median", "p95" and "max" of the kept
+            measures. Only "count" and "total" are given if there is no
+            measure.
+
+        """
+        values = sorted(self._values)
+        summary = {"count": self.count, "total": self.total}
+        if values:
+            summary.update({"min": values[0],
+                            "mean": sum(values) / len(values),
+                            "median": values[len(values)//2],
+                            "p95": values[int(len(values)*0.95)],
+                            "max": values[-1]})
+        return summary
+
+
+class TransportMetrics:
+    """Counters and histograms of a connection.
+
+    The counters count events (messages, bytes...), the histograms measure
+    durations in seconds. Both are created on first use, so any name can be
+    used. They are safe to update from any thread.
+
+    Usage:
+        >>> metrics = TransportMetrics()
+        >>> metrics.increment("messages_out")
+        >>> metrics.observe("ack_rtt", 0.012)
+        >>> metrics.snapshot()["counters"]["messages_out"]
+        1
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self.started = time.monotonic()
+
+    def increment(self, name: str, value: int = 1):
+        """
+        Add `value` to the counter `name`.
+
+        Parameters
+        ----------
+        name : str
+            The counter.
+        value : int, optional
+            The value to add. The default is 1.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """
+        Add a measure to the histogram `name`.
+
+        Parameters
+        ----------
+        name : str
+            The histogram.
+        value : float
+            The measure, in seconds.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(value)
+
+    def counter(self, name: str) -> int:
+        """Return the value of the counter `name`, 0 if never incremented."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def histogram(self, name: str) -> Dict[str, float]:
+        """Return the summary of the histogram `name`.
+
+        See `Histogram.summary`.
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                return {"count": 0, "total": 0.}
+            return histogram.summary()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Return every counter and histogram.
+
+        Returns
+        -------
+        Dict[str, dict]
+            The "counters" values and the "histograms" summaries by name, and
+            the time in seconds since the metrics were created or reset
+            ("uptime").
+
+        """
+        with self._lock:
+            return {"uptime": time.monotonic() - self.started,
+                    "counters": dict(self._counters),
+                    "histograms": {name: histogram.summary() for
+                                   name, histogram in
+                                   self._histograms.items()}}
+
+    def reset(self):
+        """Clear every counter and histogram."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.monotonic()
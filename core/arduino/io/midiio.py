@@ -1,270 +1,143 @@
-"""Communication between arduino and computer, through MIDI."""
+"""Communication between arduino and computer, through MIDI.
 
-import threading
-from typing import List
-from collections import deque
-import mido
-from .dao.midi import Right81ButtonKeyboardMidiDAO, Left96ButtonKeyboardMidiDAO
-
-# pylint: disable=C0103
-
-outport = None
-"""The output port.
-Must be set with `connect` or `connect_output` functions.
+Each Arduino is driven through its own `MidiConnection`. The functions of
+this module act on `default_connection`, for programs driving a single
+Arduino.
 """
 
-inport = None
-"""The input port.
-Must be set with `connect` or `connect_input` functions.
-"""
-
-callback = None
-"""The function to call when a keyboard is received.
-Must take two parameters:
-    keyboard: The received keyboard.
-    origin: The keyboard's origin (from EEPROM or RAM) as string.
-"""
-
-_sysex_queue = deque()
-_sysex_lock = threading.Lock()
+from typing import Dict, List
+from .capabilities import Capabilities
+from .connection import MidiConnection, SysexTransfer
 
+# pylint: disable=C0103
 
-def _clear_inport_callback():
-    """Clear the input port callback."""
-    if inport:
-        inport.callback = None
+default_connection = MidiConnection()
+"""The connection used by the functions of this module."""
 
 
 def close_inport():
-    """Close the input port."""
-    if inport:
-        _clear_inport_callback()
-        inport.close()
+    """Close the input port of `default_connection`."""
+    default_connection.close_inport()
 
 
 def close_outport():
-    """Close the output port."""
-    if outport:
-        outport.close()
+    """Close the output port of `default_connection`."""
+    default_connection.close_outport()
 
 
 def close():
-    """Close both input and output port."""
-    close_inport()
-    close_outport()
+    """Close both input and output port of `default_connection`."""
+    default_connection.close()
 
 
 def connect(outprt: str = None, inprt: str = None):
-    """
-    Connect to the specified MIDI output and input ports, if not None.
-
-    If `outport` or `inport` is None, connects to default MIDI port.
-
-    Parameters
-    ----------
-    outport : str, optional
-        Name of the MIDI ouput port. The default is None.
-    inport : str, optional
-        Nome of the MIDI input port. The default is None.
-
-    Returns
-    -------
-    None.
-
-    """
-    connect_output(outprt)
-    connect_input(inprt)
+    """Connect `default_connection`, see `MidiConnection.connect`."""
+    default_connection.connect(outprt, inprt)
 
 
 def connect_input(port: str = None):
-    """
-    Connect to the specified input port.
-
-    If `port` is None, connects to default MIDI input port.
-
-    Parameters
-    ----------
-    port : str, optional
-        Name of the MIDI input port, one of `list_input_ports()`.
-        The default is None.
-
-    Returns
-    -------
-    None.
-
-    Exceptions
-    ----------
-    If connection fails, raises an error.
+    """Connect `default_connection`'s input port.
 
+    See `MidiConnection.connect_input`.
     """
-    # pylint: disable=W0603
-    global inport
-    if not port:
-        inport = mido.open_input(callback=_message_recv)
-    else:
-        inport = mido.open_input(port, callback=_message_recv)
+    default_connection.connect_input(port)
 
 
 def connect_output(port: str = None):
+    """Connect `default_connection`'s output port.
+
+    See `MidiConnection.connect_output`.
     """
-    Connect to the specified output port.
+    default_connection.connect_output(port)
 
-    If `port` is None, connects to default MIDI output port.
 
-    Parameters
-    ----------
-    port : str, optional
-        Name of the MIDI output port, one of `list_output_ports()`.
-        The default is None.
+def list_input_ports() -> List[str]:
+    """List available input ports."""
+    return default_connection.list_input_ports()
 
-    Returns
-    -------
-    None.
 
-    Exceptions
-    ----------
-    If connection fails, raises an error.
+def list_output_ports() -> List[str]:
+    """List available output ports."""
+    return default_connection.list_output_ports()
 
-    """
-    # pylint: disable=W0603
-    global outport
-    if not port:
-        outport = mido.open_output(autoreset=False)
-    else:
-        outport = mido.open_output(port, autoreset=False)
 
+def input_ready() -> bool:
+    """Return True if `default_connection`'s input is ready to use."""
+    return default_connection.input_ready()
 
-def list_input_ports() -> List[str]:
-    """
-    List available input ports.
 
-    Returns
-    -------
-    list of str
-        List of available input ports names.
+def output_ready() -> bool:
+    """Return True if `default_connection`'s output is ready to use."""
+    return default_connection.output_ready()
 
-    """
-    return mido.get_input_names()
 
+def set_window(size: int):
+    """Set `default_connection`'s window, see `MidiConnection.set_window`."""
+    default_connection.set_window(size)
 
-def list_output_ports() -> List[str]:
-    """
-    List available output ports.
 
-    Returns
-    -------
-    list of str
-        List of available output ports names.
+def get_window() -> int:
+    """Return the window size used by `default_connection`."""
+    return default_connection.get_window()
 
-    """
-    return mido.get_output_names()
 
+def set_chunk_size(size: int = None):
+    """Set `default_connection`'s chunk size.
 
-def input_ready() -> bool:
+    See `MidiConnection.set_chunk_size`.
     """
-    Return True if the input is ready to use, False otherwise.
+    default_connection.set_chunk_size(size)
 
-    Returns
-    -------
-    bool
-        True if the input is ready, False otherwise.
 
-    """
-    if inport:
-        return not inport.closed
-    return False
+def get_chunk_size() -> int:
+    """Return the chunk size used by `default_connection`."""
+    return default_connection.get_chunk_size()
 
 
-def output_ready() -> bool:
-    """
-    Return True if the output is ready to use, False otherwise.
-
-    Returns
-    -------
-    bool
-        True if the output is ready, False otherwise.
+def negotiate(timeout: float = None) -> Capabilities:
+    """Negotiate the capabilities of `default_connection`.
 
+    See `MidiConnection.negotiate`.
     """
-    if outport:
-        return not outport.closed
-    return False
-
-
-def _process_sysex(data: bytes):
-    if data:
-        if (data[0] == 1 or  # receiving a keyboard from EEPROM
-           data[0] == 2):  # receiving a keyboard from RAM
-            dao = None
-            if data[1] == 0x01:
-                dao = Right81ButtonKeyboardMidiDAO()
-            elif data[1] == 0x02:
-                dao = Left96ButtonKeyboardMidiDAO()
-
-            if dao is not None:
-                keyboard = dao.from_bytes(data[1:])
-                # pylint: disable=E1102
-                callback(keyboard, "EEPROM" if data[0] == 1 else "RAM")
-        elif data[0] == 0x0F:  # receiving confirmation for sending a SysEx
-            with _sysex_lock:
-                if len(_sysex_queue):
-                    outport.send(_sysex_queue.popleft())
-                    if len(_sysex_queue):
-                        _send_pre_sysex()
+    return default_connection.negotiate(timeout)
 
 
-def send_direct_sysex(data: bytes):
-    """
-    Send a sysex message with given data.
+def set_pacing(enabled: bool):
+    """Enable or disable `default_connection`'s pacing.
 
-    The SysEx is immediatly sent. To warn the receiver that a SysEx will be
-    sent, use send_sysex() instead.
+    See `MidiConnection.set_pacing`.
+    """
+    default_connection.set_pacing(enabled)
 
-    Parameters
-    ----------
-    data : list of bytes
-        Bytearray, list or tuple of bytes to send.
 
-    Returns
-    -------
-    None.
+def get_latency_stats() -> Dict[str, float]:
+    """Return `default_connection`'s confirmation round-trip statistics."""
+    return default_connection.get_latency_stats()
 
-    """
-    msg = mido.Message("sysex", data=bytes([0x7d]) + data)
-    outport.send(msg)
 
+def get_metrics() -> Dict[str, dict]:
+    """Return `default_connection`'s traffic metrics.
 
-def send_sysex(data: bytes):
+    See `MidiConnection.get_metrics`.
     """
-    Send a sysex message with given data.
+    return default_connection.get_metrics()
 
-    Warn the receiver that a SysEx will be sent.
-    If a previous SysEx is already in the send queue, wait for this SysEx to
-    be sent.
 
-    Parameters
-    ----------
-    data : list of bytes
-        Bytearray, list or tuple of bytes to send.
+def get_receive_stats() -> Dict[str, int]:
+    """Return statistics about the SysEx received by `default_connection`."""
+    return default_connection.get_receive_stats()
 
-    Returns
-    -------
-    None.
 
-    """
-    msg = mido.Message("sysex", data=bytes([0x7d]) + data)
-    with _sysex_lock:
-        _sysex_queue.append(msg)
-        if len(_sysex_queue) == 1:
-            _send_pre_sysex()
+def send_direct_sysex(data: bytes):
+    """Send a SysEx without announcing it, through `default_connection`."""
+    default_connection.send_direct_sysex(data)
 
 
-def _send_pre_sysex():
-    """Warn the receiver that a long SysEx will be sent."""
-    send_direct_sysex(bytes([0x0f]))
+def send_sysex(data: bytes) -> SysexTransfer:
+    """Announce then send a SysEx through `default_connection`."""
+    return default_connection.send_sysex(data)
 
 
-def _message_recv(message: mido.Message):
-    """Receive messages callback."""
-    if message.type == "sysex":
-        if message.data and message.data[0] == 0x7d:
-            _process_sysex(message.data[1:])
+def flush(timeout: float = 1.) -> bool:
+    """Wait until `default_connection` wrote every queued message."""
+    return default_connection.flush(timeout)
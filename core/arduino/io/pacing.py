@@ -0,0 +1,178 @@
+"""Pace the bytes written to a receiver at the rate it processes them."""
+
+__all__ = ["Pacer"]
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Tuple
+
+
+class Pacer:
+    """Spread the written bytes just under the receiver's throughput.
+
+    The throughput is measured from the acknowledgements (confirmations of
+    announcements, chunk acknowledgements): when the receiver acknowledges a
+    message, it has processed every byte written before it. The bytes
+    acknowledged between two acknowledgements and the time between them
+    give a delivery sample, as long as data was waiting to be processed in
+    the meantime. The capacity of the link is the number of bytes of the
+    last samples over their total time, so that small messages acknowledged
+    in a burst don't hide the time taken by the long ones. A sample much
+    faster than the capacity (such as a message lost by the receiver) is
+    ignored.
+
+    The writes are then paced at the capacity multiplied by a gain. The gain
+    cycles through `gains`: most of the time slightly under 1 so that the
+    receiver's buffer stays empty, sometimes above 1 to find out whether the
+    capacity increased, then below 1 to drain what this probe queued.
+
+    Usage:
+        >>> pacer = Pacer()
+        >>> time.sleep(pacer.delay(len(message)))
+        >>> sent = pacer.written(len(message))
+        >>> pacer.acked(sent)  # once the receiver acknowledged the message
+    """
+
+    gains = (1.25, 0.75, 0.9, 0.9, 0.9, 0.9, 0.9, 0.9)
+    """Factors applied to the capacity, one after the other at each sample.
+    """
+
+    samples = 16
+    """Number of delivery samples kept to estimate the capacity."""
+
+    max_sample_ratio = 4.
+    """Samples faster than the capacity times this ratio are ignored."""
+
+    def __init__(self):
+        self.enabled = False
+        """Whether `delay` paces the writes. The rate is measured anyway."""
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=self.samples)
+        self._phase = 2
+        self._total = 0
+        self._last_ack = None
+        self._next_write = 0.
+
+    @property
+    def capacity(self) -> float:
+        """Estimated throughput of the receiver in bytes per second, None
+        until measured."""
+        with self._lock:
+            return self._capacity()
+
+    def _capacity(self) -> float:
+        """Compute `capacity`, with `_lock` held."""
+        if not self._samples:
+            return None
+        return sum(size for size, _ in self._samples)\
+            / sum(duration for _, duration in self._samples)
+
+    @property
+    def rate(self) -> float:
+        """Rate at which the bytes are written in bytes per second, None if
+        not paced."""
+        capacity = self.capacity
+        if not self.enabled or capacity is None:
+            return None
+        return capacity * self.gains[self._phase]
+
+    def delay(self, size: int) -> float:
+        """
+        Reserve the time to write `size` bytes.
+
+        Parameters
+        ----------
+        size : int
+            Number of bytes to write.
+
+        Returns
+        -------
+        float
+            Time in seconds to wait before writing them.
+
+        """
+        rate = self.rate
+        if rate is None:
+            return 0.
+        now = time.monotonic()
+        with self._lock:
+            start = max(now, self._next_write)
+            self._next_write = start + size / rate
+        return start - now
+
+    def written(self, size: int) -> Tuple[float, int]:
+        """
+        Record that `size` bytes were written.
+
+        Parameters
+        ----------
+        size : int
+            Number of bytes written.
+
+        Returns
+        -------
+        Tuple[float, int]
+            The time of the write and the number of bytes written so far, to
+            give to `acked` once the receiver acknowledged these bytes.
+
+        """
+        with self._lock:
+            self._total += size
+            return time.monotonic(), self._total
+
+    def acked(self, sent: Tuple[float, int]):
+        """
+        Record that the receiver processed the bytes of a write.
+
+        Parameters
+        ----------
+        sent : Tuple[float, int]
+            The value returned by `written` for the acknowledged write.
+
+        Returns
+        -------
+        None.
+
+        """
+        now = time.monotonic()
+        sent_time, total = sent
+        with self._lock:
+            last = self._last_ack
+            if last is not None and total <= last[1]:
+                return  # acknowledged with a later write
+            self._last_ack = (now, total)
+            if last is None or sent_time > last[0] or now <= last[0]:
+                return  # nothing waited to be processed since the last one
+            size, duration = total - last[1], now - last[0]
+            capacity = self._capacity()
+            if(capacity is not None
+               and size > duration * capacity * self.max_sample_ratio):
+                return
+            self._samples.append((size, duration))
+            self._phase = (self._phase + 1) % len(self.gains)
+
+    def get_state(self) -> Dict[str, float]:
+        """
+        Return the state of the pacing.
+
+        Returns
+        -------
+        Dict[str, float]
+            Whether the pacing is "enabled", the estimated "capacity" and
+            the pacing "rate" in bytes per second (0 if unknown or not
+            paced), and the current "gain".
+
+        """
+        return {"enabled": int(self.enabled),
+                "capacity": self.capacity or 0.,
+                "rate": self.rate or 0.,
+                "gain": self.gains[self._phase]}
+
+    def reset(self):
+        """Forget the measures, for example when the receiver changed."""
+        with self._lock:
+            self._samples.clear()
+            self._phase = 2
+            self._last_ack = None
+            self._next_write = 0.
@@ -0,0 +1,574 @@
+"""Simulated Arduino, speaking the SysEx protocol of `docs/midi protocol.md`.
+
+The `VirtualArduino` provides the same port functions as mido, so it can be
+used as the backend of a `MidiConnection`::
+
+    >>> connection = MidiConnection(backend=VirtualArduino(latency=0.002))
+    >>> connection.connect()
+
+Every message crosses a simulated link with the given bandwidth and latency,
+making it possible to measure the controller's behaviour without hardware.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+import mido
+
+from .capabilities import Capabilities
+from .dao.midi.keyboardmididao import frame_checksum, frame_check_byte,\
+    encode_name, decode_name
+
+
+class VirtualArduino:
+    """Simulated Arduino.
+
+    The keyboards are kept as raw frames (`<type> <name> <data>`), like the
+    firmware does in its EEPROM.
+
+    Attributes
+    ----------
+        :eeprom: The stored keyboards' frames, in storage order.
+
+        :current: The current keyboards' frames, by keyboard type.
+
+        :stats: Counters of received messages and bytes, by kind.
+    """
+
+    port_name = "Virtual AccordionMIDI"
+
+    entry_sizes = (1, 4, 3, 4)
+    """Size of a midi data entry, by midi data type."""
+
+    def __init__(self, latency: float = 0.001, bandwidth: float = 3125.,
+                 eeprom_size: int = 4096, sequences: bool = True,
+                 end_marker: bool = True, delta: bool = True,
+                 inventory: bool = True, checksums: bool = False,
+                 error_rate: float = 0., seed: int = None,
+                 chunks: bool = True, buffer_size: int = None,
+                 process_rate: float = None, input_buffer: int = None,
+                 negotiation: bool = True, compact_names: bool = True):
+        """
+        Create a virtual Arduino.
+
+        Parameters
+        ----------
+        latency : float, optional
+            Time in seconds taken by a message to be processed once
+            received, in each direction. The default is 0.001.
+        bandwidth : float, optional
+            Speed of the link in bytes per second, in each direction.
+            The default is 3125 (MIDI 1.0 speed).
+        eeprom_size : int, optional
+            Number of bytes available to store keyboards. A keyboard that
+            does not fit is dropped. The default is 4096.
+        sequences : bool, optional
+            Whether announcements' sequence numbers are sent back, as
+            needed by pipelined mode. The default is True.
+        end_marker : bool, optional
+            Whether the keyboards sent for a fetch are followed by the end
+            marker. The default is True.
+        delta : bool, optional
+            Whether patches of the current keyboards (`0x10`) are understood.
+            The default is True.
+        inventory : bool, optional
+            Whether the list (`0x20`) and single fetch (`0x40`) commands are
+            understood. The default is True.
+        checksums : bool, optional
+            Whether the keyboard frames (`0x01`, `0x02`) end with a check
+            byte, in both directions. Received frames with a wrong check
+            byte are dropped. The default is False.
+        error_rate : float, optional
+            Probability for each keyboard frame sent to have one of its bytes
+            corrupted on the link. The default is 0.
+        seed : int, optional
+            Seed of the corruptions, for reproducible runs. The default is
+            None.
+        chunks : bool, optional
+            Whether SysEx sent in chunks (`0x30`) are understood.
+            The default is True.
+        buffer_size : int, optional
+            Size of the receive buffer. A longer SysEx is dropped. The
+            default is None, for no limit.
+        process_rate : float, optional
+            Speed at which the received bytes are processed, in bytes per
+            second. The default is None, for an immediate processing.
+        input_buffer : int, optional
+            Number of received bytes that can wait to be processed. A SysEx
+            received while the buffer is full is dropped. The default is
+            None, for no limit.
+        negotiation : bool, optional
+            Whether the capabilities command (`0x60`) is understood. The
+            check bytes are then used only if the controller supports them
+            too. The default is True.
+        compact_names : bool, optional
+            Whether the compact encoding of the names can be negotiated.
+            The default is True.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.eeprom_size = eeprom_size
+        self.sequences = sequences
+        self.end_marker = end_marker
+        self.delta = delta
+        self.inventory = inventory
+        self.checksums = checksums
+        self.negotiation = negotiation
+        self._checksums_supported = checksums
+        self.compact_names = compact_names
+        self._compact = False
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.chunks = chunks
+        self.buffer_size = buffer_size
+        self.process_rate = process_rate
+        self.input_buffer = input_buffer
+        self._processed = 0.
+        self._waiting = deque()
+        self._chunk_buffer = bytearray()
+        self._next_chunk = None
+        self._last_chunk = None
+
+        self.eeprom = []
+        self.current = {}
+        self.stats = {"messages_in": 0, "bytes_in": 0,
+                      "messages_out": 0, "bytes_out": 0,
+                      "announcements": 0, "stored": 0, "rejected": 0,
+                      "patches": 0, "patches_rejected": 0,
+                      "corrupted_in": 0, "corrupted_out": 0,
+                      "chunks": 0, "overflows": 0}
+
+        self._inputs = []
+        self._events = []
+        self._order = itertools.count()
+        self._link_in = 0.
+        self._link_out = 0.
+        self._cond = threading.Condition()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self._run,
+                                        name="virtual-arduino", daemon=True)
+        self._thread.start()
+
+    # mido backend
+
+    def get_input_names(self) -> List[str]:
+        # pylint: disable=C0116
+        return [self.port_name]
+
+    def get_output_names(self) -> List[str]:
+        # pylint: disable=C0116
+        return [self.port_name]
+
+    def open_input(self, name: str = None, callback=None, **_):
+        """Open an input port receiving the messages sent by the device."""
+        port = VirtualInputPort(name or self.port_name, callback)
+        self._inputs.append(port)
+        return port
+
+    def open_output(self, name: str = None, **_):
+        """Open an output port sending messages to the device."""
+        return VirtualOutputPort(self, name or self.port_name)
+
+    # Simulated link
+
+    def _transmit(self, data: bytes, incoming: bool) -> float:
+        """Return the time at which `data` is fully transmitted."""
+        now = time.monotonic()
+        duration = (len(data) + 3) / self.bandwidth  # with 0xF0 0x7D 0xF7
+        if incoming:
+            self._link_in = max(self._link_in, now) + duration
+            return self._link_in
+        self._link_out = max(self._link_out, now) + duration
+        return self._link_out
+
+    def _schedule(self, when: float, action, *args):
+        with self._cond:
+            self._idle.clear()
+            heapq.heappush(self._events,
+                           (when, next(self._order), action, args))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._events:
+                    self._idle.set()
+                    self._cond.wait()
+                when, _, action, args = self._events[0]
+                delay = when - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._events)
+            action(*args)
+
+    def receive(self, data: bytes):
+        """
+        Receive a SysEx from the controller, without the manufacturer ID.
+
+        Parameters
+        ----------
+        data : bytes
+            The SysEx data.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            when = self._transmit(data, True)
+            if self.process_rate is not None:
+                while self._waiting and self._waiting[0][0] <= when:
+                    self._waiting.popleft()
+                waiting = sum(size for _, size in self._waiting)
+                if(self.input_buffer is not None
+                   and waiting + len(data) > self.input_buffer):
+                    self.stats["overflows"] += 1
+                    return
+                when = max(when, self._processed)\
+                    + len(data) / self.process_rate
+                self._processed = when
+                self._waiting.append((when, len(data)))
+        self._schedule(when + self.latency, self._process, bytes(data))
+
+    def send(self, data: bytes):
+        """
+        Send a SysEx to the controller, without the manufacturer ID.
+
+        Parameters
+        ----------
+        data : bytes
+            The SysEx data.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self._cond:
+            when = self._transmit(data, False) + self.latency
+        self.stats["messages_out"] += 1
+        self.stats["bytes_out"] += len(data)
+        msg = mido.Message("sysex", data=bytes([0x7d]) + data)
+        self._schedule(when, self._deliver, msg)
+
+    def send_frame(self, origin: int, frame: bytes):
+        """
+        Send a keyboard frame to the controller, with its check byte if
+        enabled, and possibly corrupted.
+
+        Parameters
+        ----------
+        origin : int
+            The command byte (`0x01` or `0x02`).
+        frame : bytes
+            The keyboard frame (`<type> <name> <data>`).
+
+        Returns
+        -------
+        None.
+
+        """
+        frame = self._to_wire(frame)
+        data = bytes([origin]) + frame
+        if self.checksums:
+            data += bytes([frame_check_byte(frame)])
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.stats["corrupted_out"] += 1
+            data = bytearray(data)
+            index = self._random.randrange(1, len(data))
+            data[index] = (data[index] + self._random.randrange(1, 128)) % 128
+            data = bytes(data)
+        self.send(data)
+
+    def _receive_frame(self, data: bytes) -> bytes:
+        """Return the keyboard frame of `data`, None if corrupted."""
+        if self.checksums:
+            if len(data) < 2 or frame_check_byte(data[:-1]) != data[-1]:
+                self.stats["corrupted_in"] += 1
+                return None
+            data = data[:-1]
+        return self._from_wire(data, 1)
+
+    def _to_wire(self, frame: bytes) -> bytes:
+        """Return `frame` with its name in the encoding in use.
+
+        The frames are kept with base-64 names, whatever the encoding in use.
+        """
+        if not self._compact:
+            return frame
+        name, end = decode_name(frame, 1)
+        return frame[:1] + encode_name(name, True) + frame[end:]
+
+    def _from_wire(self, data: bytes, index: int, count: int = 1) -> bytes:
+        """Return `data` with the `count` names from `index` base-64
+        encoded."""
+        if not self._compact:
+            return data
+        converted = data[:index]
+        for _ in range(count):
+            name, index = decode_name(data, index, True)
+            converted += encode_name(name)
+        return converted + data[index:]
+
+    def _deliver(self, msg: mido.Message):
+        for port in self._inputs:
+            port.deliver(msg)
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Wait until every message has been transmitted and processed.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait, in seconds. The default is None.
+
+        Returns
+        -------
+        bool
+            True if the device is idle, False if the timeout expired.
+
+        """
+        return self._idle.wait(timeout)
+
+    # Protocol
+
+    @staticmethod
+    def _split_name(data: bytes):
+        """Return the name field (without `0x00`) and the remaining bytes."""
+        end = data.index(0x00)
+        return data[:end], data[end+1:]
+
+    def _split_entries(self, data: bytes) -> List[bytes]:
+        """Return the midi data entries of a keyboard's data."""
+        entries = []
+        index = 0
+        while index < len(data):
+            size = self.entry_sizes[data[index]]
+            entries.append(data[index:index+size])
+            index += size
+        return entries
+
+    def _find(self, kbd_type: int, name: bytes) -> int:
+        for i, frame in enumerate(self.eeprom):
+            if frame[0] == kbd_type and self._split_name(frame[1:])[0] == name:
+                return i
+        return None
+
+    def eeprom_used(self) -> int:
+        """Return the number of EEPROM bytes used by stored keyboards."""
+        return sum(len(frame) for frame in self.eeprom)
+
+    def _process(self, data: bytes):
+        self.stats["messages_in"] += 1
+        self.stats["bytes_in"] += len(data)
+        if self.buffer_size is not None and len(data) > self.buffer_size:
+            self.stats["overflows"] += 1
+            return
+        if data and data[0] == 0x30 and self.chunks:
+            self._process_chunk(data[1], data[2:])
+        else:
+            self._process_command(data)
+
+    def _process_chunk(self, header: int, chunk: bytes):
+        """Reassemble a SysEx sent in chunks, acknowledging each chunk."""
+        if header & 0x20:  # first chunk
+            self._chunk_buffer = bytearray()
+            self._next_chunk = 0
+        elif(self._next_chunk is None
+             or header & 0x1f != self._next_chunk % 32):
+            if header == self._last_chunk:
+                self.send(bytes([0x30, header]))  # acknowledgement lost
+            return
+        self.stats["chunks"] += 1
+        self._chunk_buffer += chunk
+        self._next_chunk += 1
+        self._last_chunk = header
+        self.send(bytes([0x30, header]))
+        if header & 0x40:  # last chunk
+            data, self._chunk_buffer = bytes(self._chunk_buffer), bytearray()
+            self._next_chunk = None
+            self._process_command(data)
+
+    def _process_command(self, data: bytes):
+        if not data:
+            return
+        command = data[0]
+        if command == 0x0F:
+            self.stats["announcements"] += 1
+            self.send(data if self.sequences else data[:1])
+        elif command == 0x00:
+            self._process_fetch()
+        elif command in (0x01, 0x02):
+            frame = self._receive_frame(data[1:])
+            if frame is None:
+                return
+            if command == 0x01:
+                self._process_store(frame)
+            else:
+                self.current[frame[0]] = frame
+        elif command == 0x10 and self.delta:
+            self._process_patch(data[1:])
+        elif command == 0x60 and self.negotiation:
+            capabilities = self.get_capabilities()
+            requested = Capabilities.from_bytes(data[1:])
+            self.checksums = "checksums" in capabilities & requested
+            self._compact = "compact_names" in capabilities & requested
+            self.send(bytes([0x60]) + capabilities.to_bytes())
+        elif command == 0x20 and self.inventory:
+            self._process_list()
+        elif command == 0x40 and self.inventory:
+            data = self._from_wire(data, 3)
+            self._process_fetch_one(data[1], data[2],
+                                    self._split_name(data[3:])[0])
+        elif command == 0x04:
+            data = self._from_wire(data, 2)
+            index = self._find(data[1], self._split_name(data[2:])[0])
+            if index is not None:
+                del self.eeprom[index]
+        elif command == 0x08:
+            data = self._from_wire(data, 2, 2)
+            previous, rest = self._split_name(data[2:])
+            new_name, _ = self._split_name(rest)
+            index = self._find(data[1], previous)
+            if index is not None:
+                _, frame_data = self._split_name(self.eeprom[index][1:])
+                self.eeprom[index] = bytes([data[1]]) + new_name\
+                    + bytes([0x00]) + frame_data
+
+    def _process_fetch(self):
+        for frame in self.eeprom:
+            self.send_frame(0x01, frame)
+        for frame in self.current.values():
+            self.send_frame(0x02, frame)
+        if self.end_marker:
+            self.send(bytes([0x00]))
+
+    def _process_list(self):
+        inventory = bytes([0x20])
+        frames = [(0x01, frame) for frame in self.eeprom]\
+            + [(0x02, frame) for frame in self.current.values()]
+        for origin, frame in frames:
+            frame = self._to_wire(frame)
+            checksum = frame_checksum(frame)
+            _, end = decode_name(frame, 1, self._compact)
+            inventory += bytes([origin]) + frame[:end]\
+                + bytes([checksum >> 7, checksum & 0x7f])
+        self.send(inventory)
+
+    def _process_fetch_one(self, origin: int, kbd_type: int, name: bytes):
+        if origin == 0x01:
+            index = self._find(kbd_type, name)
+            if index is not None:
+                self.send_frame(0x01, self.eeprom[index])
+        else:
+            frame = self.current.get(kbd_type)
+            if frame is not None and self._split_name(frame[1:])[0] == name:
+                self.send_frame(0x02, frame)
+
+    def _process_patch(self, patch: bytes):
+        frame = self.current.get(patch[0])
+        if(frame is None or frame_checksum(self._to_wire(frame))
+           != patch[1] << 7 | patch[2]):
+            self.stats["patches_rejected"] += 1
+            self.send(bytes([0x10, patch[0]]))
+            return
+        self.stats["patches"] += 1
+        name, frame_data = self._split_name(frame[1:])
+        entries = self._split_entries(frame_data)
+        index = 3
+        while index < len(patch):
+            size = self.entry_sizes[patch[index+1]]
+            entries[patch[index]] = patch[index+1:index+1+size]
+            index += 1 + size
+        self.current[patch[0]] = bytes([patch[0]]) + name + bytes([0x00])\
+            + b"".join(entries)
+
+    def _process_store(self, frame: bytes):
+        index = self._find(frame[0], self._split_name(frame[1:])[0])
+        previous = 0 if index is None else len(self.eeprom[index])
+        if self.eeprom_used() - previous + len(frame) > self.eeprom_size:
+            self.stats["rejected"] += 1
+            return
+        self.stats["stored"] += 1
+        if index is None:
+            self.eeprom.append(frame)
+        else:
+            self.eeprom[index] = frame
+
+    def get_capabilities(self) -> Capabilities:
+        """
+        Return the capabilities announced to the controller.
+
+        Returns
+        -------
+        Capabilities
+            The features enabled by the parameters of the device.
+
+        """
+        features = [feature for feature, supported in (
+            ("pipelining", self.sequences), ("delta", self.delta),
+            ("inventory", self.inventory), ("chunks", self.chunks),
+            ("checksums", self._checksums_supported),
+            ("compact_names", self.compact_names),
+            ("end_marker", self.end_marker)) if supported]
+        return Capabilities(1, features, self.buffer_size or 0)
+
+    def get_stored_names(self) -> Dict[int, List[bytes]]:
+        """
+        Return the encoded names of the stored keyboards, by type.
+
+        Returns
+        -------
+        Dict[int, List[bytes]]
+            The names as sent on the wire.
+
+        """
+        names = {}
+        for frame in self.eeprom:
+            names.setdefault(frame[0], []).append(
+                self._split_name(frame[1:])[0])
+        return names
+
+
+class VirtualOutputPort(mido.ports.BaseOutput):
+    """Output port sending SysEx to a `VirtualArduino`."""
+
+    def __init__(self, device: VirtualArduino, name: str):
+        self.device = device
+        super().__init__(name)
+
+    def _send(self, msg):
+        if msg.type == "sysex" and msg.data and msg.data[0] == 0x7d:
+            self.device.receive(bytes(msg.data[1:]))
+
+
+class VirtualInputPort(mido.ports.BaseInput):
+    """Input port receiving the messages of a `VirtualArduino`."""
+
+    def __init__(self, name: str, callback=None):
+        self.callback = callback
+        super().__init__(name)
+
+    def deliver(self, msg: mido.Message):
+        """Give `msg` to the callback, or keep it for `receive`."""
+        if self.closed:
+            return
+        if self.callback is not None:
+            self.callback(msg)
+        else:
+            with self._lock:
+                self._messages.append(msg)
@@ -0,0 +1,147 @@
+"""Keep on disk the last keyboards fetched from each Arduino."""
+
+__all__ = ["DeviceMirror"]
+
+import json
+import os
+import re
+import time
+from typing import List, Optional, Tuple
+
+from core.json import keyboard_to_dict, keyboard_from_dict
+from core.keyboard import Keyboard
+
+
+class DeviceMirror:
+    """Copy on disk of the keyboards of the Arduinos.
+
+    One JSON file is written per device, named after the device's identifier
+    (usually the name of its output port). It contains the stored and current
+    keyboards as returned by the last complete fetch, so that they can be
+    shown at start-up without waiting for the Arduino.
+
+    Usage:
+        >>> mirror = DeviceMirror("~/.cache/accordion-midi")
+        >>> mirror.save("Arduino Leonardo", stored, [left, right])
+        >>> stored, current, saved = mirror.load("Arduino Leonardo")
+    """
+
+    version = 1
+    """Version of the file format. Files of another version are ignored."""
+
+    def __init__(self, directory: str):
+        """
+        Create a mirror kept in `directory`.
+
+        Parameters
+        ----------
+        directory : str
+            The directory of the mirror files, created when needed.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.directory = os.path.expanduser(directory)
+
+    def get_filename(self, device: str) -> str:
+        """
+        Return the file mirroring `device`.
+
+        Parameters
+        ----------
+        device : str
+            The identifier of the device.
+
+        Returns
+        -------
+        str
+            The path of the file.
+
+        """
+        name = re.sub(r"[^\w.-]+", "_", device).strip("._") or "_"
+        return os.path.join(self.directory, name + ".json")
+
+    def load(self, device: str) -> Optional[Tuple[List[Keyboard],
+                                                 List[Keyboard], float]]:
+        """
+        Read the keyboards last saved for `device`.
+
+        Parameters
+        ----------
+        device : str
+            The identifier of the device.
+
+        Returns
+        -------
+        Tuple[List[Keyboard], List[Keyboard], float] or None
+            The stored keyboards, the current keyboards and the time (as
+            given by `time.time`) at which they were saved. None if nothing
+            valid was saved for `device`.
+
+        """
+        try:
+            with open(self.get_filename(device), "r",
+                      encoding="utf-8") as file:
+                data = json.load(file)
+            if data["version"] != self.version or data["device"] != device:
+                return None
+            return ([keyboard_from_dict(d) for d in data["stored"]],
+                    [keyboard_from_dict(d) for d in data["current"]],
+                    data["saved"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, device: str, stored: List[Keyboard],
+             current: List[Keyboard]):
+        """
+        Write the keyboards of `device`, replacing the previous ones.
+
+        The file is replaced atomically, so a crash never leaves a partial
+        mirror.
+
+        Parameters
+        ----------
+        device : str
+            The identifier of the device.
+        stored : List[Keyboard]
+            The keyboards stored on the device.
+        current : List[Keyboard]
+            The current keyboards of the device.
+
+        Returns
+        -------
+        None.
+
+        """
+        data = {"version": self.version,
+                "device": device,
+                "saved": time.time(),
+                "stored": [keyboard_to_dict(kbd) for kbd in stored],
+                "current": [keyboard_to_dict(kbd) for kbd in current]}
+        filename = self.get_filename(device)
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = filename + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=4)
+        os.replace(temporary, filename)
+
+    def forget(self, device: str):
+        """
+        Remove the keyboards saved for `device`, if any.
+
+        Parameters
+        ----------
+        device : str
+            The identifier of the device.
+
+        Returns
+        -------
+        None.
+
+        """
+        try:
+            os.remove(self.get_filename(device))
+        except FileNotFoundError:
+            pass
@@ -7,7 +7,7 @@ from typing import Dict, List, Union
 from copy import deepcopy
 
 from .origin import Origin
-from .arduino import Arduino, midiio
+from .arduino import Arduino, DeviceMirror, LiveAudition, midiio
 from .keyboard import Keyboard, MidiData
 from .json import JsonFile
 from .notifications import Notification
@@ -16,12 +16,16 @@ from .notifications import Notification
 class ControllerCore:
     """Core of the controller."""
 
-    def __init__(self):
+    def __init__(self, connection: midiio.MidiConnection = None,
+                 mirror: DeviceMirror = None):
         self.keyboards = []
         """Keep opened keyboards.
         List[KeyboardState]
         """
-        self.arduino = Arduino()
+        self.arduino = Arduino(connection, mirror)
+        self.connection = self.arduino.connection
+        self.audition = None
+        """The running live audition, if any."""
         self.history = History()
 
     def open(self, descriptor: Union[str, Keyboard]) -> 'KeyboardState':
@@ -112,6 +116,8 @@ class ControllerCore:
         None.
 
         """
+        if self.audition and self.audition.keyboard_state is kbd_state:
+            self.stop_audition()
         self.keyboards.remove(kbd_state)
 
     def create(self, kbd_type: type) -> 'KeyboardState':
@@ -135,8 +141,42 @@ class ControllerCore:
         return kbd_state
 
     def pull_keyboards(self):
-        """Ask arduino to send keyboards."""
-        self.arduino.fetch_keyboards()
+        """Ask arduino to send keyboards.
+
+        Only the keyboards that changed are sent if the Arduino supports it.
+        """
+        if self.arduino.incremental_fetch:
+            self.arduino.sync_keyboards()
+        else:
+            self.arduino.fetch_keyboards()
+
+    def start_audition(self, kbd_state: 'KeyboardState') -> LiveAudition:
+        """
+        Push the given keyboard and its changes to the Arduino.
+
+        Replaces the previous live audition, if any.
+
+        Parameters
+        ----------
+        kbd_state : KeyboardState
+            The keyboard to audition.
+
+        Returns
+        -------
+        LiveAudition
+            The started audition.
+
+        """
+        self.stop_audition()
+        self.audition = LiveAudition(self.arduino, kbd_state)
+        self.audition.start()
+        return self.audition
+
+    def stop_audition(self):
+        """Stop the live audition, if any."""
+        if self.audition:
+            self.audition.stop()
+            self.audition = None
 
     def get_known_keyboards(self, origin: List[Origin] = None
                             ) -> Dict[Origin, List[Keyboard]]:
@@ -174,6 +214,14 @@ class ControllerCore:
         """
         Connect the MIDI ports.
 
+        Once both ports are connected, the capabilities of the Arduino are
+        negotiated to use the fastest modes it supports (see
+        `MidiConnection.negotiate`).
+
+        If the Arduino has a mirror, the keyboards mirrored for the output
+        port are shown as soon as it is connected, before the negotiation,
+        and fetched again in the background once both ports are connected.
+
         Parameters
         ----------
         inport : str, optional
@@ -187,21 +235,29 @@ class ControllerCore:
 
         """
         if inport:
-            midiio.connect_input(inport)
+            self.connection.connect_input(inport)
         if outport:
-            midiio.connect_output(outport)
+            self.arduino.forget_acked_keyboards()
+            self.connection.connect_output(outport)
+            if self.arduino.mirror is not None:
+                self.arduino.load_mirror()
+        if not(self.is_midi_input_ready() and self.is_midi_output_ready()):
+            return
+        self.arduino.use_capabilities(self.connection.negotiate())
+        if self.arduino.mirror is not None:
+            self.pull_keyboards()
 
     def close_midi(self):
         """Close the MIDI ports."""
-        midiio.close()
+        self.connection.close()
 
     def is_midi_input_ready(self):
         """Return True if the MIDI input port is ready, False otherwise."""
-        return midiio.input_ready()
+        return self.connection.input_ready()
 
     def is_midi_output_ready(self):
         """Return True if the MIDI output port is ready, False otherwise."""
-        return midiio.output_ready()
+        return self.connection.output_ready()
 
     def list_midi_ports(self):
         """
@@ -215,7 +271,20 @@ class ControllerCore:
             The names of the available output ports.
 
         """
-        return midiio.list_input_ports(), midiio.list_output_ports()
+        return (self.connection.list_input_ports(),
+                self.connection.list_output_ports())
+
+    def get_midi_metrics(self) -> Dict[str, dict]:
+        """
+        Return the counters and histograms measuring the MIDI traffic.
+
+        Returns
+        -------
+        Dict[str, dict]
+            See `MidiConnection.get_metrics`.
+
+        """
+        return self.connection.get_metrics()
 
 
 class KeyboardState:
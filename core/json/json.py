@@ -135,6 +135,7 @@ def keyboard_from_dict(d: Dict) -> Keyboard:
         raise ValueError(f"Keyboard type '{d['__type__']}' unknown.")
     kbd.name = d['name']
     kbd.keyboard = [mididata_from_dict(data) for data in d['data']]
+    kbd.version += 1
     return kbd
 
 
@@ -11,8 +11,24 @@ class Keyboard(ABC):
     """Abstract class for representing a keyboard."""
 
     def __init__(self, name: str = None):
+        self.version = 0
+        """Incremented at each change of the keyboard, so that values computed
+        from it can be reused while it is unchanged. Keys are changed with
+        `set_data` (midi data are immutable); changes made directly to
+        `keyboard` must increment it too."""
+        self._name = None
         self.name = name
 
+    @property
+    def name(self) -> str:
+        """The name of the keyboard."""
+        return self._name
+
+    @name.setter
+    def name(self, name: str):
+        self._name = name
+        self.version += 1
+
     @abstractmethod
     def set_data(self, identifier, data: MidiData):
         """
@@ -102,6 +118,7 @@ class Left96ButtonKeyboard(Keyboard):
                 "data must be of type MidiData (or subclasses), not {}"
                 .format(type(data)))
         self.keyboard[identifier-1] = data
+        self.version += 1
 
     def get_data(self, identifier: int):
         """
@@ -173,6 +190,7 @@ class Right81ButtonKeyboard(Keyboard):
                 "data must be of type MidiData (or subclasses), not {}"
                 .format(type(data)))
         self.keyboard[identifier-1] = data
+        self.version += 1
 
     def get_data(self, identifier: int):
         """
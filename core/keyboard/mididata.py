@@ -36,7 +36,12 @@ def _verify_value(value: int):
 
 
 class MidiData(ABC):  # pylint: disable=R0903
-    """Abstract class for representing midi data."""
+    """Abstract class for representing midi data.
+
+    Midi data are immutable: to change a key, a new midi data replaces the
+    previous one with `Keyboard.set_data`, so that the keyboard's version
+    changes.
+    """
 
 
 class NoteData(MidiData):
@@ -82,35 +87,21 @@ class NoteData(MidiData):
         # pylint: disable=C0116
         return self._channel
 
-    @channel.setter
-    def channel(self, channel: int):
-        _verify_channel(channel)
-        self._channel = channel
-
     @property
     def pitch(self) -> int:
         # pylint: disable=C0116
         return self._pitch
 
-    @pitch.setter
-    def pitch(self, pitch: int):
-        _verify_pitch(pitch)
-        self._pitch = pitch
-
     @property
     def velocity(self) -> int:
         # pylint: disable=C0116
         return self._velocity
 
-    @velocity.setter
-    def velocity(self, velocity: int):
-        _verify_velocity(velocity)
-        self._velocity = velocity
-
     def __repr__(self) -> str:
         return "NoteData(channel={!r}, pitch={!r}, velocity={!r})".format(
             self.channel, self.pitch, self.velocity)
 
+
 class ProgramData(MidiData):
     """Represents a midi program signal.
 
@@ -145,21 +136,11 @@ class ProgramData(MidiData):
         # pylint: disable=C0116
         return self._channel
 
-    @channel.setter
-    def channel(self, channel: int):
-        _verify_channel(channel)
-        self._channel = channel
-
     @property
     def number(self) -> int:
         # pylint: disable=C0116
         return self._number
 
-    @number.setter
-    def number(self, number: int):
-        _verify_number(number)
-        self._number = number
-
     def __repr__(self) -> str:
         return "ProgramData(channel={!r}, number={!r})".format(
             self.channel, self.number)
@@ -208,31 +189,16 @@ class ControlData(MidiData):
         # pylint: disable=C0116
         return self._channel
 
-    @channel.setter
-    def channel(self, channel: int):
-        _verify_channel(channel)
-        self._channel = channel
-
     @property
     def number(self) -> int:
         # pylint: disable=C0116
         return self._number
 
-    @number.setter
-    def number(self, number: int):
-        _verify_number(number)
-        self._number = number
-
     @property
     def value(self) -> int:
         # pylint: disable=C0116
         return self._value
 
-    @value.setter
-    def value(self, value: int):
-        _verify_value(value)
-        self._value = value
-
     def __repr__(self) -> str:
         return "ControlData(channel={!r}, number={!r}, value={!r})".format(
             self.channel, self.number, self.value)
@@ -47,4 +47,20 @@ class Notification:
         None.
 
         """
-        self.call.append(slot)
\ No newline at end of file
+        self.call.append(slot)
+
+    def disconnect(self, slot):
+        """
+        Disconnect a callable from the notification object.
+
+        Parameters
+        ----------
+        slot : callable
+            The callable to disconnect.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.call.remove(slot)
\ No newline at end of file
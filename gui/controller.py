@@ -7,12 +7,14 @@ title="Flaticon"> www.flaticon.com</a>
 import os
 
 # pylint: disable=E0611
-from PyQt5.QtCore import QSize, Qt, QObject, QCoreApplication, QSettings
+from PyQt5.QtCore import QSize, Qt, QObject, QCoreApplication, QSettings,\
+    QStandardPaths, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QMainWindow, QAction, QFileDialog, QDialog,\
     QDialogButtonBox, QVBoxLayout, QFormLayout, QComboBox, QLabel
 from PyQt5.QtGui import QIcon
 
 from core import ControllerCore
+from core.arduino import DeviceMirror
 from core.keyboard import Right81ButtonKeyboard
 
 import gui.resources  # pylint: disable=W0611
@@ -25,6 +27,8 @@ from .settings import SettingsDialog
 class ControllerGUI(QMainWindow):
     """Main class of the GUI module using QT framework."""
 
+    fetch_completed = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
 
@@ -33,8 +37,11 @@ class ControllerGUI(QMainWindow):
 
         self.base_path = os.getcwd()
 
-        # Controller core
-        self.controller = ControllerCore()
+        # Controller core, showing the last keyboards of the Arduino while
+        # they are fetched again
+        mirror = DeviceMirror(os.path.join(QStandardPaths.writableLocation(
+            QStandardPaths.CacheLocation), "devices"))
+        self.controller = ControllerCore(mirror=mirror)
 
         # Actions
         self.actions = Actions(self)
@@ -80,6 +87,18 @@ class ControllerGUI(QMainWindow):
         self.setCentralWidget(self.current_keyboards)
         self.current_keyboards.show_message.connect(self.show_status_message)
 
+        # Emitted from the MIDI threads, handled in the GUI thread
+        self.controller.arduino.fetch_completed.connect(
+            self.fetch_completed.emit)
+        self.fetch_completed.connect(self.show_fetch_report)
+
+        # Transfer statistics, shown if enabled in the settings
+        self.metrics_label = QLabel(self)
+        self.statusBar().addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(1000)
+        self.metrics_timer.timeout.connect(self.show_metrics)
+
         self.connect_actions()
 
         self.load_settings()
@@ -103,6 +122,8 @@ class ControllerGUI(QMainWindow):
         self.actions.redo.triggered.connect(self.current_keyboards.redo)
         self.actions.settings.triggered.connect(self.settings_dialog)
         self.actions.send.triggered.connect(self.current_keyboards.send)
+        self.actions.audition.toggled.connect(
+            self.current_keyboards.set_audition)
         self.actions.store.triggered.connect(self.current_keyboards.store)
         self.actions.pull.triggered.connect(self.controller.pull_keyboards)
         # self.actions.create_keyboard.triggered.connect(
@@ -208,9 +229,12 @@ class ControllerGUI(QMainWindow):
         if self.controller.is_midi_output_ready():
             self.actions.send.setEnabled(True)
             self.actions.store.setEnabled(True)
+            self.actions.audition.setEnabled(True)
         else:
             self.actions.send.setEnabled(False)
             self.actions.store.setEnabled(False)
+            self.actions.audition.setChecked(False)
+            self.actions.audition.setEnabled(False)
 
         if(self.controller.is_midi_input_ready()
            and self.controller.is_midi_output_ready()):
@@ -218,6 +242,14 @@ class ControllerGUI(QMainWindow):
         else:
             self.actions.pull.setEnabled(False)
 
+        if settings.value("show_metrics", False, bool):
+            self.show_metrics()
+            self.metrics_label.show()
+            self.metrics_timer.start()
+        else:
+            self.metrics_timer.stop()
+            self.metrics_label.hide()
+
         settings.endGroup()  # midi
 
     def populate_keyboard_selection_model(self):
@@ -256,6 +288,66 @@ class ControllerGUI(QMainWindow):
         """
         self.statusBar().showMessage(message, timeout)
 
+    def show_fetch_report(self, session):
+        """
+        Show the result of a fetch in the status bar.
+
+        Parameters
+        ----------
+        session : FetchSession
+            The ended fetch session.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.controller.arduino.stale:
+            self.show_status_message(
+                self.tr("The Arduino didn't answer, showing the keyboards "
+                        "of the last connection"))
+            return
+        if session.lost:
+            self.show_status_message(
+                self.tr("{} keyboards could not be pulled, showing the "
+                        "previous ones").format(session.lost))
+            return
+        message = self.tr("Pulled {} keyboards in {:.2f} s ({} bytes)").format(
+            len(session.stored) + len(session.current),
+            session.duration, session.bytes_received)
+        if session.rejected:
+            message += self.tr(", {} could not be read").format(
+                session.rejected)
+        self.show_status_message(message)
+
+    def show_metrics(self):
+        """
+        Show the MIDI transfer statistics in the status bar.
+
+        Returns
+        -------
+        None.
+
+        """
+        metrics = self.controller.get_midi_metrics()
+        counters = metrics["counters"]
+        ack_rtt = metrics["histograms"].get("ack_rtt", {})
+        queue_wait = metrics["histograms"].get("queue_wait", {})
+        audition = metrics["histograms"].get("audition_latency", {})
+        self.metrics_label.setText(
+            self.tr("Out: {} msg / {} B  In: {} msg / {} B  "
+                    "Ack: {:.1f} ms  Wait: {:.1f} ms  Queued: {}  "
+                    "Audition: {:.1f} ms  Link: {:.0f} B/s").format(
+                counters.get("messages_out", 0),
+                counters.get("bytes_out", 0),
+                counters.get("messages_in", 0),
+                counters.get("bytes_in", 0),
+                ack_rtt.get("median", 0.) * 1000,
+                queue_wait.get("median", 0.) * 1000,
+                metrics["gauges"]["queued"],
+                audition.get("median", 0.) * 1000,
+                metrics["gauges"]["link_capacity"]))
+
 
 class Actions(QObject):
     """Contains every QAction the GUI can use."""
@@ -340,6 +432,15 @@ class Actions(QObject):
             QIcon(':/icons/send-button.svg'),
             self.tr('Send current keyboard to the accordion'),
             owner)
+        # Live audition
+        self.audition = QAction(
+            QIcon(':/icons/send-button.svg'),
+            self.tr('Live audition'),
+            owner)
+        self.audition.setCheckable(True)
+        self.audition.setStatusTip(
+            self.tr('Send each change of the current keyboard to the '
+                    'accordion'))
         # Store on Arduino
         self.store = QAction(
             QIcon(':/icons/upload-button.svg'),
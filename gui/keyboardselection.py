@@ -3,7 +3,7 @@
 import os
 import inspect
 
-from PyQt5.QtCore import QDir, QCoreApplication, pyqtSignal
+from PyQt5.QtCore import QDir, QCoreApplication, QDateTime, pyqtSignal
 from PyQt5.QtWidgets import QDockWidget, QTreeView, QFileSystemModel,\
     QVBoxLayout, QListView, QLabel, QWidget, QListWidget
 from PyQt5.QtGui import QStandardItemModel, QStandardItem
@@ -52,12 +52,15 @@ class ArduinoSelectionWidget(QWidget):
     """Widget containing everithing needed to display keyboards of Arduino."""
 
     keyboard_selected = pyqtSignal(Keyboard)
+    keyboards_list_changed = pyqtSignal()
 
     def __init__(self, controller, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.controller = controller
+        # Notified from the MIDI and audition threads
         self.controller.arduino.keyboards_list_changed.connect(
-            self.update_keyboards)
+            self.keyboards_list_changed.emit)
+        self.keyboards_list_changed.connect(self.update_keyboards)
 
         curr_kbds_label = QLabel(self.tr("Current keyboards"))
         self.current_keyboards = QTreeView()
@@ -67,6 +70,10 @@ class ArduinoSelectionWidget(QWidget):
         self.current_keyboards.doubleClicked.connect(
             self.current_keyboard_clicked)
 
+        self.stale_label = QLabel()
+        self.stale_label.setWordWrap(True)
+        self.stale_label.hide()
+
         stored_kbds_label = QLabel(self.tr("Stored keyboards"))
         self.stored_keyboards = QTreeView()
         self.stored_kbd_model = ArduinoSelectionModel()
@@ -76,6 +83,7 @@ class ArduinoSelectionWidget(QWidget):
             self.stored_keyboard_clicked)
 
         main_layout = QVBoxLayout()
+        main_layout.addWidget(self.stale_label)
         main_layout.addWidget(curr_kbds_label)
         main_layout.addWidget(self.current_keyboards)
         main_layout.addWidget(stored_kbds_label)
@@ -99,6 +107,16 @@ class ArduinoSelectionWidget(QWidget):
         if current:
             self.current_kbd_model.add_keyboard(current)
 
+        # Keyboards of the mirror, not confirmed by the Arduino yet
+        saved = arduino.mirror_saved
+        if arduino.stale and saved is not None:
+            self.stale_label.setText(
+                self.tr("Keyboards of {}, being updated...").format(
+                    QDateTime.fromSecsSinceEpoch(int(saved)).toString()))
+            self.stale_label.show()
+        else:
+            self.stale_label.hide()
+
     def current_keyboard_clicked(self, index):
         item = self.current_kbd_model.itemFromIndex(index)
         if inspect.isclass(item.data()):
@@ -22,6 +22,7 @@ class CurrentKeyboardsWidget(QWidget):
         super().__init__(parent)
 
         self.controller = controller
+        self.auditioning = False
 
         self.layout = QVBoxLayout(self)
         self.tab_widget = QTabWidget(self)
@@ -30,6 +31,7 @@ class CurrentKeyboardsWidget(QWidget):
         self.tab_widget.setMovable(True)
 
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
+        self.tab_widget.currentChanged.connect(self.update_audition)
 
         self.layout.addWidget(self.tab_widget)
         self.setLayout(self.layout)
@@ -167,6 +169,23 @@ class CurrentKeyboardsWidget(QWidget):
         if tab:
             tab.store()
 
+    def set_audition(self, enabled):
+        """Push the changes of the current keyboard to Arduino if `enabled`.
+        """
+        self.auditioning = enabled
+        self.update_audition()
+
+    def update_audition(self):
+        """Audition the current keyboard, if the live audition is enabled."""
+        tab = self.tab_widget.currentWidget()
+        if self.auditioning and tab:
+            if(not self.controller.audition or
+               self.controller.audition.keyboard_state
+               is not tab.keyboard_state):
+                self.controller.start_audition(tab.keyboard_state)
+        else:
+            self.controller.stop_audition()
+
     def close_tab(self, index):
         """Close tab of given index."""
         tab = self.tab_widget.widget(index)
@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem,\
     QGraphicsObject, QGraphicsSimpleTextItem, QDialog, QFormLayout,\
     QVBoxLayout, QHBoxLayout, QSpinBox, QDial, QDialogButtonBox, QComboBox,\
     QWidget, QStackedWidget, QListWidget, QListView, QSplitter,\
-    QListWidgetItem, QGroupBox
+    QListWidgetItem, QGroupBox, QCheckBox
 from PyQt5.QtGui import QPixmap, QPainter, QColor, QBrush, QIcon
 from PyQt5.QtSvg import QGraphicsSvgItem
 
@@ -112,8 +112,18 @@ class IOPage(QWidget):
         port_form.addRow(self.tr("Output port:"), self.outport_combo)
         ports_grp.setLayout(port_form)
 
+        # Transfer statistics
+        metrics_grp = QGroupBox(self.tr("Statistics"), self)
+        metrics_layout = QVBoxLayout()
+        self.metrics_check = QCheckBox(
+            self.tr("Show transfer statistics in the status bar"))
+        self.metrics_check.toggled.connect(self.setting_modified)
+        metrics_layout.addWidget(self.metrics_check)
+        metrics_grp.setLayout(metrics_layout)
+
         main_layout = QVBoxLayout()
         main_layout.addWidget(ports_grp)
+        main_layout.addWidget(metrics_grp)
         self.setLayout(main_layout)
         self.load_settings()
 
@@ -145,6 +155,9 @@ class IOPage(QWidget):
         else:
             self.outport_combo.setCurrentText("-")
 
+        self.metrics_check.setChecked(
+            settings.value("show_metrics", False, bool))
+
         settings.endGroup()
 
     def apply(self):
@@ -160,4 +173,6 @@ class IOPage(QWidget):
         if str(settings.value("outport", "-")) != outport:
             settings.setValue("outport", outport)
 
+        settings.setValue("show_metrics", self.metrics_check.isChecked())
+
         settings.endGroup()
@@ -21,6 +21,7 @@ class ToolBar(QToolBar):
         self.addAction(actions.delete_keyboard)
         self.addAction(actions.reset_keyboard)
         self.addAction(actions.send)
+        self.addAction(actions.audition)
         self.addAction(actions.store)
         self.addSeparator()
         self.addAction(actions.about)
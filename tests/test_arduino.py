@@ -0,0 +1,668 @@
+"""Tests of `Arduino` against a `VirtualArduino`."""
+
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from core.arduino import Arduino, DeviceMirror
+from core.arduino.io.connection import MidiConnection
+from core.arduino.io.dao.midi import KeyboardMidiDAO,\
+    Left96ButtonKeyboardMidiDAO, Right81ButtonKeyboardMidiDAO,\
+    MidiDataMidiDAO, encode_name, decode_name, frame_checksum,\
+    get_midi_data_encoder, midi_data_decoders, midi_data_encoders,\
+    midi_data_limits, register_midi_data_dao, validate_frame
+from core.arduino.io.virtualarduino import VirtualArduino
+from core.keyboard import Left96ButtonKeyboard, Right81ButtonKeyboard,\
+    MidiData, NoteData, ProgramData, ControlData
+
+
+def wait(*transfers, timeout: float = 10.):
+    """Wait for `transfers` (or fetch sessions) to be done."""
+    deadline = time.monotonic() + timeout
+    while not all(transfer.done() for transfer in transfers):
+        if time.monotonic() > deadline:
+            raise TimeoutError("transfers not done: {}".format(transfers))
+        time.sleep(0.005)
+
+
+def wait_until(predicate, timeout: float = 10.):
+    """Wait for `predicate` to return True."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError("condition not met")
+        time.sleep(0.005)
+
+
+class CorruptingArduino(VirtualArduino):
+    """A `VirtualArduino` changing the name of the keyboard frames it sends
+    at the positions in `corrupt`, without updating their check byte."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.corrupt = set()
+        self.frames_sent = 0
+
+    def send(self, data: bytes):
+        if data[0] in (0x01, 0x02):
+            if self.frames_sent in self.corrupt:
+                # Still a valid base-64 name, of another keyboard
+                data = data[:2] + bytes([data[2] ^ 0x01]) + data[3:]
+            self.frames_sent += 1
+        super().send(data)
+
+
+class ArduinoTestCase(unittest.TestCase):
+    """Drive an `Arduino` connected to a `VirtualArduino`."""
+
+    def setUp(self):
+        self.device = CorruptingArduino(eeprom_size=100000)
+        self.connection = MidiConnection(backend=self.device)
+        self.connection.connect()
+        self.connection.set_window(4)
+        self.arduino = Arduino(self.connection)
+        self.arduino.delta_patches = True
+
+    def tearDown(self):
+        self.connection.close()
+
+    def device_current(self, kbd_type: int = 0x01):
+        """Decode the current keyboard of the device."""
+        self.device.wait_idle()
+        return Right81ButtonKeyboardMidiDAO(MidiConnection()).from_bytes(
+            self.device.current[kbd_type])
+
+    def test_pipelined_stores(self):
+        keyboards = [Right81ButtonKeyboard("Pipelined {}".format(i))
+                     for i in range(8)]
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+        self.device.wait_idle()
+        self.assertEqual(self.device.stats["stored"], len(keyboards))
+        self.assertEqual(self.connection.get_window(), 4)
+
+    def test_pipelining_unsupported(self):
+        self.device.sequences = False
+        keyboards = [Right81ButtonKeyboard("Stop and wait {}".format(i))
+                     for i in range(4)]
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+        self.device.wait_idle()
+        self.assertEqual(self.device.stats["stored"], len(keyboards))
+        self.assertEqual(self.connection.get_window(), 1)
+
+    def test_messages_written_on_writer_thread(self):
+        keyboards = [Right81ButtonKeyboard("Written {}".format(i))
+                     for i in range(4)]
+        threads = set()
+        receive = self.device.receive
+        def record(data):
+            threads.add(threading.current_thread().name)
+            receive(data)
+        with mock.patch.object(self.device, "receive", record):
+            wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+            self.assertTrue(self.connection.flush())
+        self.assertEqual(threads, {"midiio-writer"})
+
+    def test_negotiation(self):
+        capabilities = self.connection.negotiate()
+        self.arduino.use_capabilities(capabilities)
+        self.assertIn("pipelining", capabilities)
+        self.assertTrue(self.arduino.delta_patches)
+        self.assertTrue(self.arduino.incremental_fetch)
+        self.assertTrue(self.connection.compact_names)
+        self.assertFalse(self.connection.frame_checksums)
+
+    def test_negotiation_unsupported(self):
+        self.device.negotiation = False
+        self.connection.compact_names = True
+        capabilities = self.connection.negotiate(timeout=0.1)
+        self.arduino.use_capabilities(capabilities)
+        self.assertIsNone(capabilities)
+        self.assertFalse(self.arduino.delta_patches)
+        self.assertFalse(self.arduino.incremental_fetch)
+        self.assertFalse(self.connection.compact_names)
+        # Pipelining is still detected from the confirmations
+        wait(self.arduino.store_keyboard(Right81ButtonKeyboard("Alpha")))
+        self.assertEqual(self.connection.get_window(), 4)
+
+    def test_compact_names(self):
+        self.arduino.use_capabilities(self.connection.negotiate())
+        kbd = Right81ButtonKeyboard("Accordéon à droite")
+        kbd.set_data(1, NoteData(0, 60, 100))
+        wait(self.arduino.store_keyboard(kbd),
+             self.arduino.set_current_keyboard(kbd))
+        self.assertEqual(self.device_current(), kbd)
+        session = self.fetch()
+        self.assertEqual(session.stored, [kbd])
+        self.assertEqual(session.current, [kbd])
+
+    def test_stores_in_chunks(self):
+        self.device.buffer_size = 64
+        self.connection.set_chunk_size(60)
+        keyboards = []
+        for i in range(2):
+            kbd = Right81ButtonKeyboard("Chunked {}".format(i))
+            for j in range(1, 82):
+                kbd.set_data(j, NoteData(0, 20 + j, 100))
+            keyboards.append(kbd)
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+        self.device.wait_idle()
+        self.assertEqual(self.device.stats["stored"], 2)
+        self.assertEqual(self.device.stats["overflows"], 0)
+        self.assertGreater(self.device.stats["chunks"], 10)
+
+    def store_on_slow_device(self, paced: bool) -> int:
+        """Store keyboards faster than the device can, and return the number
+        of keyboards stored."""
+        self.device.bandwidth = 100000.
+        self.device.process_rate = 20000.
+        self.device.input_buffer = 700
+        self.connection.set_pacing(paced)
+        keyboards = []
+        for i in range(10):
+            kbd = Right81ButtonKeyboard("Paced {}".format(i))
+            for j in range(1, 82):
+                kbd.set_data(j, NoteData(0, 20 + j, 100))
+            keyboards.append(kbd)
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+        self.device.wait_idle()
+        return self.device.stats["stored"]
+
+    def test_writes_paced(self):
+        self.assertEqual(self.store_on_slow_device(True), 10)
+        self.assertEqual(self.device.stats["overflows"], 0)
+
+    def test_writes_not_paced(self):
+        self.assertLess(self.store_on_slow_device(False), 10)
+        self.assertGreater(self.device.stats["overflows"], 0)
+
+    def test_keyboards_decoded_on_receiver_thread(self):
+        wait(self.arduino.store_keyboard(Right81ButtonKeyboard("Alpha")))
+        threads = []
+        def slot(kbd, origin):
+            threads.append(threading.current_thread().name)
+        self.arduino.keyboard_received.connect(slot)
+        self.fetch()
+        self.assertEqual(threads, ["midiio-receiver"])
+
+    def test_patch_after_quick_edit_and_undo(self):
+        kbd = Right81ButtonKeyboard("Audition")
+        for j in range(1, 82):
+            kbd.set_data(j, NoteData(0, 20 + j, 100))
+        wait(self.arduino.set_current_keyboard(kbd))
+        self.assertEqual(self.device_current(), kbd)
+
+        kbd.set_data(5, NoteData(0, 99, 100))
+        first = self.arduino.set_current_keyboard(kbd)
+        kbd.set_data(5, NoteData(0, 25, 100))
+        second = self.arduino.set_current_keyboard(kbd)
+        wait(first, second)
+        self.assertEqual(self.device_current(), kbd)
+
+        # Once nothing is in flight, patches are sent again
+        kbd.set_data(6, NoteData(0, 1, 100))
+        wait(self.arduino.set_current_keyboard(kbd))
+        self.assertGreater(self.device.stats["patches"], 0)
+        self.assertEqual(self.device_current(), kbd)
+
+    def test_sent_keyboard_changed_after_call(self):
+        kbd = Right81ButtonKeyboard("Audition")
+        wait(self.arduino.set_current_keyboard(kbd))
+        kbd.set_data(1, NoteData(0, 60, 100))
+        transfer = self.arduino.set_current_keyboard(kbd)
+        kbd.set_data(1, NoteData(0, 61, 100))
+        wait(transfer)
+        kbd.set_data(2, NoteData(0, 62, 100))
+        wait(self.arduino.set_current_keyboard(kbd))
+        self.assertEqual(self.device_current(), kbd)
+
+    def test_patch_of_changed_keyboard(self):
+        kbd = Right81ButtonKeyboard("Audition")
+        wait(self.arduino.set_current_keyboard(kbd))
+        # Changed behind the controller's back
+        other = Right81ButtonKeyboard("Audition")
+        other.set_data(2, NoteData(0, 62, 100))
+        dao = self.arduino.dao_factory.get_right_81_button_keyboard_dao()
+        wait(dao.send_set_current_keyboard(other))
+
+        kbd.set_data(1, NoteData(0, 60, 100))
+        wait(self.arduino.set_current_keyboard(kbd))
+        wait_until(lambda: self.device_current() == kbd)
+        self.assertEqual(self.device.stats["patches_rejected"], 1)
+        self.assertEqual(self.device.stats["patches"], 0)
+
+    def test_unchanged_keyboard_encoded_once(self):
+        kbd = Right81ButtonKeyboard("Audition")
+        kbd.set_data(1, NoteData(0, 60, 100))
+        with mock.patch.object(
+                KeyboardMidiDAO, "_get_midi_data_bytes",
+                wraps=KeyboardMidiDAO._get_midi_data_bytes) as encode:
+            transfers = [self.arduino.set_current_keyboard(kbd),
+                         self.arduino.store_keyboard(kbd)]
+            for _ in range(5):
+                transfers.append(self.arduino.set_current_keyboard(kbd))
+                wait(transfers[-1])
+            wait(*transfers)
+            self.assertEqual(encode.call_count, 81)
+
+            kbd.set_data(2, NoteData(0, 61, 100))
+            wait(self.arduino.set_current_keyboard(kbd),
+                 self.arduino.store_keyboard(kbd))
+            self.assertEqual(encode.call_count, 2*81)
+        self.assertEqual(self.device_current(), kbd)
+
+    def test_store_kept_before_rename(self):
+        filler = Right81ButtonKeyboard("Filler")
+        first = Right81ButtonKeyboard("A")
+        second = Right81ButtonKeyboard("A")
+        second.set_data(1, NoteData(0, 60, 100))
+        self.connection.set_window(1)
+        transfers = [self.arduino.store_keyboard(filler),
+                     self.arduino.store_keyboard(first)]
+        transfers.append(self.arduino.rename_keyboard(first, "B"))
+        transfers.append(self.arduino.store_keyboard(second))
+        wait(*[transfer for transfer in transfers if transfer is not None])
+        self.device.wait_idle()
+        self.assertEqual(sorted(self.device.get_stored_names()[0x01]),
+                         sorted([b"QQ==", b"Qg==", b"RmlsbGVy"]))
+        self.assertEqual(
+            sorted(kbd.name for kbd in self.arduino.get_stored_keyboards()),
+            ["A", "B", "Filler"])
+
+    def test_store_superseded(self):
+        first = Right81ButtonKeyboard("A")
+        second = Right81ButtonKeyboard("A")
+        second.set_data(1, NoteData(0, 60, 100))
+        self.connection.set_window(1)
+        filler = self.arduino.store_keyboard(Right81ButtonKeyboard("Filler"))
+        superseded = self.arduino.store_keyboard(first)
+        wait(filler, superseded, self.arduino.store_keyboard(second))
+        self.assertEqual(superseded.error, "superseded")
+
+    def fetch(self, sync: bool = False):
+        """Fetch the keyboards, or only the changed ones if `sync`, and wait
+        until they replaced the known ones."""
+        completed = threading.Event()
+        def slot(session):
+            completed.set()
+        self.arduino.fetch_completed.connect(slot)
+        if sync:
+            session = self.arduino.sync_keyboards()
+        else:
+            session = self.arduino.fetch_keyboards()
+        self.assertTrue(completed.wait(10))
+        self.arduino.fetch_completed.disconnect(slot)
+        return session
+
+    def use_mirror(self):
+        """Mirror the keyboards in a temporary directory, with check
+        bytes."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.arduino.mirror = DeviceMirror(directory.name)
+        self.device.checksums = self.connection.frame_checksums = True
+
+    def mirrored_names(self):
+        """Return the sorted names of the mirrored stored keyboards."""
+        stored, _, _ = self.arduino.mirror.load(
+            self.connection.get_device_id())
+        return sorted(kbd.name for kbd in stored)
+
+    def stored_names(self):
+        """Return the sorted names of the known stored keyboards."""
+        return sorted(kbd.name
+                      for kbd in self.arduino.get_stored_keyboards())
+
+    def fetch_with_corruptions(self, corrupt, incremental_fetch: bool,
+                               changed: bool = False):
+        """Fetch three keyboards once, then again with the frames at the
+        positions `corrupt` from the start of the second fetch corrupted.
+        If `changed`, the second keyboard is changed on the device between
+        the fetches."""
+        self.use_mirror()
+        self.arduino.incremental_fetch = incremental_fetch
+        names = ["Alpha", "Bravo", "Delta"]
+        wait(*[self.arduino.store_keyboard(Right81ButtonKeyboard(name))
+               for name in names])
+        self.device.wait_idle()
+        self.fetch()
+        self.assertEqual(self.mirrored_names(), names)
+        if changed:
+            kbd = Right81ButtonKeyboard("Bravo")
+            kbd.set_data(1, NoteData(0, 60, 100))
+            dao = self.arduino.dao_factory.get_right_81_button_keyboard_dao()
+            wait(dao.send_store_keyboard(kbd))
+            self.device.wait_idle()
+
+        self.device.corrupt = {self.device.frames_sent + index
+                               for index in corrupt}
+        session = self.fetch()
+        self.assertEqual(self.stored_names(), names)
+        self.assertEqual(self.mirrored_names(), names)
+        return session
+
+    def test_control_overtakes_bulk(self):
+        self.connection.set_window(1)
+        stores = [self.arduino.store_keyboard(
+            Right81ButtonKeyboard("Bulk {}".format(i))) for i in range(4)]
+        delete = self.arduino.delete_keyboard(Left96ButtonKeyboard("Other"))
+        wait(delete, *stores)
+        self.assertEqual(delete.priority, "control")
+        self.assertLess(delete.announced, stores[-1].announced)
+
+    def test_control_kept_after_bulk_on_same_keyboard(self):
+        self.connection.set_window(1)
+        stores = [self.arduino.store_keyboard(
+            Right81ButtonKeyboard("Bulk {}".format(i))) for i in range(4)]
+        rename = self.arduino.rename_keyboard(
+            Right81ButtonKeyboard("Bulk 3"), "Renamed")
+        wait(rename, *stores)
+        self.assertGreater(rename.announced, stores[-1].announced)
+        self.device.wait_idle()
+        self.assertIn(b"UmVuYW1lZA==", self.device.get_stored_names()[0x01])
+
+    def test_fetch_session(self):
+        keyboards = [Right81ButtonKeyboard("Right"),
+                     Left96ButtonKeyboard("Left")]
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+        changes = []
+        self.arduino.keyboards_list_changed.connect(
+            lambda: changes.append(None))
+        session = self.fetch()
+        self.assertEqual(session.end_reason, "marker")
+        self.assertEqual(len(session.stored), 2)
+        self.assertEqual(len(changes), 1)
+
+        # Older firmwares don't send the end marker
+        self.device.end_marker = False
+        session = self.fetch()
+        self.assertEqual(session.end_reason, "quiet")
+        self.assertEqual(len(session.stored), 2)
+        self.assertEqual(len(changes), 2)
+        self.assertEqual(self.stored_names(), ["Left", "Right"])
+
+    def test_sync_keyboards(self):
+        self.arduino.incremental_fetch = True
+        keyboards = [Right81ButtonKeyboard("Alpha"),
+                     Right81ButtonKeyboard("Bravo")]
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards])
+        self.fetch()
+        changed = Right81ButtonKeyboard("Bravo")
+        changed.set_data(1, NoteData(0, 60, 100))
+        dao = self.arduino.dao_factory.get_right_81_button_keyboard_dao()
+        wait(dao.send_store_keyboard(changed))
+
+        session = self.fetch(sync=True)
+        self.assertEqual((session.end_reason, session.reused),
+                         ("complete", 1))
+        self.assertIn(changed, self.arduino.get_stored_keyboards())
+        self.assertEqual(self.stored_names(), ["Alpha", "Bravo"])
+
+    def test_fetch_with_corrupted_name(self):
+        session = self.fetch_with_corruptions({1}, False)
+        self.assertEqual(session.lost, 1)
+
+    def test_fetch_with_corrupted_name_listed_again(self):
+        session = self.fetch_with_corruptions({1}, True)
+        self.assertEqual((session.lost, session.retried), (0, 1))
+
+    def test_fetch_with_corrupted_replies(self):
+        session = self.fetch_with_corruptions(range(1, 10), True, True)
+        self.assertEqual(session.lost, 1)
+        self.assertEqual(session.retried, session.max_retries)
+
+    def test_fetch_with_unknown_midi_data(self):
+        self.use_mirror()
+        self.arduino.incremental_fetch = True
+        wait(self.arduino.store_keyboard(Right81ButtonKeyboard("Alpha")))
+        self.device.wait_idle()
+        # A keyboard using a type of midi data not registered
+        dao = Right81ButtonKeyboardMidiDAO(MidiConnection())
+        kbd = Right81ButtonKeyboard("Future")
+        frame = dao._to_bytes(kbd)  # pylint: disable=W0212
+        data = frame.index(0x00, 1) + 1
+        self.device.eeprom.append(frame[:data] + bytes([0x7f, 1, 2, 3])
+                                  + frame[data+1:])
+        session = self.fetch()
+        self.assertEqual((session.lost, session.rejected, session.retried),
+                         (0, 1, 0))
+        self.assertEqual(self.stored_names(), ["Alpha"])
+        self.assertEqual(self.mirrored_names(), ["Alpha"])
+        self.assertEqual(self.connection.metrics.counter("frames_rejected"),
+                         1)
+
+    def test_mirror_shown_before_fetch(self):
+        self.use_mirror()
+        wait(self.arduino.store_keyboard(Right81ButtonKeyboard("Alpha")))
+        self.fetch()
+        arduino = Arduino(self.connection, self.arduino.mirror)
+        self.assertTrue(arduino.load_mirror())
+        self.assertTrue(arduino.stale)
+        self.assertEqual([kbd.name for kbd in arduino.get_stored_keyboards()],
+                         ["Alpha"])
+
+    def test_fetch_with_lost_keyboards(self):
+        self.use_mirror()
+        keyboards = [Right81ButtonKeyboard("Right"),
+                     Left96ButtonKeyboard("Left")]
+        wait(*[self.arduino.store_keyboard(kbd) for kbd in keyboards],
+             self.arduino.set_current_keyboard(keyboards[0]))
+        self.device.wait_idle()
+
+        self.device.error_rate = 1.
+        session = self.fetch()
+        self.assertGreater(session.lost, 0)
+        self.assertEqual(len(self.arduino.get_stored_keyboards()), 2)
+        self.assertEqual(self.arduino.get_current_right_keyboard(),
+                         keyboards[0])
+        self.assertIsNone(self.arduino.mirror.load(
+            self.connection.get_device_id()))
+
+        self.device.error_rate = 0.
+        session = self.fetch()
+        self.assertEqual(session.lost, 0)
+        self.assertIsNotNone(self.arduino.mirror.load(
+            self.connection.get_device_id()))
+
+
+def make_keyboard(kbd_type: type, name: str = "Golden"):
+    """Return a keyboard of `kbd_type` with keys of every kind of data."""
+    kbd = kbd_type(name)
+    for j in range(1, len(kbd.keyboard)+1):
+        if j % 4 == 1:
+            kbd.set_data(j, NoteData(j % 16, j, 127 - j))
+        elif j % 4 == 2:
+            kbd.set_data(j, ProgramData(j % 16, j))
+        elif j % 4 == 3:
+            kbd.set_data(j, ControlData(j % 16, j, 127 - j))
+    return kbd
+
+
+class CodecTestCase(unittest.TestCase):
+    """Encode and decode whole keyboards."""
+
+    # pylint: disable=W0212
+
+    keyboards = ((Right81ButtonKeyboardMidiDAO, Right81ButtonKeyboard),
+                 (Left96ButtonKeyboardMidiDAO, Left96ButtonKeyboard))
+
+    def test_wire_order(self):
+        # Checksums of the frames encoded key by key before the wire orders
+        checksums = {Right81ButtonKeyboard: 5159, Left96ButtonKeyboard: 8578}
+        for dao_type, kbd_type in self.keyboards:
+            frame = dao_type(MidiConnection())._to_bytes(
+                make_keyboard(kbd_type))
+            self.assertEqual(frame_checksum(frame), checksums[kbd_type])
+
+    def test_round_trip(self):
+        for dao_type, kbd_type in self.keyboards:
+            dao = dao_type(MidiConnection())
+            kbd = make_keyboard(kbd_type)
+            self.assertEqual(dao.from_bytes(dao._to_bytes(kbd)), kbd)
+
+    def test_decode_in_place(self):
+        for dao_type, kbd_type in self.keyboards:
+            dao = dao_type(MidiConnection())
+            kbd = make_keyboard(kbd_type)
+            # As given by mido: a tuple, with the bytes around the keyboard
+            data = tuple(b"\x7d\x01" + dao._to_bytes(kbd) + b"\x00")
+            self.assertEqual(dao.from_bytes(data, 2), kbd)
+
+    def test_frame_with_check_byte(self):
+        connection = MidiConnection()
+        connection.frame_checksums = True
+        for dao_type, kbd_type in self.keyboards:
+            dao = dao_type(connection)
+            kbd = make_keyboard(kbd_type)
+            frame = dao._to_frame(kbd, 0x02)
+            self.assertEqual(frame[:-1], b"\x02" + dao._to_bytes(kbd))
+            self.assertEqual(sum(frame[1:]) % 128, 0)
+
+
+class ValidateFrameTestCase(unittest.TestCase):
+    """Reject the frames that cannot be decoded."""
+
+    def setUp(self):
+        dao = Right81ButtonKeyboardMidiDAO(MidiConnection())
+        self.frame = dao._to_bytes(  # pylint: disable=W0212
+            make_keyboard(Right81ButtonKeyboard))
+        # The first key holds a NoteData: <type> <channel> <pitch> <velocity>
+        self.key = 1 + len(encode_name("Golden"))
+
+    def replace(self, index: int, value: int) -> bytes:
+        """Return the frame with `value` at `index`."""
+        return self.frame[:index] + bytes([value]) + self.frame[index+1:]
+
+    def test_valid(self):
+        self.assertTrue(validate_frame(self.frame))
+        data = b"\x7d\x01" + self.frame + b"\x00"
+        self.assertTrue(validate_frame(data, 2, len(data) - 1))
+        kbd = make_keyboard(Left96ButtonKeyboard)
+        for compact in (False, True):
+            connection = MidiConnection()
+            connection.compact_names = compact
+            dao = Left96ButtonKeyboardMidiDAO(connection)
+            self.assertTrue(validate_frame(
+                dao._to_bytes(kbd),  # pylint: disable=W0212
+                compact_names=compact))
+
+    def test_out_of_range(self):
+        self.assertFalse(validate_frame(self.replace(self.key + 1, 16)))
+        self.assertFalse(validate_frame(self.replace(self.key + 2, 0x80)))
+
+    def test_length(self):
+        self.assertFalse(validate_frame(self.frame[:-1]))
+        self.assertFalse(validate_frame(self.frame + b"\x00"))
+        self.assertFalse(validate_frame(self.frame[:1]))
+        self.assertFalse(validate_frame(b""))
+
+    def test_unknown_types(self):
+        self.assertFalse(validate_frame(self.replace(0, 0x7f)))
+        self.assertFalse(validate_frame(self.replace(self.key, 0x7f)))
+
+    def test_invalid_name(self):
+        # Not base 64, then base 64 of bytes that are not UTF-8
+        self.assertFalse(validate_frame(self.replace(1, ord("!"))))
+        self.assertFalse(validate_frame(
+            b"\x01/w==\x00" + self.frame[self.key:]))
+        # A compact name longer than the frame
+        frame = b"\x01" + encode_name("Golden", True) + self.frame[self.key:]
+        self.assertTrue(validate_frame(frame, compact_names=True))
+        self.assertFalse(validate_frame(b"\x01\x7fGolden",
+                                        compact_names=True))
+
+
+class PitchBendData(MidiData):  # pylint: disable=R0903
+    """A kind of midi data unknown to the controller."""
+
+    def __init__(self, channel: int, value: int):
+        self.channel = channel
+        self.value = value
+
+    def __eq__(self, o):
+        if isinstance(o, PitchBendData):
+            return (self.channel, self.value) == (o.channel, o.value)
+        return NotImplemented
+
+
+class PitchBendDataMidiDAO(MidiDataMidiDAO):
+    """DAO of `PitchBendData`, registered by the tests."""
+
+    data_type = 0x05
+    data_class = PitchBendData
+    data_limits = (15, 127, 127)
+
+    @staticmethod
+    def from_bytes(data: bytes, index: int = 0) -> (PitchBendData, int):
+        return PitchBendData(data[index+1],
+                             data[index+2] << 7 | data[index+3]), 4
+
+    @staticmethod
+    def to_bytes(data: PitchBendData) -> bytes:
+        return bytes([0x05, data.channel, data.value >> 7,
+                      data.value & 0x7f])
+
+
+class RegistryTestCase(unittest.TestCase):
+    """Register new kinds of midi data."""
+
+    def setUp(self):
+        registries = (midi_data_decoders, midi_data_encoders,
+                      midi_data_limits)
+        saved = [dict(registry) for registry in registries]
+
+        def restore():
+            for registry, content in zip(registries, saved):
+                registry.clear()
+                registry.update(content)
+        self.addCleanup(restore)
+
+    def test_register_midi_data(self):
+        register_midi_data_dao(PitchBendDataMidiDAO)
+        dao = Right81ButtonKeyboardMidiDAO(MidiConnection())
+        kbd = make_keyboard(Right81ButtonKeyboard)
+        kbd.set_data(4, PitchBendData(1, 8192))
+        frame = dao._to_bytes(kbd)  # pylint: disable=W0212
+        self.assertTrue(validate_frame(frame))
+        self.assertEqual(dao.from_bytes(frame), kbd)
+
+    def test_encoder_of_subclass(self):
+        class AccentNoteData(NoteData):  # pylint: disable=R0903
+            """A NoteData without a DAO of its own."""
+        encoder = get_midi_data_encoder(AccentNoteData)
+        self.assertIs(encoder, midi_data_encoders[NoteData])
+        self.assertEqual(encoder(AccentNoteData(1, 60, 100)),
+                         bytes([0x01, 1, 60, 100]))
+
+
+class NameTestCase(unittest.TestCase):
+    """Encode and decode the names of the keyboards."""
+
+    names = ["", "A", "Benchmark", "Accordéon à droite", "ключ", "𝄞" * 31,
+             "x" * 127]
+
+    def test_round_trip(self):
+        for compact in (False, True):
+            for name in self.names:
+                data = b"\x01" + encode_name(name, compact) + b"\x02"
+                self.assertEqual(decode_name(data, 1, compact),
+                                 (name, len(data) - 1))
+
+    def test_compact_size(self):
+        for name in self.names:
+            size = len(name.encode("utf-8"))
+            self.assertEqual(len(encode_name(name, True)),
+                             1 + size + -(-size // 7))
+            self.assertTrue(all(byte < 0x80
+                                for byte in encode_name(name, True)))
+
+    def test_compact_errors(self):
+        with self.assertRaises(ValueError):
+            encode_name("x" * 128, True)
+        with self.assertRaises(ValueError):
+            decode_name(encode_name("x" * 20, True)[:-1], 0, True)
+
+
+if __name__ == "__main__":
+    unittest.main()